@@ -0,0 +1,70 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Bounded containers for incrementally arriving event data
+"""
+
+import pandas as pd
+
+from .eve import concat_optimized
+
+
+class EventRingBuffer():
+
+    """
+    Fixed capacity window over flattened events. Appending new rows drops the oldest ones, so memory use stays
+    bounded no matter how long a live tail runs. Rows are held in a single dataframe with dtypes from
+    optimize_dtypes, so buffer is the data itself rather than a copy of it.
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        if capacity < 1:
+            raise ValueError("ring buffer capacity must be positive integer")
+        self.capacity = capacity
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def clear(self) -> None:
+        self._df = pd.DataFrame()
+
+    @property
+    def columns(self) -> list:
+        return list(self._df.columns)
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add rows of dataframe after buffered ones. Columns not seen before are added, missing ones are null.
+
+        Out: rows that were dropped, oldest first
+        """
+        if len(df) == 0:
+            return pd.DataFrame()
+        if len(df) > self.capacity:
+            df = df.iloc[-self.capacity:]
+
+        df = concat_optimized([self._df, df])
+        drop = max(len(df) - self.capacity, 0)
+        evicted = df.iloc[:drop].reset_index(drop=True)
+        self._df = df.iloc[drop:].reset_index(drop=True)
+        return evicted
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Out: buffered rows as dataframe, oldest first
+        """
+        return self._df
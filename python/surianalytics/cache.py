@@ -0,0 +1,206 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Persistent cache for decoded scirius API responses. Entries are stored as JSON files on local disk, keyed by host,
+credentials, API path and normalized query params. Cache size is bounded with least recently used eviction.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "surianalytics")
+
+# API paths are matched by suffix, values are seconds
+DEFAULT_TTL = {
+    "rest/rules/es/unique_fields/": 3600,
+}
+
+
+class ResponseCache():
+
+    """
+    Disk backed response cache with per-endpoint TTL and size bounded LRU eviction.
+
+    Query time bounds are rounded to granularity seconds in cache keys, so repeated relative queries such as last
+    15 minutes map to the same entry. Callers should not cache windows that are still open, see is_open. Windows
+    that ended more than closed_after seconds before the response was stored are
+    treated as closed and never expire, as past data does not change.
+    """
+
+    def __init__(self,
+                 path: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 ttl: dict | None = None,
+                 default_ttl: float = 300,
+                 granularity: int = 60,
+                 closed_after: int = 300) -> None:
+        if max_bytes <= 0:
+            raise ValueError("cache size must be positive integer")
+        if granularity < 1:
+            raise ValueError("time granularity must be at least one second")
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = {**DEFAULT_TTL, **(ttl if ttl is not None else {})}
+        self.default_ttl = default_ttl
+        self.granularity = granularity
+        self.closed_after = closed_after
+
+        self.hits = Counter()
+        self.misses = Counter()
+
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+        # file name -> (size, last access time)
+        self._index = {}
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                st = os.stat(os.path.join(self.path, name))
+                self._index[name] = (st.st_size, st.st_mtime)
+        self._size = sum(v[0] for v in self._index.values())
+
+    def round_params(self, params: dict) -> dict:
+        """
+        Out: copy of query params with from_date floored and to_date ceiled to cache granularity
+        """
+        step = self.granularity * 1000
+        params = dict(params)
+        if "from_date" in params:
+            params["from_date"] = int(params["from_date"]) // step * step
+        if "to_date" in params:
+            params["to_date"] = -(-int(params["to_date"]) // step) * step
+        return params
+
+    def is_open(self, params: dict) -> bool:
+        """
+        Out: True when query window ends after now, its response still changes as events arrive
+        """
+        return "to_date" in params and int(params["to_date"]) > time.time() * 1000
+
+    def get(self, namespace: str, api: str, params: dict):
+        """
+        Out: cached response data, None on miss or expired entry
+        """
+        name = self._name(namespace, api, params)
+        with self._lock:
+            if name not in self._index:
+                self.misses[api] += 1
+                return None
+
+            fname = os.path.join(self.path, name)
+            try:
+                with open(fname, "r") as handle:
+                    entry = json.load(handle)
+            except (OSError, ValueError):
+                self._drop(name)
+                self.misses[api] += 1
+                return None
+
+            if not entry["closed"] and time.time() - entry["created"] > self._ttl(api):
+                self._drop(name)
+                self.misses[api] += 1
+                return None
+
+            now = time.time()
+            os.utime(fname, (now, now))
+            self._index[name] = (self._index[name][0], now)
+            self.hits[api] += 1
+            return entry["data"]
+
+    def put(self, namespace: str, api: str, params: dict, data) -> None:
+        name = self._name(namespace, api, params)
+        now = time.time()
+        entry = json.dumps({
+            "created": now,
+            "closed": "to_date" in params and params["to_date"] / 1000 < now - self.closed_after,
+            "api": api,
+            "data": data,
+        })
+        if len(entry) > self.max_bytes:
+            return
+
+        with self._lock:
+            if name in self._index:
+                self._drop(name)
+            fname = os.path.join(self.path, name)
+            tmp = "{}.{}.tmp".format(fname, threading.get_ident())
+            with open(tmp, "w") as handle:
+                handle.write(entry)
+            os.replace(tmp, fname)
+
+            self._index[name] = (len(entry), now)
+            self._size += len(entry)
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in list(self._index):
+                self._drop(name)
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> pd.DataFrame:
+        """
+        Out: hit and miss counters per API path
+        """
+        apis = sorted(set(self.hits) | set(self.misses))
+        df = pd.DataFrame({
+            "api": apis,
+            "hits": [self.hits[a] for a in apis],
+            "misses": [self.misses[a] for a in apis],
+        })
+        df["hit_ratio"] = df.hits / (df.hits + df.misses)
+        return df
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _ttl(self, api: str) -> float:
+        for suffix, ttl in self.ttl.items():
+            if api.strip("/").endswith(suffix.strip("/")):
+                return ttl
+        return self.default_ttl
+
+    def _evict(self) -> None:
+        if self._size <= self.max_bytes:
+            return
+        for name, _ in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            self._drop(name)
+            if self._size <= self.max_bytes:
+                return
+
+    def _drop(self, name: str) -> None:
+        size, _ = self._index.pop(name, (0, 0))
+        self._size -= size
+        try:
+            os.remove(os.path.join(self.path, name))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _name(namespace: str, api: str, params: dict) -> str:
+        # namespace carries host and API token, hashing keeps the token out of file names
+        key = json.dumps({"ns": namespace, "api": api.strip("/"), "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json"
@@ -0,0 +1,96 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Shared cache of EVE field names known to scirius, refreshed in background
+"""
+
+import threading
+import time
+import warnings
+from typing import Callable
+
+
+class FieldCatalog():
+
+    """
+    Cached field lists per event type, None key holds fields of all event types.
+
+    fields returns cached list right away. Missing or older than ttl seconds lists are refreshed in a background
+    thread, and subscribers are called with event type and new list once it arrives. Only one refresh per event
+    type runs at a time.
+    """
+
+    def __init__(self, connector, ttl: float = 600) -> None:
+        self._connector = connector
+        self.ttl = ttl
+        # event type -> (fetch time, fields)
+        self._fields = {}
+        self._pending = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def fields(self, event_type: str | None = None, wait: bool = False) -> list:
+        """
+        Out: cached field list of event type, empty list if not fetched yet unless wait is set
+        """
+        event_type = None if event_type in (None, "", "all") else event_type
+        with self._lock:
+            cached = self._fields.get(event_type)
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            return cached[1]
+
+        if wait:
+            return self._fetch(event_type)
+
+        self.refresh(event_type)
+        return [] if cached is None else cached[1]
+
+    def refresh(self, event_type: str | None = None) -> threading.Thread:
+        """
+        Start background refresh of event type field list, running refresh is returned if there is one
+        """
+        with self._lock:
+            pending = self._pending.get(event_type)
+            if pending is not None and pending.is_alive():
+                return pending
+            thread = threading.Thread(target=self._background, args=(event_type,), daemon=True)
+            self._pending[event_type] = thread
+        thread.start()
+        return thread
+
+    def subscribe(self, callback: Callable[[str | None, list], None]) -> None:
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str | None, list], None]) -> None:
+        self._subscribers.remove(callback)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fields.clear()
+
+    def _background(self, event_type: str | None) -> None:
+        try:
+            self._fetch(event_type)
+        except OSError as err:
+            warnings.warn("field catalog refresh failed: {}".format(err))
+
+    def _fetch(self, event_type: str | None) -> list:
+        fields = self._connector.get_unique_fields(event_type=event_type)
+        with self._lock:
+            self._fields[event_type] = (time.time(), fields)
+        for callback in list(self._subscribers):
+            callback(event_type, fields)
+        return fields
@@ -20,40 +20,149 @@ os environment, or be provided as argument. This order should also work as overr
 whereby OS env overrides local file, and API arguments override both.
 """
 
+import asyncio
+import dataclasses
+import hashlib
 import json
 import os
 import requests
 import shutil
+import ssl
+import time
 import urllib.parse
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from copy import deepcopy
+from typing import TYPE_CHECKING, Callable, Iterator
 
-import networkx as nx
+import numpy as np
 import pandas as pd
 import subprocess
 
 from dotenv import dotenv_values
+from requests.adapters import HTTPAdapter
+
+from .cache import DEFAULT_CACHE_DIR, ResponseCache
+from .catalog import FieldCatalog
+from .decoding import STREAM_CHUNK_SIZE, ChunkReader, iter_items, loads
+from .eve import flatten_events
+from .filters import PathFilter
+from .instrumentation import RequestLog, response_rows
+from .scheduler import RequestScheduler
 from datetime import datetime, timedelta, timezone
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+if TYPE_CHECKING:
+    # imported on first graph query, networkx is slow to import
+    import networkx as nx
+
 # Search for scirius env file in user home rather than local folder
 KEY_ENV_IN_HOME = "SCIRIUS_ENVFILE_IN_HOME"
 
 KEY_ENDPOINT = "SCIRIUS_HOST"
 KEY_TOKEN = "SCIRIUS_TOKEN"
 KEY_TLS_VERIFY = "SCIRIUS_TLS_VERIFY"
+KEY_POOL_SIZE = "SCIRIUS_POOL_SIZE"
+KEY_RATE_LIMIT = "SCIRIUS_RATE_LIMIT"
+KEY_TARGET_LATENCY = "SCIRIUS_TARGET_LATENCY"
+KEY_INITIAL_CONCURRENCY = "SCIRIUS_INITIAL_CONCURRENCY"
+KEY_EVENT_INDEX = "SCIRIUS_EVENT_INDEX"
+
+DEFAULT_EVENT_INDEX = "logstash-*"
 
 LOCAL_TZ = datetime.now(timezone(timedelta(0))).astimezone().tzinfo
 
 QUERY_RETROSEARCH_SNI = "event_type: tls AND tls.sni.keyword: ({domains})"
 QUERY_RETROSEARCH_HTTP_HOST = "event_type: http AND http.hostname.keyword: ({domains})"
 
+# query template, match kind and EVE field of every retrosearch sub-query
+RETROSEARCH_KINDS = ((QUERY_RETROSEARCH_SNI, "exact", "tls.sni"),
+                     (QUERY_RETROSEARCH_SNI, "sub", "tls.sni"),
+                     (QUERY_RETROSEARCH_HTTP_HOST, "exact", "http.hostname"),
+                     (QUERY_RETROSEARCH_HTTP_HOST, "sub", "http.hostname"))
+
+
+@dataclasses.dataclass(frozen=True)
+class QuerySpec():
+
+    """
+    Immutable description of a single query. Connector methods that accept a spec read time range, page size,
+    qfilter and tenant from it instead of mutable connector state, so one connector can serve queries from many
+    threads at once. Specs are hashable and can be used for caching and deduplication.
+
+    aggs can be given as dict, it is stored as canonical JSON string to keep spec hashable.
+    """
+
+    from_date: int
+    to_date: int
+    page_size: int = 1000
+    qfilter: str | None = None
+    tenant: int | str | None = None
+    aggs: str | None = None
+    index: str | None = None
+    time_filter: str = "@timestamp"
+
+    def __post_init__(self) -> None:
+        if self.from_date > self.to_date:
+            raise ValueError("Timespan beginning must be before the end")
+        if self.page_size < 0:
+            raise ValueError("page size must be 0 or positive integer")
+        if isinstance(self.aggs, dict):
+            object.__setattr__(self, "aggs", json.dumps(self.aggs, sort_keys=True))
+
+    def replace(self, **changes) -> "QuerySpec":
+        return dataclasses.replace(self, **changes)
+
+    def with_window(self, from_date: int, to_date: int) -> "QuerySpec":
+        return dataclasses.replace(self, from_date=int(from_date), to_date=int(to_date))
+
+    def aggs_dict(self) -> dict | None:
+        return None if self.aggs is None else json.loads(self.aggs)
+
+    def params(self, ignore_time: bool = False) -> dict:
+        """
+        Out: GET query params described by spec
+        """
+        params = {} if ignore_time else {"from_date": self.from_date, "to_date": self.to_date}
+        if self.qfilter is not None:
+            params["qfilter"] = self.qfilter
+        if self.tenant is not None:
+            params["tenant"] = self.tenant
+        return params
+
+    def post_params(self) -> dict:
+        """
+        Out: query params of search POST request, body is built from other fields
+        """
+        params = {}
+        if self.tenant is not None:
+            params["tenant"] = self.tenant
+        params["from_date"] = self.from_date
+        params["to_date"] = self.to_date
+        return params
+
+    def key(self) -> str:
+        return hashlib.sha256(json.dumps(dataclasses.asdict(self), sort_keys=True).encode("utf-8")).hexdigest()
+
 
 class RESTSciriusConnector():
 
     """
     APIConnector is for ingesting data from Scirius REST API
+
+    Time range and page size setters change connector defaults. Methods that take a spec argument use QuerySpec
+    instead, which is safe when queries run concurrently. last_request is informational only and holds the URL of
+    whichever request was built last.
     """
     last_request = None
     page_size = 1000
+    retrosearch_timings = None
+    cache = None
+    _field_catalog = None
 
     def __init__(self, **kwargs) -> None:
         env_in_home = os.environ.get(KEY_ENV_IN_HOME, "no")
@@ -88,52 +197,227 @@ class RESTSciriusConnector():
         if self.token is None:
             raise ValueError("{} not configured".format(KEY_TOKEN))
 
+        self.pool_size = int(kwargs.get(KEY_POOL_SIZE.lower(),
+                                        config.get(KEY_POOL_SIZE,
+                                                   10)))
+        if self.pool_size < 1:
+            raise ValueError("{} must be positive integer".format(KEY_POOL_SIZE))
+
+        rate_limit = kwargs.get(KEY_RATE_LIMIT.lower(), config.get(KEY_RATE_LIMIT, None))
+        target_latency = float(kwargs.get(KEY_TARGET_LATENCY.lower(), config.get(KEY_TARGET_LATENCY, 10)))
+        initial_concurrency = kwargs.get(KEY_INITIAL_CONCURRENCY.lower(), config.get(KEY_INITIAL_CONCURRENCY, None))
+        self.scheduler = RequestScheduler(max_concurrency=self.pool_size,
+                                          rate=float(rate_limit) if rate_limit not in (None, "") else None,
+                                          target_latency=target_latency,
+                                          initial_concurrency=int(initial_concurrency)
+                                          if initial_concurrency not in (None, "") else None)
+
+        self.event_index = kwargs.get(KEY_EVENT_INDEX.lower(), config.get(KEY_EVENT_INDEX, DEFAULT_EVENT_INDEX))
+
+        self.session = self._new_session()
+        self.request_log = RequestLog()
+
         self.set_query_timeframe(None, None)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _new_session(self) -> requests.Session:
+        """
+        Out: HTTP session that keeps connections to scirius alive between calls
+
+        Session is shared by all GET and POST helpers, so consecutive queries reuse pooled
+        TCP and TLS connections instead of doing a fresh handshake for each request.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size,
+                              pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.verify = self.tls_verify
+        session.headers.update({
+            "Authorization": "Token {}".format(self.token),
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        return session
+
+    def close(self) -> None:
+        """
+        Close pooled connections. Connector can still be used afterwards, connections are reopened on demand.
+        """
+        self.session.close()
+
     def get_event_types(self) -> list:
         """
         Out: list of event types from Scirius REST API
         """
         return list(self.get_eve_unique_values(counts="no", field="event_type"))
 
-    def get_eve_fields_graph_nx(self, **kwargs) -> nx.Graph:
-        data = self.get_eve_fields_graph(**kwargs)
-        data = data["graph"]
-        graph = nx.Graph()
-        for node in data["nodes"]:
-            graph.add_node(node["index"], field=node["field"], kind=node["kind"])
-        for edge in data["edges"]:
-            graph.add_edge(edge["edge"][0], edge["edge"][1], doc_count=edge["doc_count"])
-        return graph
+    def get_eve_fields_graph_nx(self, **kwargs) -> "nx.Graph":
+        return fields_graph_nx(self.get_eve_fields_graph(**kwargs))
 
-    def get_eve_unique_values(self, **kwargs) -> dict:
-        return self.get_data(api="rest/rules/es/unique_values/", qParams=kwargs)
+    def get_eve_unique_values(self, spec: QuerySpec | None = None, **kwargs) -> dict:
+        return self.get_data(api="rest/rules/es/unique_values/", qParams=kwargs, spec=spec)
 
-    def get_events_tail(self, **kwargs) -> list:
-        return [d for d in
-                self.get_data(api="rest/rules/es/events_tail/",
-                              qParams=kwargs).get("results", [])]
+    def get_events_tail(self, spec: QuerySpec | None = None, **kwargs) -> list:
+        return list(self.iter_data(api="rest/rules/es/events_tail/", qParams=kwargs, spec=spec))
 
-    def get_events_df(self, **kwargs) -> pd.DataFrame:
-        return pd.json_normalize(self.get_events_tail(**kwargs))
+    def get_events_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs) -> pd.DataFrame:
+        """
+        Out: pandas dataframe of flattened events, only listed dotted fields are kept when fields is set
+
+        Events are flattened while response body is still being parsed.
+        """
+        return flatten_events(self.iter_data(api="rest/rules/es/events_tail/", qParams=kwargs, spec=spec), fields)
 
-    def get_alerts_tail(self, **kwargs) -> list:
+    def get_alerts_tail(self, spec: QuerySpec | None = None, **kwargs) -> list:
         return [d.get("_source", {}) for d in
-                self.get_data(api="rest/rules/es/alerts_tail/",
-                              qParams=kwargs).get("results", [])]
+                self.iter_data(api="rest/rules/es/alerts_tail/", qParams=kwargs, spec=spec)]
+
+    def get_alerts_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs) -> pd.DataFrame:
+        return flatten_events((d.get("_source", {}) for d in
+                               self.iter_data(api="rest/rules/es/alerts_tail/", qParams=kwargs, spec=spec)), fields)
+
+    def iter_events_tail(self, spec: QuerySpec | None = None, **kwargs) -> Iterator[list]:
+        """
+        Out: generator of event lists, each holding at most page_size documents
+
+        Walks the whole from_date / to_date window rather than returning only the newest page.
+        """
+        return self._iter_tail(self.get_events_tail, spec, **kwargs)
+
+    def iter_events_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs) -> Iterator[pd.DataFrame]:
+        for chunk in self.iter_events_tail(spec, **kwargs):
+            yield flatten_events(chunk, fields)
+
+    def iter_alerts_tail(self, spec: QuerySpec | None = None, **kwargs) -> Iterator[list]:
+        return self._iter_tail(self.get_alerts_tail, spec, **kwargs)
+
+    def iter_alerts_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs) -> Iterator[pd.DataFrame]:
+        for chunk in self.iter_alerts_tail(spec, **kwargs):
+            yield flatten_events(chunk, fields)
+
+    def tail_events(self, since=None, **kwargs) -> "EventTail":
+        """
+        Out: incremental tail that returns only events newer than the last poll
+
+        since is epoch milliseconds, ISO string or datetime, current from_date is used when not set.
+        Kwargs are passed to events_tail as query params on every poll.
+        """
+        return EventTail(self, self.get_events_tail, since, **kwargs)
+
+    def tail_alerts(self, since=None, **kwargs) -> "EventTail":
+        return EventTail(self, self.get_alerts_tail, since, **kwargs)
 
-    def get_alerts_df(self, **kwargs) -> pd.DataFrame:
-        return pd.json_normalize(self.get_alerts_tail(**kwargs))
+    def get_events_df_sliced(self,
+                             slices: int = 4,
+                             workers: int = 4,
+                             fields: list | None = None,
+                             spec: QuerySpec | None = None,
+                             **kwargs) -> pd.DataFrame:
+        """
+        Out: pandas dataframe of all events in query window, newest first
+
+        Query window is split into sub-windows that are fetched concurrently from events_tail. Any slice that
+        fills a whole page is split again, so result is not capped by page_size.
+        """
+        return flatten_events(self._fetch_sliced(self.get_events_tail, slices, workers, spec=spec, **kwargs), fields)
+
+    def get_alerts_df_sliced(self,
+                             slices: int = 4,
+                             workers: int = 4,
+                             fields: list | None = None,
+                             spec: QuerySpec | None = None,
+                             **kwargs) -> pd.DataFrame:
+        return flatten_events(self._fetch_sliced(self.get_alerts_tail, slices, workers, spec=spec, **kwargs), fields)
+
+    def _fetch_sliced(self,
+                      getter: Callable[..., list],
+                      slices: int,
+                      workers: int,
+                      min_slice_ms: int = 1000,
+                      spec: QuerySpec | None = None,
+                      **kwargs) -> list:
+        spec = self._window_spec(spec, kwargs)
+        if spec.page_size == 0:
+            raise ValueError("sliced fetch requires page size to be set")
+        if slices < 1 or workers < 1:
+            raise ValueError("slices and workers must be positive integers")
+
+        docs = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(getter, spec=spec.with_window(a, b), **kwargs): (a, b)
+                       for a, b in split_window(spec.from_date, spec.to_date, slices)}
+            while len(pending) > 0:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    a, b = pending.pop(future)
+                    page = future.result()
+                    if len(page) >= spec.page_size:
+                        if b - a >= min_slice_ms:
+                            for sa, sb in split_window(a, b, 2):
+                                pending[pool.submit(getter, spec=spec.with_window(sa, sb), **kwargs)] = (sa, sb)
+                            continue
+                        warnings.warn("slice {}-{} is full at minimum width, some documents could be skipped".format(a, b))
+                    docs.extend(page)
+
+        if len(docs) == 0:
+            return docs
+        order = doc_times_ms(docs).sort_values(ascending=False, kind="stable").index
+        return [docs[i] for i in order]
+
+    def _iter_tail(self, getter: Callable[..., list], spec: QuerySpec | None = None, **kwargs) -> Iterator[list]:
+        """
+        Cursor backwards over the query window, newest documents first. Tail endpoints return the newest
+        page_size documents, so every following request moves to_date to the oldest timestamp seen so far.
+        Documents sharing that boundary millisecond are requested again and dropped if already yielded.
+        """
+        spec = self._window_spec(spec, kwargs)
+        if spec.page_size == 0:
+            raise ValueError("paginated iteration requires page size to be set")
+
+        to_ms = spec.to_date
+        seen = set()
+        while to_ms >= spec.from_date:
+            page = getter(spec=spec.with_window(spec.from_date, to_ms), **kwargs)
+            fresh, to_ms, seen = tail_cursor_step(page, to_ms, seen, spec.page_size)
+            if len(fresh) > 0:
+                yield fresh
+            if to_ms is None:
+                return
+
+    def query_spec(self, **changes) -> QuerySpec:
+        """
+        Out: immutable snapshot of connector time range and page size, with optional field overrides
+        """
+        spec = QuerySpec(from_date=self._from_date_param(),
+                         to_date=self._to_date_param(),
+                         page_size=self.page_size)
+        return spec.replace(**changes) if len(changes) > 0 else spec
+
+    def _window_spec(self, spec: QuerySpec | None, kwargs: dict) -> QuerySpec:
+        """
+        Out: spec with from_date and to_date kwargs applied, kwargs are consumed
+        """
+        if spec is None:
+            spec = self.query_spec()
+        if "from_date" in kwargs or "to_date" in kwargs:
+            spec = spec.with_window(kwargs.pop("from_date", spec.from_date), kwargs.pop("to_date", spec.to_date))
+        return spec
 
-    def get_eve_fields_graph(self, **kwargs) -> dict:
+    def get_eve_fields_graph(self, spec: QuerySpec | None = None, **kwargs) -> dict:
         """
         Out: dict of graph data that wraps around nested elastic terms aggregation
 
         Kwargs dict is passed directly to GET handler and treated as query params.
         """
-        return self.get_data(api="rest/rules/es/graph_agg/", qParams=kwargs)
+        return self.get_data(api="rest/rules/es/graph_agg/", qParams=kwargs, spec=spec)
 
-    def get_unique_fields(self, event_type=None) -> list:
+    def get_unique_fields(self, event_type=None, spec: QuerySpec | None = None) -> list:
         """
         Out: list of unique fields for index pattern
 
@@ -142,54 +426,276 @@ class RESTSciriusConnector():
         """
         data = self.get_data(api="rest/rules/es/unique_fields/", qParams={
             "event_type": event_type
-        } if event_type not in (None, "all") else None, ignore_time=False)
+        } if event_type not in (None, "all") else None, ignore_time=False, spec=spec)
         return data.get("fields", [])
 
-    def retrosearch(self, domains: list[str], batchsize: int = 50) -> pd.DataFrame:
+    def field_catalog(self) -> FieldCatalog:
+        """
+        Out: field name catalog of this connector, shared by all its users and refreshed in background
+        """
+        if self._field_catalog is None:
+            self._field_catalog = FieldCatalog(self)
+        return self._field_catalog
+
+    def query_builder(self) -> "ESQueryBuilder":
+        """
+        Out: ESQueryBuilder for same scirius host and time range, sharing pooled session, request scheduler and
+        request log of this connector
+        """
+        return self._shared_builder(ESQueryBuilder)
+
+    def _shared_builder(self, cls: type) -> "ESQueryBuilder":
+        builder = cls(scirius_host=self.endpoint,
+                      scirius_token=self.token,
+                      scirius_tls_verify="yes" if self.tls_verify else "no")
+        builder.session.close()
+        builder.session = self.session
+        builder.scheduler = self.scheduler
+        builder.request_log = self.request_log
+        builder.set_query_timeframe(self.from_date, self.to_date)
+        return builder
+
+    def retrosearch(self,
+                    domains: list[str],
+                    batchsize: int = 50,
+                    workers: int = 1,
+                    adaptive: bool = False,
+                    max_url_bytes: int = 8000) -> pd.DataFrame:
         """
         This method does retroactive search for IoC values listed in arguments. It batches up values and does multiple queries
         in order to not overload elastic. It then builds pandas dataframe of EVE events that match the retroscan.
 
+        Batches and their sub-queries are dispatched on a thread pool of workers size, so workers also bounds the
+        number of concurrent queries hitting elastic. Per-query timings are stored in retrosearch_timings.
+
+        With adaptive enabled, a query that fills a whole page is bisected by domains and then by time window until
+        results fit, so ioc.batch.partial is only set when a single domain has over page_size hits in one second.
+        Batch size shrinks after truncated results and grows back up to batchsize when results are sparse. Batches
+        of every sub-query kind are walked in order, their bisected queries run on the workers pool.
+
+        Domains are lowercased, deduplicated and escaped, and subdomains of other listed domains are dropped as
+        wildcard sub-query already covers them. Batches hold at most batchsize values and are packed so that
+        request URL stays within max_url_bytes.
+
         In: list of domain IoC values
         Out: pandas dataframe with IoC sightings
         """
         if batchsize > 100:
             raise ValueError("batch size is too high, more than 100 values is likely to cause failed elastic query")
-        df = pd.DataFrame()
-        batches = int(len(domains) / batchsize) + 1
-        for i in range(batches):
-            if len(domains) > batchsize:
-                batch = domains[:batchsize]
-                domains = domains[batchsize:]
+        if workers < 1:
+            raise ValueError("workers must be positive integer")
+
+        spec = self.query_spec()
+
+        def query(q: tuple, i: int) -> tuple[pd.DataFrame, dict]:
+            start = time.perf_counter()
+            result = annotate_retrosearch(self.get_events_df(spec=spec.replace(qfilter=q[0])), q, i, spec.page_size)
+            return result, retrosearch_timing(q, i, result, time.perf_counter() - start, spec.page_size)
+
+        budget = max_url_bytes - len(self._build_url("rest/rules/es/events_tail/",
+                                                     self._query_params(spec=spec.replace(qfilter="*")))) + 1
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if adaptive:
+                values = [escape(d) for d in normalize_domains(domains)]
+                # kind loops only wait for their queries, which run on pool, so they get threads of their own
+                with ThreadPoolExecutor(max_workers=len(RETROSEARCH_KINDS)) as kinds:
+                    results = [r for kind_results in kinds.map(
+                        lambda kind: self._retrosearch_adaptive(values, kind, batchsize, budget, spec, pool=pool),
+                        RETROSEARCH_KINDS) for r in kind_results]
             else:
-                batch = domains
-
-            for q in ((QUERY_RETROSEARCH_SNI.format(domains=" OR ".join(batch)), "exact", "tls.sni"),
-                      (QUERY_RETROSEARCH_SNI.format(domains=" OR ".join(["*.{d}".format(d=d) for d in batch])), "sub", "tls.sni"),
-                      (QUERY_RETROSEARCH_HTTP_HOST.format(domains=" OR ".join(batch)), "exact", "http.hostname"),
-                      (QUERY_RETROSEARCH_HTTP_HOST.format(domains=" OR ".join(["*.{d}".format(d=d) for d in batch])), "sub", "http.hostname")):
-                result = self.get_events_df(qfilter=q[0])
-                if len(result) > 0:
-                    result["ioc.type"] = "domain"
-                    result["ioc.match"] = q[1]
-                    result["ioc.source"] = q[2]
-                    result["ioc.value.match"] = result[q[2]]
-
-                    result["ioc.batch.count"] = i
-                    if len(result) == self.page_size:
-                        result["ioc.batch.partial"] = True
-                    else:
-                        result["ioc.batch.partial"] = False
-                    df = pd.concat([df, result], axis=0)
+                batches = pack_retrosearch_domains(domains, budget, batchsize)
+                results = list(pool.map(lambda args: query(*args),
+                                        [(q, i) for i, batch in enumerate(batches) for q in retrosearch_queries(batch)]))
+
+        return self._collect_retrosearch(results)
+
+    def _retrosearch_adaptive(self,
+                              domains: list[str],
+                              kind: tuple,
+                              batchsize: int,
+                              budget: int,
+                              spec: QuerySpec,
+                              min_window_ms: int = 1000,
+                              pool: ThreadPoolExecutor | None = None) -> list[tuple[pd.DataFrame, dict]]:
+        """
+        Out: annotated result and timing of every query done for one retrosearch sub-query kind
 
+        In: escaped domain values, sub-query kind, maximum batch size, URL encoded byte budget of qfilter. Queries
+        of one bisection level run on pool when given, one after another otherwise.
+        """
+        if spec.page_size == 0:
+            raise ValueError("adaptive retrosearch requires page size to be set")
+
+        def fetch(leaf: list, from_ms: int, to_ms: int) -> tuple[tuple, pd.DataFrame, float]:
+            q = retrosearch_query(leaf, kind)
+            start = time.perf_counter()
+            result = self.get_events_df(spec=spec.replace(qfilter=q[0], from_date=from_ms, to_date=to_ms))
+            return q, result, time.perf_counter() - start
+
+        run = pool.map if pool is not None else map
+
+        results = []
+        size = batchsize
+        pos = 0
+        batch_idx = 0
+        while pos < len(domains):
+            batch = []
+            used = retrosearch_overhead()
+            while pos < len(domains) and len(batch) < size:
+                cost = retrosearch_cost(domains[pos])
+                if len(batch) > 0 and used + cost > budget:
+                    break
+                batch.append(domains[pos])
+                used += cost
+                pos += 1
+
+            rows = 0
+            truncated = False
+            level = [(batch, spec.from_date, spec.to_date)]
+            while len(level) > 0:
+                done = list(run(lambda job: fetch(*job), level))
+                split = []
+                for (leaf, from_ms, to_ms), (q, result, seconds) in zip(level, done):
+                    if len(result) >= spec.page_size:
+                        truncated = True
+                        if len(leaf) > 1:
+                            half = len(leaf) // 2
+                            split.extend([(leaf[:half], from_ms, to_ms), (leaf[half:], from_ms, to_ms)])
+                            results.append((pd.DataFrame(), retrosearch_timing(q, batch_idx, result, seconds, spec.page_size, True)))
+                            continue
+                        if to_ms - from_ms >= min_window_ms:
+                            split.extend([(leaf, a, b) for a, b in split_window(from_ms, to_ms, 2)])
+                            results.append((pd.DataFrame(), retrosearch_timing(q, batch_idx, result, seconds, spec.page_size, True)))
+                            continue
+
+                    rows += len(result)
+                    result = annotate_retrosearch(result, q, batch_idx, spec.page_size)
+                    results.append((result, retrosearch_timing(q, batch_idx, result, seconds, spec.page_size)))
+                level = split
+
+            if truncated:
+                size = max(1, size // 2)
+            elif rows < spec.page_size // 4:
+                size = min(batchsize, size * 2)
+            batch_idx += 1
+
+        return results
+
+    def _collect_retrosearch(self, results: list[tuple[pd.DataFrame, dict]]) -> pd.DataFrame:
+        self.retrosearch_timings = pd.DataFrame([r[1] for r in results])
+
+        frames = [r[0] for r in results if len(r[0]) > 0]
+        if len(frames) == 0:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, axis=0)
         df["timestamp"] = pd.to_datetime(df["timestamp"])
         return df
 
-    def get_data(self, api: str, qParams=None, ignore_time=False):
-        resp = self.__get(api, qParams, ignore_time)
+    def get_data(self, api: str, qParams=None, ignore_time=False, spec: QuerySpec | None = None):
+        """
+        Out: decoded response of GET request
+
+        Throttled and failed requests are retried by connector scheduler, RequestException is raised only when
+        retries are exhausted.
+        """
+        params = self._query_params(qParams, ignore_time, spec)
+        key = self._cache_key(params)
+        if key is None:
+            return self.__get_json(api, params)
+
+        data = self.cache.get(self._cache_namespace(), api, key)
+        if data is not None:
+            return data
+
+        data = self.__get_json(api, params)
+        self.cache.put(self._cache_namespace(), api, key, data)
+        return data
+
+    def _cache_key(self, params: dict) -> dict | None:
+        """
+        Out: rounded query params used as cache key, None when cache is disabled or query window is still open
+        """
+        if self.cache is None:
+            return None
+        key = self.cache.round_params(params)
+        return None if self.cache.is_open(key) else key
+
+    def _cache_namespace(self) -> str:
+        return "{}|{}".format(self.endpoint, self.token)
+
+    def iter_data(self, api: str, qParams=None, ignore_time=False, spec: QuerySpec | None = None) -> Iterator:
+        """
+        Out: generator of items in results array of GET response
+
+        Body is streamed and items are parsed while it downloads, see decoding module. Whole response is fetched
+        with get_data when response is cacheable, as cache stores complete documents.
+        """
+        params = self._query_params(qParams, ignore_time, spec)
+        if self._cache_key(params) is not None:
+            yield from self.get_data(api, qParams, ignore_time, spec).get("results", [])
+            return
+
+        url = self._get_url(api, params)
+
+        start = time.perf_counter()
+        try:
+            resp = self.scheduler.run(lambda: self.session.get(url, stream=True))
+        except requests.RequestException:
+            self.request_log.record("GET", api, params, None, time.perf_counter() - start)
+            raise
+        sent = time.perf_counter() - start
+
         if resp.status_code not in (200, 302):
+            self.request_log.record("GET", api, params, resp.status_code, sent,
+                                    ttfb=resp.elapsed.total_seconds(), size=len(resp.content))
             raise requests.RequestException(resp)
-        return json.loads(resp.text)
+
+        reader = ChunkReader(resp.iter_content(STREAM_CHUNK_SIZE))
+        items = iter_items(reader)
+        rows = 0
+        parse = 0.0
+        try:
+            while True:
+                # consumer work between items is excluded from timings
+                begin, wait = time.perf_counter(), reader.wait
+                item = next(items, reader)
+                parse += time.perf_counter() - begin - (reader.wait - wait)
+                if item is reader:
+                    break
+                rows += 1
+                yield item
+        finally:
+            resp.close()
+            self.request_log.record("GET", api, params, resp.status_code, sent + reader.wait + parse,
+                                    ttfb=resp.elapsed.total_seconds(),
+                                    size=reader.bytes,
+                                    decode=parse,
+                                    rows=rows)
+
+    def request_stats(self) -> pd.DataFrame:
+        """
+        Out: timing percentiles per endpoint of requests made by this connector, see RequestLog.summary
+        """
+        return self.request_log.summary()
+
+    def enable_cache(self,
+                     path: str = DEFAULT_CACHE_DIR,
+                     max_bytes: int = 256 * 1024 * 1024,
+                     ttl: dict | None = None,
+                     granularity: int = 60) -> object:
+        """
+        Store GET responses in a persistent disk cache. Query time bounds are rounded to granularity seconds in cache
+        keys, requests are sent with exact bounds. Windows ending after now are not cached. ttl maps API paths to
+        expiry in seconds. See ResponseCache for details.
+        """
+        self.cache = ResponseCache(path=path, max_bytes=max_bytes, ttl=ttl, granularity=granularity)
+        return self
+
+    def disable_cache(self) -> object:
+        self.cache = None
+        return self
 
     def set_from_date(self, from_date):
         if isinstance(from_date, str):
@@ -242,65 +748,185 @@ class RESTSciriusConnector():
         return self
 
     def _from_date_param(self) -> int:
-        return int(self.from_date.strftime('%s')) * 1000
+        return int(self.from_date.timestamp() * 1000)
 
     def _to_date_param(self) -> int:
-        return int(self.to_date.strftime('%s')) * 1000
-
-    def _time_params(self) -> dict:
-        return {
-            "from_date": self._from_date_param(),
-            "to_date": self._to_date_param(),
-        }
+        return int(self.to_date.timestamp() * 1000)
+
+    def _post(self,
+              api,
+              index,
+              qFilters=None,
+              aggs=None,
+              qParams=None,
+              time_filter='@timestamp',
+              page_size=None) -> requests.Response:
+        url = self._post_url(api, qParams)
+        body = self._post_body(index, qFilters, aggs, time_filter, page_size)
+        start = time.perf_counter()
+        try:
+            resp = self.scheduler.run(lambda: self.session.post(url, json=body))
+        except requests.RequestException:
+            self.request_log.record("POST", api, qParams, None, time.perf_counter() - start)
+            raise
+        self.request_log.record("POST", api, qParams, resp.status_code, time.perf_counter() - start,
+                                ttfb=resp.elapsed.total_seconds(), size=len(resp.content))
+        return resp
 
-    def _post(self, api, index, qFilters=None, aggs=None, qParams=None, time_filter='@timestamp') -> requests.Response:
+    def _post_url(self, api: str, qParams=None) -> str:
         url = urllib.parse.urljoin(self._host(), api)
         if qParams is not None:
             url = f'{url}?{urllib.parse.urlencode(qParams)}'
+        return url
 
+    def _post_body(self, index, qFilters=None, aggs=None, time_filter='@timestamp', page_size=None) -> dict:
         if qFilters is None:
             qFilters = '*'
 
-        resp = requests.post(
-            url,
-            json={
-                'index': index,
-                'qfilter': qFilters,
-                'aggs': aggs,
-                'size': self.page_size,
-                'time_filter': time_filter
-            },
-            verify=self.tls_verify,
-            headers={"Authorization": "Token {}".format(self.token)}
-        )
-        return resp
+        return {
+            'index': index,
+            'qfilter': qFilters,
+            'aggs': aggs,
+            'size': self.page_size if page_size is None else page_size,
+            'time_filter': time_filter
+        }
+
+    def __get(self, api: str, params: dict) -> requests.Response:
+        url = self._get_url(api, params)
+        return self.scheduler.run(lambda: self.session.get(url))
 
-    def __get(self, api: str, qParams=None, ignore_time=False) -> requests.Response:
+    def __get_json(self, api: str, params: dict):
+        """
+        Out: decoded body of GET request, request is timed and recorded in request log
+        """
+        start = time.perf_counter()
+        try:
+            resp = self.__get(api, params)
+        except requests.RequestException:
+            self.request_log.record("GET", api, params, None, time.perf_counter() - start)
+            raise
+        wall = time.perf_counter() - start
+
+        if resp.status_code not in (200, 302):
+            self.request_log.record("GET", api, params, resp.status_code, wall,
+                                    ttfb=resp.elapsed.total_seconds(), size=len(resp.content))
+            raise requests.RequestException(resp)
+
+        start = time.perf_counter()
+        data = loads(resp.content)
+        self.request_log.record("GET", api, params, resp.status_code, wall,
+                                ttfb=resp.elapsed.total_seconds(),
+                                size=len(resp.content),
+                                decode=time.perf_counter() - start,
+                                rows=response_rows(data))
+        return data
+
+    def _get_url(self, api: str, params: dict) -> str:
+        url = self._build_url(api, params)
+        self.last_request = url
+        return url
+
+    def _build_url(self, api: str, params: dict) -> str:
         url = urllib.parse.urljoin(self._host(), api)
-        if qParams is None:
-            qParams = {}
+        url += "?{}".format(urllib.parse.urlencode(params))
+        return url
+
+    def _query_params(self, qParams=None, ignore_time=False, spec: QuerySpec | None = None) -> dict:
+        """
+        Out: final GET query params, explicit qParams override spec, page size always comes from spec
+        """
+        if spec is None:
+            spec = self.query_spec()
 
-        if not ignore_time and self.to_date is not None and self.to_date is not None:
-            qParams = {**self._time_params(), **qParams}
+        qParams = {**spec.params(ignore_time), **(qParams if qParams is not None else {})}
 
-        if self.page_size > 0:
-            qParams["page_size"] = self.page_size
+        if spec.page_size > 0:
+            qParams["page_size"] = spec.page_size
 
         if "qfilter" in qParams and qParams["qfilter"] == "":
             qParams["qfilter"] = "*"
-        url += "?{}".format(urllib.parse.urlencode(qParams))
-
-        self.last_request = url
-        return requests.get(url,
-                            headers={
-                                "Authorization": "Token {}".format(self.token)
-                            },
-                            verify=self.tls_verify)
+        return qParams
 
     def _host(self) -> str:
         return "https://{}".format(self.endpoint)
 
 
+class EventTail():
+
+    """
+    Live tail over a tail endpoint. Every poll requests the window from the newest timestamp seen so far until now,
+    walking all pages of it, and drops documents on the boundary millisecond that were already returned.
+    """
+
+    def __init__(self, connector: RESTSciriusConnector, getter: Callable[..., list], since=None, **kwargs) -> None:
+        self._connector = connector
+        self._getter = getter
+        self._kwargs = kwargs
+        self._spec = connector.query_spec()
+
+        if since is None:
+            self.last_ms = connector._from_date_param()
+        elif isinstance(since, int):
+            self.last_ms = since
+        elif isinstance(since, str):
+            self.last_ms = int(datetime.fromisoformat(since).timestamp() * 1000)
+        elif isinstance(since, datetime):
+            self.last_ms = int(since.timestamp() * 1000)
+        else:
+            raise TypeError("since invalid type")
+        self._seen = set()
+
+    def poll(self) -> list:
+        """
+        Out: list of documents that arrived since previous poll, oldest first
+        """
+        to_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        if to_ms < self.last_ms:
+            return []
+        return self._advance([d for chunk in self._connector._iter_tail(self._getter,
+                                                                        self._spec.with_window(self.last_ms, to_ms),
+                                                                        **self._kwargs)
+                              for d in chunk])
+
+    def _advance(self, docs: list) -> list:
+        """
+        Out: documents not returned by previous poll, oldest first, with newest timestamp recorded for next poll
+        """
+        docs = [d for d in docs if len(self._seen) == 0 or doc_key(d) not in self._seen]
+        if len(docs) == 0:
+            return docs
+
+        times = doc_times_ms(docs)
+        newest = int(times.max())
+        boundary = {doc_key(d) for d, t in zip(docs, times) if t == newest}
+        self._seen = self._seen | boundary if newest == self.last_ms else boundary
+        self.last_ms = newest
+
+        order = times.sort_values(kind="stable").index
+        return [docs[i] for i in order]
+
+
+class AsyncEventTail(EventTail):
+
+    """
+    EventTail of async connector, poll is a coroutine
+    """
+
+    async def poll(self) -> list:
+        """
+        Out: list of documents that arrived since previous poll, oldest first
+        """
+        to_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        if to_ms < self.last_ms:
+            return []
+        docs = []
+        async for chunk in self._connector._iter_tail(self._getter,
+                                                      self._spec.with_window(self.last_ms, to_ms),
+                                                      **self._kwargs):
+            docs.extend(chunk)
+        return self._advance(docs)
+
+
 class ESQueryBuilder(RESTSciriusConnector):
     API = '/rest/rules/es/search/'
     TEMPLATE = {
@@ -327,6 +953,8 @@ class ESQueryBuilder(RESTSciriusConnector):
             }
         }
     }
+    COMPOSITE = 'composite'
+    METRICS = ('sum', 'avg', 'min', 'max', 'cardinality', 'value_count')
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
@@ -356,6 +984,8 @@ class ESQueryBuilder(RESTSciriusConnector):
         self.tenant = None
         self.index = 'logstash-alert-*'
         self.aggs_cols = []
+        self.composite_sources = []
+        self.metrics = []
 
     def set_time_filter(self, time_filter):
         self.time_filter = time_filter
@@ -385,59 +1015,148 @@ class ESQueryBuilder(RESTSciriusConnector):
         else:
             self.aggs = agg
 
-    def __build_query(self):
-        if self.qfilter:
-            self.body['query']['bool']['must'][0]['query_string']['query'] = self.qfilter
+    def search_spec(self, **changes) -> QuerySpec:
+        """
+        Out: immutable snapshot of builder state, pass it to post to run the query while builder is modified
+        """
+        return self.query_spec(qfilter=self.qfilter,
+                               tenant=self.tenant,
+                               aggs=self._aggs_with_metrics(),
+                               index=self.index,
+                               time_filter=self.time_filter,
+                               **changes)
+
+    def add_metric(self, field, col_name, kind='sum'):
+        """
+        Add metric sub-aggregation, such as sum, cardinality or min / max timestamp, to deepest terms level and to
+        composite aggregation. Each metric becomes a column next to Count in flattened result.
+        """
+        if kind not in self.METRICS:
+            raise ValueError("metric must be one of {}".format(", ".join(self.METRICS)))
+        self.metrics.append((col_name, kind, field))
 
-        self.body['query']['bool']['must'][1]['range'] = {
-            self.time_filter: {
-                'from': self._from_date_param(),
-                'to': self._to_date_param()
-            }
+    def _metric_aggs(self) -> dict:
+        return {col: {kind: {'field': field}} for col, kind, field in self.metrics}
+
+    def _aggs_with_metrics(self) -> dict | None:
+        """
+        Out: terms aggregation with metric aggs attached to deepest level
+        """
+        if not self.aggs or len(self.metrics) == 0:
+            return self.aggs
+        aggs = deepcopy(self.aggs)
+        leaf = aggs['aggs']['1']
+        for cpt in range(2, self.nb_aggs + 1):
+            leaf = leaf['aggs'][str(cpt)]
+        leaf.setdefault('aggs', {}).update(self._metric_aggs())
+        return aggs
+
+    def add_composite(self, field, col_name, missing_bucket=False):
+        """
+        Add terms source to composite aggregation. Unlike add_aggs, composite aggregation returns every bucket,
+        paged with after key, see iter_composite.
+        """
+        source = {'terms': {'field': field}}
+        if missing_bucket:
+            source['terms']['missing_bucket'] = True
+        self.composite_sources.append((col_name, source))
+
+    def composite_aggs(self, size=1000, after=None) -> dict:
+        """
+        Out: aggs section of one composite aggregation page, starting after given after key
+        """
+        if len(self.composite_sources) == 0:
+            raise ValueError("no composite sources, use add_composite")
+        composite = {
+            'size': size,
+            'sources': [{col: source} for col, source in self.composite_sources],
         }
+        if after is not None:
+            composite['after'] = after
+        agg = {'composite': composite}
+        if len(self.metrics) > 0:
+            agg['aggs'] = self._metric_aggs()
+        return {'aggs': {self.COMPOSITE: agg}}
+
+    def iter_composite(self, chunk_size=1000, spec: QuerySpec | None = None) -> Iterator[pd.DataFrame]:
+        """
+        Out: generator of dataframes, one per composite aggregation page of at most chunk_size buckets
 
-        if self.aggs:
-            self.body["aggs"] = self.aggs
+        Pages are requested until elastic stops returning after key, so result is not truncated like nested terms
+        aggregation and only one page of buckets is held in memory at a time.
+        """
+        if spec is None:
+            spec = self.search_spec()
+        after = None
+        while True:
+            resp = self.post(spec.replace(aggs=self.composite_aggs(chunk_size, after), page_size=0))
+            if resp.status_code not in (200, 302):
+                raise requests.RequestException(resp)
+            df, after = self._composite_page(resp.json())
+            if len(df) > 0:
+                yield df
+            if after is None:
+                return
+
+    def get_composite_df(self, chunk_size=1000, spec: QuerySpec | None = None) -> pd.DataFrame:
+        return self._concat_composite(list(self.iter_composite(chunk_size, spec)))
+
+    def _composite_page(self, content) -> tuple[pd.DataFrame, dict | None]:
+        """
+        Out: flattened buckets of composite page, after key of next page or None on last page
+        """
+        agg = content.get('aggregations', {}).get(self.COMPOSITE, {})
+        df = self.flatten_aggregation(content)
+        if len(agg.get('buckets', [])) == 0:
+            return df, None
+        return df, agg.get('after_key')
+
+    def _concat_composite(self, frames: list) -> pd.DataFrame:
+        if len(frames) == 0:
+            return pd.DataFrame(columns=[col for col, _ in self.composite_sources] + ['Count'] +
+                                [col for col, _, _ in self.metrics])
+        return pd.concat(frames, axis=0, ignore_index=True)
 
-        self.body['size'] = self.page_size
+    def __build_query(self):
+        self.body = self.build_body(self.search_spec())
 
     @classmethod
-    def _match_filter(cls, item, keys, val):
+    def build_body(cls, spec: QuerySpec) -> dict:
+        """
+        Out: elastic query body described by spec, built from a fresh copy of template
+        """
+        body = deepcopy(cls.TEMPLATE)
+        if spec.qfilter:
+            body['query']['bool']['must'][0]['query_string']['query'] = spec.qfilter
+
+        body['query']['bool']['must'][1]['range'] = {
+            spec.time_filter: {
+                'from': spec.from_date,
+                'to': spec.to_date
+            }
+        }
 
-        for idx, key in enumerate(keys, 1):
-            item = item[key]
+        if spec.aggs:
+            body["aggs"] = spec.aggs_dict()
 
-            if isinstance(item, dict):
-                continue
-            elif isinstance(item, list):
-                for sub_item in item:
-                    return cls._match_filter(sub_item, keys[idx:], val)
-            else:
-                return item == val
-
-        return False
+        body['size'] = spec.page_size
+        return body
 
     @classmethod
-    def clean_host_id(cls, arr: list, **filters):
-        for item in deepcopy(arr):
-            for key, val in filters.items():
-                if not cls._match_filter(deepcopy(item), key.split('.'), val):
-                    arr.remove(item)
-                    break
+    def clean_host_id(cls, arr: list, mode='any', **filters):
+        """
+        Remove items of arr that do not match every dotted path filter, arr is modified in place and returned.
+        Paths are matched across nested lists, see PathFilter for any and all semantics.
+        """
+        arr[:] = PathFilter(filters, mode).filter(arr)
         return arr
 
-    def post(self) -> requests.Response:
-        qParams = {}
-
-        if self.tenant is not None:
-            qParams.update({'tenant': self.tenant})
-
-        qParams.update({'from_date': self._from_date_param()})
-        qParams.update({'to_date': self._to_date_param()})
-
+    def post(self, spec: QuerySpec | None = None) -> requests.Response:
+        if spec is None:
+            spec = self.search_spec()
         return self._post(
-            self.API, self.index, self.qfilter, self.aggs,
-            qParams=qParams, time_filter=self.time_filter)
+            self.API, spec.index, spec.qfilter, spec.aggs_dict(),
+            qParams=spec.post_params(), time_filter=spec.time_filter, page_size=spec.page_size)
 
     @staticmethod
     def filter_join(filters, operator='AND'):
@@ -449,53 +1168,607 @@ class ESQueryBuilder(RESTSciriusConnector):
             qfilter = self.filter_join([self.qfilter, f'tenant: {self.tenant}'])
             self.set_qfilter(qfilter)
 
-    def __parse_aggs(self, val, res, idx=0, row_res=None):
-        if row_res is None:
-            row_res = {}
+    def flatten_aggregation(self, content):
+        """
+        Out: dataframe with one row per leaf bucket, key column per aggregation level, Count and metric columns
+        """
+        aggregations = content.get('aggregations', {})
+        metrics = [col for col, _, _ in self.metrics]
+        if self.COMPOSITE in aggregations and len(self.composite_sources) > 0:
+            return flatten_composite(aggregations[self.COMPOSITE],
+                                     [col for col, _ in self.composite_sources],
+                                     metrics)
 
-        for item in val.get('buckets', []):
-            row_res[idx] = item['key']
-            if str(idx + 2) in item:
-                self.__parse_aggs(item[str(idx + 2)], res, idx + 1, row_res)
-            else:
-                for j in range(0, idx + 1):
-                    res[self.aggs_cols[j]].append(row_res[j])
-                res[self.aggs_cols[idx + 1]].append(item['doc_count'])
+        cols = [col for col in self.aggs_cols if col != 'Count']
+        frames = [flatten_terms(val, cols, metrics) for val in aggregations.values() if 'buckets' in val]
+        if len(frames) == 0:
+            return pd.DataFrame(columns=cols + ['Count'] + metrics)
+        return pd.concat(frames, axis=0, ignore_index=True) if len(frames) > 1 else frames[0]
 
-    def flatten_aggregation(self, content):
-        if 'Count' not in self.aggs_cols:
-            self.aggs_cols.append('Count')
-        res = dict((key, []) for key in self.aggs_cols)
 
-        for _, val in content.get('aggregations', {}).items():
-            self.__parse_aggs(val, res)
+class AsyncRESTSciriusConnector(RESTSciriusConnector):
+
+    """
+    Asyncio variant of RESTSciriusConnector. Query methods are coroutines, so many of them can be awaited
+    together with asyncio.gather. Time and page size setters are shared with blocking connector.
+    Number of requests in flight is bounded by a semaphore.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for async connector, install suricata-analytics[async]")
+        super().__init__(**kwargs)
+
+        self.max_in_flight = int(kwargs.get("max_in_flight", self.pool_size))
+        if self.max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive integer")
+
+        self._aio_session = None
+        self._aio_loop = None
+        self._semaphore = None
+        # builders of this connector send through its aiohttp session and semaphore
+        self._aio_owner = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._aio_owner is self and self._aio_session is not None:
+            await self._aio_session.close()
+        self._aio_session = None
+
+    def _async_session(self) -> "aiohttp.ClientSession":
+        """
+        Out: aiohttp session and semaphore bound to the running event loop, created on first use
+        """
+        if self._aio_owner is not self:
+            return self._aio_owner._async_session()
+        loop = asyncio.get_running_loop()
+        if self._aio_session is None or self._aio_session.closed or self._aio_loop is not loop:
+            ssl_ctx = ssl.create_default_context(cafile=self.tls_verify) if self.tls_verify else False
+            self._aio_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ssl=ssl_ctx),
+                headers={"Authorization": "Token {}".format(self.token)},
+            )
+            self._aio_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._aio_session
+
+    async def get_data(self, api: str, qParams=None, ignore_time=False, spec: QuerySpec | None = None):
+        params = self._query_params(qParams, ignore_time, spec)
+        key = self._cache_key(params)
+        if key is not None:
+            # cache reads and writes files, event loop keeps running meanwhile
+            data = await asyncio.to_thread(self.cache.get, self._cache_namespace(), api, key)
+            if data is not None:
+                return data
+
+        data = await self._async_request_json("GET", api, params, self._get_url(api, params))
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, self._cache_namespace(), api, key, data)
+        return data
+
+    def field_catalog(self) -> FieldCatalog:
+        """
+        Not supported, catalog refreshes in background threads with blocking calls, use RESTSciriusConnector
+        """
+        raise NotImplementedError("field catalog needs blocking connector, use RESTSciriusConnector")
+
+    def query_builder(self) -> "AsyncESQueryBuilder":
+        """
+        Out: AsyncESQueryBuilder for same scirius host and time range, sharing aiohttp session, in-flight semaphore,
+        request scheduler and request log of this connector
+        """
+        builder = self._shared_builder(AsyncESQueryBuilder)
+        builder._aio_owner = self
+        return builder
+
+    async def _post(self,
+                    api,
+                    index,
+                    qFilters=None,
+                    aggs=None,
+                    qParams=None,
+                    time_filter='@timestamp',
+                    page_size=None) -> dict:
+        """
+        Out: decoded response body, unlike blocking connector that returns the response object
+        """
+        return await self._async_request_json("POST",
+                                              api,
+                                              qParams,
+                                              self._post_url(api, qParams),
+                                              json=self._post_body(index, qFilters, aggs, time_filter, page_size))
+
+    async def _async_request_json(self, method: str, api: str, params: dict | None, url: str, **kwargs):
+        """
+        Out: decoded response body, request goes through scheduler and in-flight semaphore and is recorded in request log
+        """
+        session = self._async_session()
+        ttfb = None
+
+        async def send() -> tuple:
+            nonlocal ttfb
+            async with self._aio_owner._semaphore:
+                sent = time.perf_counter()
+                async with session.request(method, url, **kwargs) as resp:
+                    ttfb = time.perf_counter() - sent
+                    return resp.status, resp.headers, await resp.read()
+
+        start = time.perf_counter()
+        try:
+            status, _, body = await self.scheduler.arun(send, errors=(aiohttp.ClientConnectionError,))
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            self.request_log.record(method, api, params, None, time.perf_counter() - start)
+            raise
+        wall = time.perf_counter() - start
+
+        if status not in (200, 302):
+            self.request_log.record(method, api, params, status, wall, ttfb=ttfb, size=len(body))
+            raise requests.RequestException("{} {} failed with status {}".format(method, api, status))
+
+        start = time.perf_counter()
+        data = loads(body)
+        self.request_log.record(method, api, params, status, wall,
+                                ttfb=ttfb,
+                                size=len(body),
+                                decode=time.perf_counter() - start,
+                                rows=response_rows(data))
+        return data
+
+    async def get_event_types(self) -> list:
+        return list(await self.get_eve_unique_values(counts="no", field="event_type"))
+
+    async def get_eve_fields_graph_nx(self, **kwargs) -> "nx.Graph":
+        return fields_graph_nx(await self.get_eve_fields_graph(**kwargs))
+
+    async def get_eve_unique_values(self, spec: QuerySpec | None = None, **kwargs) -> dict:
+        return await self.get_data(api="rest/rules/es/unique_values/", qParams=kwargs, spec=spec)
+
+    async def get_events_tail(self, spec: QuerySpec | None = None, **kwargs) -> list:
+        data = await self.get_data(api="rest/rules/es/events_tail/", qParams=kwargs, spec=spec)
+        return [d for d in data.get("results", [])]
+
+    async def get_events_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs) -> pd.DataFrame:
+        return flatten_events(await self.get_events_tail(spec=spec, **kwargs), fields)
+
+    async def get_alerts_tail(self, spec: QuerySpec | None = None, **kwargs) -> list:
+        data = await self.get_data(api="rest/rules/es/alerts_tail/", qParams=kwargs, spec=spec)
+        return [d.get("_source", {}) for d in data.get("results", [])]
+
+    async def get_alerts_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs) -> pd.DataFrame:
+        return flatten_events(await self.get_alerts_tail(spec=spec, **kwargs), fields)
+
+    def tail_events(self, since=None, **kwargs) -> "AsyncEventTail":
+        """
+        Out: incremental tail whose poll coroutine returns only events newer than the last poll
+        """
+        return AsyncEventTail(self, self.get_events_tail, since, **kwargs)
+
+    def tail_alerts(self, since=None, **kwargs) -> "AsyncEventTail":
+        return AsyncEventTail(self, self.get_alerts_tail, since, **kwargs)
+
+    async def iter_events_tail(self, spec: QuerySpec | None = None, **kwargs):
+        async for chunk in self._iter_tail(self.get_events_tail, spec, **kwargs):
+            yield chunk
+
+    async def iter_events_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs):
+        async for chunk in self.iter_events_tail(spec, **kwargs):
+            yield flatten_events(chunk, fields)
+
+    async def iter_alerts_tail(self, spec: QuerySpec | None = None, **kwargs):
+        async for chunk in self._iter_tail(self.get_alerts_tail, spec, **kwargs):
+            yield chunk
+
+    async def iter_alerts_df(self, fields: list | None = None, spec: QuerySpec | None = None, **kwargs):
+        async for chunk in self.iter_alerts_tail(spec, **kwargs):
+            yield flatten_events(chunk, fields)
+
+    async def _iter_tail(self, getter, spec: QuerySpec | None = None, **kwargs):
+        spec = self._window_spec(spec, kwargs)
+        if spec.page_size == 0:
+            raise ValueError("paginated iteration requires page size to be set")
+
+        to_ms = spec.to_date
+        seen = set()
+        while to_ms >= spec.from_date:
+            page = await getter(spec=spec.with_window(spec.from_date, to_ms), **kwargs)
+            fresh, to_ms, seen = tail_cursor_step(page, to_ms, seen, spec.page_size)
+            if len(fresh) > 0:
+                yield fresh
+            if to_ms is None:
+                return
+
+    async def get_events_df_sliced(self,
+                                   slices: int = 4,
+                                   fields: list | None = None,
+                                   spec: QuerySpec | None = None,
+                                   **kwargs) -> pd.DataFrame:
+        """
+        Out: pandas dataframe of all events in query window, newest first
+
+        Same as in blocking connector, but slices are bounded by the in-flight semaphore rather than a thread pool.
+        """
+        return flatten_events(await self._fetch_sliced(self.get_events_tail, slices, spec=spec, **kwargs), fields)
+
+    async def get_alerts_df_sliced(self,
+                                   slices: int = 4,
+                                   fields: list | None = None,
+                                   spec: QuerySpec | None = None,
+                                   **kwargs) -> pd.DataFrame:
+        return flatten_events(await self._fetch_sliced(self.get_alerts_tail, slices, spec=spec, **kwargs), fields)
+
+    async def _fetch_sliced(self,
+                            getter,
+                            slices: int,
+                            min_slice_ms: int = 1000,
+                            spec: QuerySpec | None = None,
+                            **kwargs) -> list:
+        spec = self._window_spec(spec, kwargs)
+        if spec.page_size == 0:
+            raise ValueError("sliced fetch requires page size to be set")
+        if slices < 1:
+            raise ValueError("slices must be positive integer")
+
+        async def fetch(a: int, b: int) -> list:
+            page = await getter(spec=spec.with_window(a, b), **kwargs)
+            if len(page) < spec.page_size:
+                return page
+            if b - a < min_slice_ms:
+                warnings.warn("slice {}-{} is full at minimum width, some documents could be skipped".format(a, b))
+                return page
+            parts = await asyncio.gather(*(fetch(sa, sb) for sa, sb in split_window(a, b, 2)))
+            return [d for p in parts for d in p]
+
+        parts = await asyncio.gather(*(fetch(a, b) for a, b in split_window(spec.from_date, spec.to_date, slices)))
+        docs = [d for p in parts for d in p]
+
+        if len(docs) == 0:
+            return docs
+        order = doc_times_ms(docs).sort_values(ascending=False, kind="stable").index
+        return [docs[i] for i in order]
+
+    async def get_eve_fields_graph(self, spec: QuerySpec | None = None, **kwargs) -> dict:
+        return await self.get_data(api="rest/rules/es/graph_agg/", qParams=kwargs, spec=spec)
+
+    async def get_unique_fields(self, event_type=None, spec: QuerySpec | None = None) -> list:
+        data = await self.get_data(api="rest/rules/es/unique_fields/", qParams={
+            "event_type": event_type
+        } if event_type not in (None, "all") else None, ignore_time=False, spec=spec)
+        return data.get("fields", [])
+
+    async def retrosearch(self, domains: list[str], batchsize: int = 50, max_url_bytes: int = 8000) -> pd.DataFrame:
+        """
+        Same as blocking retrosearch, but all batches and sub-queries are dispatched at once. Load on elastic is
+        bounded by max_in_flight instead of serial execution. Domains are normalized, escaped and packed within
+        max_url_bytes the same way.
+        """
+        if batchsize > 100:
+            raise ValueError("batch size is too high, more than 100 values is likely to cause failed elastic query")
+
+        spec = self.query_spec()
+
+        async def query(q: tuple, i: int) -> tuple[pd.DataFrame, dict]:
+            start = time.perf_counter()
+            result = annotate_retrosearch(await self.get_events_df(spec=spec.replace(qfilter=q[0])), q, i, spec.page_size)
+            return result, retrosearch_timing(q, i, result, time.perf_counter() - start, spec.page_size)
+
+        budget = max_url_bytes - len(self._build_url("rest/rules/es/events_tail/",
+                                                     self._query_params(spec=spec.replace(qfilter="*")))) + 1
+        batches = pack_retrosearch_domains(domains, budget, batchsize)
+        results = await asyncio.gather(*(query(q, i)
+                                         for i, batch in enumerate(batches)
+                                         for q in retrosearch_queries(batch)))
+        return self._collect_retrosearch(results)
+
+
+class AsyncESQueryBuilder(ESQueryBuilder, AsyncRESTSciriusConnector):
+
+    """
+    ESQueryBuilder on top of async connector. post is a coroutine that returns decoded response body.
+    """
 
-        return pd.DataFrame(dict((key, res[key]) for key in self.aggs_cols))
+    async def post(self, spec: QuerySpec | None = None) -> dict:
+        if spec is None:
+            spec = self.search_spec()
+        return await self._post(
+            self.API, spec.index, spec.qfilter, spec.aggs_dict(),
+            qParams=spec.post_params(), time_filter=spec.time_filter, page_size=spec.page_size)
+
+    async def iter_composite(self, chunk_size=1000, spec: QuerySpec | None = None):
+        if spec is None:
+            spec = self.search_spec()
+        after = None
+        while True:
+            content = await self.post(spec.replace(aggs=self.composite_aggs(chunk_size, after), page_size=0))
+            df, after = self._composite_page(content)
+            if len(df) > 0:
+                yield df
+            if after is None:
+                return
+
+    async def get_composite_df(self, chunk_size=1000, spec: QuerySpec | None = None) -> pd.DataFrame:
+        return self._concat_composite([df async for df in self.iter_composite(chunk_size, spec)])
+
+
+def flatten_composite(agg: dict, cols: list, metrics: list = ()) -> pd.DataFrame:
+    """
+    Out: dataframe with one column per composite source, Count column and metric columns, one row per bucket
+    """
+    buckets = agg.get('buckets', [])
+    df = pd.DataFrame({col: [b['key'].get(col) for b in buckets] for col in cols})
+    df['Count'] = pd.Series([b['doc_count'] for b in buckets], dtype='int64')
+    for col in metrics:
+        df[col] = metric_values(buckets, col)
+    return df
+
+
+def flatten_terms(agg: dict, cols: list, metrics: list = ()) -> pd.DataFrame:
+    """
+    Out: dataframe of nested terms aggregation, one row per leaf bucket in depth first order
+
+    Sub-aggregation of level n is named str(n + 1), as built by ESQueryBuilder.add_aggs. Levels are walked
+    breadth first without recursion, each level kept as key array and parent index array. Key columns of leaf
+    rows are then gathered with numpy indexing. Buckets that end above deepest level have missing deeper keys.
+    """
+    keys, parents, positions = [], [], []
+    leaf_levels, leaf_idx, counts, leaf_buckets = [], [], [], []
+
+    buckets = agg.get('buckets', [])
+    parent = np.zeros(len(buckets), dtype=np.int64)
+    depth = 0
+    while len(buckets) > 0 and depth < len(cols):
+        level_keys = np.empty(len(buckets), dtype=object)
+        level_keys[:] = [b['key'] for b in buckets]
+        keys.append(level_keys)
+        parents.append(parent)
+
+        name = str(depth + 2)
+        children = [b.get(name) for b in buckets]
+        is_leaf = np.fromiter((c is None for c in children), dtype=bool, count=len(buckets))
+
+        idx = np.flatnonzero(is_leaf)
+        if len(idx) == len(buckets):
+            leaf_levels.append(np.full(len(idx), depth))
+            leaf_idx.append(idx)
+            counts.append(np.fromiter((b['doc_count'] for b in buckets), dtype=np.int64, count=len(idx)))
+            leaf_buckets.extend(buckets)
+            break
+        if len(idx) > 0:
+            leaf_levels.append(np.full(len(idx), depth))
+            leaf_idx.append(idx)
+            counts.append(np.fromiter((buckets[i]['doc_count'] for i in idx), dtype=np.int64, count=len(idx)))
+            leaf_buckets.extend(buckets[i] for i in idx)
+
+        inner = np.flatnonzero(~is_leaf)
+        children = [children[i].get('buckets', []) for i in inner]
+        parent = np.repeat(inner, np.fromiter(map(len, children), dtype=np.int64, count=len(children)))
+        buckets = [b for c in children for b in c]
+        depth += 1
+
+    if len(leaf_idx) == 0:
+        return pd.DataFrame(columns=cols + ['Count'] + list(metrics))
+
+    levels = np.concatenate(leaf_levels)
+    rows = np.concatenate(leaf_idx)
+
+    # walk leaves up to the root, one numpy gather per level
+    data = {}
+    path = np.full((len(keys), len(rows)), -1, dtype=np.int64)
+    for depth in range(len(keys) - 1, -1, -1):
+        at = levels >= depth
+        current = np.where(levels == depth, rows, -1)
+        if depth < len(keys) - 1:
+            below = path[depth + 1]
+            current[levels > depth] = parents[depth + 1][below[levels > depth]]
+        path[depth] = current
+        col = np.full(len(rows), np.nan, dtype=object)
+        col[at] = keys[depth][current[at]]
+        data[cols[depth]] = col
+    for col in cols[len(keys):]:
+        data[col] = np.full(len(rows), np.nan, dtype=object)
+
+    # depth first order, positions within each level follow parent order
+    order = np.lexsort(path[::-1])
+    out = {col: data[col][order] for col in cols}
+    out['Count'] = np.concatenate(counts)[order]
+    for col in metrics:
+        out[col] = metric_values(leaf_buckets, col).iloc[order].reset_index(drop=True)
+    return pd.DataFrame(out).infer_objects()
+
+
+def metric_values(buckets: list, col: str) -> pd.Series:
+    """
+    Out: values of metric sub-aggregation col, min and max of date fields are returned as UTC datetimes
+    """
+    values = pd.Series(np.fromiter((b[col]['value'] if col in b and b[col]['value'] is not None else np.nan
+                                    for b in buckets), dtype=np.float64, count=len(buckets)))
+    if len(buckets) > 0 and 'value_as_string' in buckets[0].get(col, {}):
+        return pd.to_datetime(values, unit='ms', utc=True)
+    return values
+
+
+def fields_graph_nx(data: dict) -> "nx.Graph":
+    """
+    Out: networkx graph of graph_agg response
+    """
+    import networkx as nx
+
+    data = data["graph"]
+    graph = nx.Graph()
+    for node in data["nodes"]:
+        graph.add_node(node["index"], field=node["field"], kind=node["kind"])
+    for edge in data["edges"]:
+        graph.add_edge(edge["edge"][0], edge["edge"][1], doc_count=edge["doc_count"])
+    return graph
+
+
+def retrosearch_queries(batch: list[str]) -> tuple:
+    """
+    Out: tuples of (qfilter, match kind, EVE field) for every retrosearch sub-query of a domain batch
+    """
+    return tuple(retrosearch_query(batch, kind) for kind in RETROSEARCH_KINDS)
+
+
+def retrosearch_query(batch: list[str], kind: tuple) -> tuple:
+    template, match, source = kind
+    values = batch if match == "exact" else ["*.{d}".format(d=d) for d in batch]
+    return template.format(domains=" OR ".join(values)), match, source
+
+
+def annotate_retrosearch(result: pd.DataFrame, q: tuple, batch: int, page_size: int) -> pd.DataFrame:
+    if len(result) > 0:
+        result["ioc.type"] = "domain"
+        result["ioc.match"] = q[1]
+        result["ioc.source"] = q[2]
+        result["ioc.value.match"] = result[q[2]]
+
+        result["ioc.batch.count"] = batch
+        if len(result) == page_size:
+            result["ioc.batch.partial"] = True
+        else:
+            result["ioc.batch.partial"] = False
+    return result
+
+
+def tail_cursor_step(page: list, to_ms: int, seen: set, page_size: int) -> tuple[list, int | None, set]:
+    """
+    In: page returned for window ending at to_ms, keys of documents already yielded at to_ms, page size
+    Out: documents not yielded before, next to_ms or None when window is exhausted, new boundary keys
+    """
+    fresh = [d for d in page if len(seen) == 0 or doc_key(d) not in seen]
+    if len(page) < page_size:
+        return fresh, None, seen
+
+    times = doc_times_ms(page)
+    oldest = int(times.min())
+
+    if len(fresh) == 0:
+        # more than page_size documents share one millisecond, cursor cannot make progress
+        warnings.warn("over {} documents at {}, some could be skipped".format(page_size, oldest))
+        return fresh, oldest - 1, set()
+
+    boundary = {doc_key(d) for d, t in zip(page, times) if t == oldest}
+    return fresh, oldest, seen | boundary if oldest == to_ms else boundary
+
+
+def retrosearch_timing(q: tuple,
+                       batch: int,
+                       result: pd.DataFrame,
+                       seconds: float,
+                       page_size: int,
+                       bisected: bool = False) -> dict:
+    return {
+        "batch": batch,
+        "match": q[1],
+        "source": q[2],
+        "rows": len(result),
+        "partial": len(result) == page_size and not bisected,
+        "bisected": bisected,
+        "seconds": seconds,
+    }
+
+
+def pack_retrosearch_domains(domains: list[str], budget: int, max_clauses: int = 100) -> list[list[str]]:
+    """
+    Out: batches of escaped domain values, fewest batches that keep every retrosearch qfilter within budget
+
+    In: raw domain IoC values, URL encoded byte budget of qfilter param, maximum values per query
+
+    Values are packed first-fit decreasing by encoded size of wildcard sub-query, which is the longest of the four.
+    """
+    values = [escape(d) for d in normalize_domains(domains)]
+
+    capacity = budget - retrosearch_overhead()
+    costs = {v: retrosearch_cost(v) for v in values}
+
+    bins = []
+    for v in sorted(values, key=lambda v: costs[v], reverse=True):
+        if costs[v] > capacity:
+            raise ValueError("domain {} does not fit into query budget of {} bytes".format(v, budget))
+        for b in bins:
+            if b[0] >= costs[v] and len(b[1]) < max_clauses:
+                b[0] -= costs[v]
+                b[1].append(v)
+                break
+        else:
+            bins.append([capacity - costs[v], [v]])
+    return [b[1] for b in bins]
+
+
+def retrosearch_overhead() -> int:
+    """
+    Out: URL encoded size of the longest retrosearch query template without values, minus one separator
+    """
+    overhead = max(len(urllib.parse.quote_plus(t.format(domains=""))) for t in (QUERY_RETROSEARCH_SNI,
+                                                                                  QUERY_RETROSEARCH_HTTP_HOST))
+    return overhead - len(urllib.parse.quote_plus(" OR "))
+
+
+def retrosearch_cost(value: str) -> int:
+    """
+    Out: URL encoded size that an escaped value adds to wildcard retrosearch query, separator included
+    """
+    return len(urllib.parse.quote_plus("*." + value)) + len(urllib.parse.quote_plus(" OR "))
+
+
+def normalize_domains(domains: list[str]) -> list[str]:
+    """
+    Out: lowercase, deduplicated domains, without subdomains of other listed domains
+
+    Retrosearch wildcard sub-query of a parent domain already matches all of its subdomains.
+    """
+    uniq = {d.strip().strip(".").lower() for d in domains}
+    uniq.discard("")
+
+    kept = set()
+    for d in sorted(uniq, key=lambda d: d.count(".")):
+        labels = d.split(".")
+        if any(".".join(labels[i:]) in kept for i in range(1, len(labels))):
+            continue
+        kept.add(d)
+    return sorted(kept)
+
+
+# Elasticsearch query string reserved characters
+ESCAPE_TABLE = str.maketrans({c: "\\" + c for c in '\\=+-&|!(){}[]^"~:/'})
 
 
 def escape(string):
     '''
     Escape other elasticsearch reserved characters
     '''
-    return string. \
-        replace('=', r'\='). \
-        replace('+', r'\+'). \
-        replace('-', r'\-'). \
-        replace('&', r'\&'). \
-        replace('|', r'\|'). \
-        replace('!', r'\!'). \
-        replace('(', r'\('). \
-        replace(')', r'\)'). \
-        replace('{', r'\{'). \
-        replace('}', r'\}'). \
-        replace('[', r'\['). \
-        replace(']', r'\]'). \
-        replace('^', r'\^'). \
-        replace('"', r'\"'). \
-        replace('~', r'\~'). \
-        replace(':', r'\:'). \
-        replace('/', r'\/'). \
-        replace('\\', r'\\')
+    return string.translate(ESCAPE_TABLE)
+
+
+def split_window(from_ms: int, to_ms: int, n: int) -> list[tuple[int, int]]:
+    """
+    Out: list of n adjacent, non-overlapping and inclusive millisecond ranges that cover from_ms to to_ms
+    """
+    n = max(1, min(n, to_ms - from_ms + 1))
+    step = (to_ms - from_ms + 1) / n
+    bounds = [from_ms + round(step * i) for i in range(n + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(n)]
+
+
+def doc_times_ms(docs: list) -> pd.Series:
+    """
+    Out: epoch millisecond timestamps of EVE documents, @timestamp is preferred over EVE timestamp
+    """
+    times = pd.to_datetime([d.get("@timestamp", d.get("timestamp")) for d in docs],
+                           utc=True,
+                           errors="coerce",
+                           format="ISO8601")
+    if times.isna().any():
+        raise ValueError("unable to cursor over documents without timestamp")
+    return pd.Series(times.asi8 // 1_000_000)
+
+
+def doc_key(doc: dict) -> str:
+    return json.dumps(doc, sort_keys=True, default=str)
 
 
 def check_str_bool(val: str) -> bool:
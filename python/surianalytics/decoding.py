@@ -0,0 +1,115 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+JSON decoding of API responses. Bodies are parsed straight from bytes, with orjson when it is installed.
+Result arrays can be parsed item by item with ijson, so rows are usable before the body is fully downloaded.
+"""
+
+import json
+import time
+from typing import Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# pure python ijson backend is slower than parsing whole body at once, so it is only used with a compiled one
+STREAMING = ijson is not None and ijson.backend in ("yajl2_c", "yajl2_cffi")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def loads(data: bytes | str):
+    """
+    Out: decoded JSON document, parsed from bytes without decoding them to str first
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ChunkReader():
+
+    """
+    File like reader over an iterable of byte chunks. Counts bytes read and time spent waiting for chunks,
+    so that parse time can be told apart from download time.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        # unread bytes are buffer past offset, consumed prefix is dropped when more data is appended
+        self._buf = bytearray()
+        self._offset = 0
+        self.bytes = 0
+        self.wait = 0.0
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            parts = [bytes(self._buf[self._offset:])]
+            self._buf, self._offset = bytearray(), 0
+            for chunk in self._next_chunks():
+                parts.append(chunk)
+            return b"".join(parts)
+
+        while len(self._buf) - self._offset < size:
+            chunk = next(self._next_chunks(), None)
+            if chunk is None:
+                break
+            if self._offset > 0:
+                del self._buf[:self._offset]
+                self._offset = 0
+            self._buf += chunk
+
+        data = bytes(self._buf[self._offset:self._offset + size])
+        self._offset += len(data)
+        return data
+
+    def _next_chunks(self) -> Iterator[bytes]:
+        """
+        Out: generator of remaining chunks, counting bytes and time spent waiting for each one
+        """
+        while True:
+            start = time.perf_counter()
+            chunk = next(self._chunks, None)
+            self.wait += time.perf_counter() - start
+            if chunk is None:
+                return
+            self.bytes += len(chunk)
+            yield chunk
+
+
+def iter_items(reader: ChunkReader, prefix: str = "results") -> Iterator:
+    """
+    Out: generator of items of array at prefix in JSON document
+
+    Items are yielded as soon as they are parsed when ijson with compiled backend is installed. Otherwise the whole
+    body is read and decoded with loads, which gives the same items.
+    """
+    if STREAMING:
+        # use_float keeps numbers same as json module instead of Decimal
+        yield from ijson.items(reader, prefix + ".item", use_float=True)
+        return
+
+    data = loads(reader.read())
+    for key in prefix.split("."):
+        data = data.get(key, {}) if isinstance(data, dict) else {}
+    yield from data if isinstance(data, list) else []
@@ -0,0 +1,304 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Helpers for turning Suricata EVE JSON documents into pandas dataframes
+"""
+
+import ipaddress
+import json
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 5000
+
+TIME_COLS = ["timestamp", "@timestamp", "http.date", "flow.start", "flow.end"]
+
+# low cardinality fields that are stored as categoricals
+CATEGORICAL_COLS = ["event_type",
+                    "proto",
+                    "app_proto",
+                    "direction",
+                    "alert.category",
+                    "alert.signature"]
+
+IP_COLS = ["src_ip", "dest_ip", "flow.src_ip", "flow.dest_ip"]
+
+# EVE timestamp layout, e.g. 2022-10-12T10:00:00.123456+0000
+EVE_TIME_LEN = 31
+EVE_TIME_LOCAL_LEN = 26
+
+
+class EveFlattener():
+
+    """
+    Flattens nested EVE documents into dotted columns, same as pd.json_normalize with default arguments, but
+    column arrays are filled directly while walking each document.
+
+    Path decisions are cached per event_type and field selection, so every nested key is resolved to its
+    dotted column name only once. Fields limits output to listed dotted paths, a path pointing to an object
+    keeps that object as a single value.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk size must be positive integer")
+        self.chunk_size = chunk_size
+        # (event_type, fields) -> {(parent path, key): (path, keep, descend)}
+        self._schemas = {}
+
+    def schema(self, event_type: str, fields: Iterable[str] | None = None) -> list:
+        """
+        Out: dotted paths seen so far for event type, including intermediate objects
+        """
+        return [p[0] for p in self._schemas.get((event_type, _fields_key(fields)), {}).values()]
+
+    def flatten(self, events: Iterable[dict], fields: Iterable[str] | None = None) -> pd.DataFrame:
+        chunks = list(self.flatten_chunks(events, fields))
+        if len(chunks) == 0:
+            return pd.DataFrame()
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, axis=0, ignore_index=True)
+
+    def flatten_chunks(self, events: Iterable[dict], fields: Iterable[str] | None = None) -> Iterator[pd.DataFrame]:
+        """
+        Out: generator of dataframes, each built from at most chunk_size documents
+        """
+        fields = _fields_key(fields)
+        chunk = []
+        for doc in events:
+            chunk.append(doc)
+            if len(chunk) == self.chunk_size:
+                yield self._flatten_chunk(chunk, fields)
+                chunk = []
+        if len(chunk) > 0:
+            yield self._flatten_chunk(chunk, fields)
+
+    def _flatten_chunk(self, docs: list, fields: frozenset | None) -> pd.DataFrame:
+        size = len(docs)
+        cols = {}
+
+        if fields is not None:
+            prefixes = {".".join(f.split(".")[:i]) for f in fields for i in range(1, f.count(".") + 1)}
+        else:
+            prefixes = None
+
+        for i, doc in enumerate(docs):
+            event_type = doc.get("event_type")
+            paths = self._schemas.get((event_type, fields))
+            if paths is None:
+                paths = self._schemas[(event_type, fields)] = {}
+
+            stack = [("", iter(doc.items()))]
+            while len(stack) > 0:
+                parent, items = stack[-1]
+                for key, val in items:
+                    resolved = paths.get((parent, key))
+                    if resolved is None:
+                        path = key if parent == "" else parent + "." + key
+                        resolved = paths[(parent, key)] = (path,
+                                                           fields is None or path in fields,
+                                                           prefixes is None or path in prefixes)
+                    path, keep, descend = resolved
+
+                    if isinstance(val, dict) and (fields is None or not keep):
+                        if descend and len(val) > 0:
+                            stack.append((path, iter(val.items())))
+                            break
+                        continue
+
+                    if not keep:
+                        continue
+
+                    col = cols.get(path)
+                    if col is None:
+                        col = cols[path] = [np.nan] * size
+                    col[i] = np.nan if val is None else val
+                else:
+                    stack.pop()
+
+        return pd.DataFrame(cols, index=pd.RangeIndex(size))
+
+
+def _fields_key(fields: Iterable[str] | None) -> frozenset | None:
+    return None if fields is None else frozenset(fields)
+
+
+DEFAULT_FLATTENER = EveFlattener()
+
+
+def flatten_events(events: Iterable[dict], fields: Iterable[str] | None = None) -> pd.DataFrame:
+    """
+    Out: dataframe of flattened EVE documents, drop-in replacement for pd.json_normalize
+
+    Uses shared flattener, so path cache is reused between calls.
+    """
+    return DEFAULT_FLATTENER.flatten(events, fields)
+
+
+def iter_eve(path: str,
+             fields: Iterable[str] | None = None,
+             chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Out: generator of flattened dataframes from EVE JSON file, each holding at most chunk_size events
+    """
+    flattener = EveFlattener(chunk_size=chunk_size)
+    with open(path, "r") as handle:
+        yield from flattener.flatten_chunks((json.loads(line) for line in handle if line.strip() != ""), fields)
+
+
+def read_eve(path: str,
+             fields: Iterable[str] | None = None,
+             chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Out: dataframe of flattened EVE JSON file, file is parsed in chunks to bound intermediate memory use
+    """
+    chunks = list(iter_eve(path, fields, chunk_size))
+    if len(chunks) == 0:
+        return pd.DataFrame()
+    return pd.concat(chunks, axis=0, ignore_index=True)
+
+
+def optimize_dtypes(df: pd.DataFrame,
+                    categorical: list = CATEGORICAL_COLS,
+                    ip_columns: list = IP_COLS,
+                    time_columns: list = TIME_COLS,
+                    max_cardinality_ratio: float = 0.1) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Out: dataframe with compact dtypes, report of per column memory use before and after
+
+    Listed low cardinality columns and any other string column whose unique value ratio does not exceed
+    max_cardinality_ratio become categoricals. IP address columns become categoricals ordered by numeric address,
+    so they are stored as integer codes and sort correctly. Time columns are parsed into UTC datetimes.
+    """
+    before = df.memory_usage(deep=True, index=False)
+    dtypes_before = df.dtypes.astype(str)
+
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if col in time_columns:
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                df[col] = parse_eve_time(series)
+        elif col in ip_columns:
+            df[col] = ip_categorical(series)
+        elif series.dtype == "object" and len(series) > 0:
+            try:
+                if col in categorical or series.nunique(dropna=True) / len(series) <= max_cardinality_ratio:
+                    df[col] = series.astype("category")
+            except TypeError:
+                # unhashable values, such as lists
+                continue
+
+    after = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype_before": dtypes_before,
+        "dtype_after": df.dtypes.astype(str),
+        "bytes_before": before,
+        "bytes_after": after,
+    })
+    report["saved"] = report.bytes_before - report.bytes_after
+    return df, report
+
+
+def concat_optimized(frames: list) -> pd.DataFrame:
+    """
+    Out: dataframes returned by optimize_dtypes concatenated, without optimizing them again
+
+    Categorical columns stay categorical with union of categories, IP address categories stay ordered by address.
+    """
+    frames = [f for f in frames if len(f) > 0]
+    if len(frames) == 0:
+        return pd.DataFrame()
+    df = pd.concat(frames, axis=0, ignore_index=True)
+    for col in df.columns:
+        dtypes = [f[col].dtype for f in frames if col in f.columns]
+        if isinstance(df[col].dtype, pd.CategoricalDtype) or \
+                not any(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            continue
+        try:
+            parts = [f[col].astype("category").cat.as_unordered() if col in f.columns
+                     else pd.Categorical([None] * len(f)) for f in frames]
+        except TypeError:
+            # unhashable values arrived, such as lists, column stays object
+            continue
+        cat = pd.api.types.union_categoricals(parts)
+        if any(isinstance(d, pd.CategoricalDtype) and d.ordered for d in dtypes):
+            try:
+                # only categories are sorted, codes are remapped
+                cat = cat.reorder_categories(sorted(cat.categories, key=ip_sort_key), ordered=True)
+            except (ValueError, TypeError):
+                pass
+        df[col] = pd.Series(cat, index=df.index)
+    return df
+
+
+def parse_eve_time(series: pd.Series) -> pd.Series:
+    """
+    Out: UTC datetime series
+
+    EVE timestamps have fixed layout, so local time and offset are sliced out and converted with numpy
+    instead of letting pandas guess the format. Anything else falls back to generic ISO8601 parsing.
+    """
+    values = series.dropna()
+    if len(values) == 0 or values.dtype != "object" or not isinstance(values.iloc[0], str):
+        return pd.to_datetime(series, errors="coerce", utc=True)
+
+    lengths = values.str.len()
+    if not ((lengths == EVE_TIME_LEN).all() and (values.str.slice(10, 11) == "T").all()):
+        return pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601")
+
+    try:
+        local = values.str.slice(0, EVE_TIME_LOCAL_LEN).to_numpy(dtype="datetime64[us]")
+    except ValueError:
+        return pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601")
+
+    offsets = values.str.slice(EVE_TIME_LOCAL_LEN)
+    minutes = {o: _offset_minutes(o) for o in offsets.unique()}
+    if None in minutes.values():
+        return pd.to_datetime(series, errors="coerce", utc=True, format="ISO8601")
+
+    utc = local - offsets.map(minutes).to_numpy(dtype="int64").astype("timedelta64[m]")
+    parsed = pd.Series(pd.DatetimeIndex(utc.astype("datetime64[ns]")).tz_localize("UTC"), index=values.index)
+    return parsed.reindex(series.index)
+
+
+def _offset_minutes(offset: str) -> int | None:
+    if len(offset) != 5 or offset[0] not in "+-" or not offset[1:].isdigit():
+        return None
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    return -minutes if offset[0] == "-" else minutes
+
+
+def ip_categorical(series: pd.Series) -> pd.Series:
+    """
+    Out: categorical of IP addresses, categories ordered by address family and numeric value
+
+    Series is returned unchanged if it holds anything other than IP address strings.
+    """
+    try:
+        addrs = sorted((ip_sort_key(v), v) for v in series.dropna().unique())
+    except (ValueError, TypeError):
+        return series
+    dtype = pd.CategoricalDtype(categories=[a[1] for a in addrs], ordered=True)
+    return series.astype(dtype)
+
+
+def ip_sort_key(value: str) -> tuple[int, int]:
+    addr = ipaddress.ip_address(value)
+    return addr.version, int(addr)
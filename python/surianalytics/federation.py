@@ -0,0 +1,208 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Fan out of one query to many scirius managers and tenants, with results merged into a single dataframe
+"""
+
+import dataclasses
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import pandas as pd
+
+from .connectors import ESQueryBuilder, RESTSciriusConnector
+
+# columns added to merged results, mapped to report fields
+SOURCE_COLS = {
+    "federation.target": "target",
+    "federation.host": "host",
+    "federation.tenant": "tenant",
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Target():
+
+    """
+    One query target, a tenant on a scirius manager. Name defaults to host and tenant.
+    """
+
+    host: str
+    token: str
+    tenant: int | str | None = None
+    name: str | None = None
+
+    @property
+    def label(self) -> str:
+        if self.name is not None:
+            return self.name
+        return self.host if self.tenant is None else "{}/{}".format(self.host, self.tenant)
+
+
+class Federation():
+
+    """
+    Runs same query against many targets concurrently. Connectors are shared by targets on the same manager, so
+    tenants of one host reuse pooled connections and the request scheduler of that host.
+
+    Every query returns merged dataframe with federation.target, federation.host and federation.tenant columns,
+    named so that they do not clash with EVE fields such as tenant. Per target latency, row count and
+    error of the last query are kept in report. Failed targets are left out of result instead of failing the
+    whole query, unless raise_errors is set.
+    """
+
+    def __init__(self,
+                 targets: list,
+                 workers: int = 8,
+                 raise_errors: bool = False,
+                 **kwargs) -> None:
+        if len(targets) == 0:
+            raise ValueError("no federation targets")
+        if workers < 1:
+            raise ValueError("workers must be positive integer")
+
+        self.targets = [t if isinstance(t, Target) else Target(*t) for t in targets]
+        self.workers = workers
+        self.raise_errors = raise_errors
+        self.report = pd.DataFrame()
+
+        self._connectors = {}
+        self._builders = {}
+        self._builders_lock = threading.Lock()
+        for target in self.targets:
+            key = (target.host, target.token)
+            if key not in self._connectors:
+                self._connectors[key] = RESTSciriusConnector(scirius_host=target.host,
+                                                             scirius_token=target.token,
+                                                             **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # builders share sessions of connectors
+        for conn in self._connectors.values():
+            conn.close()
+
+    def connector(self, target: Target) -> RESTSciriusConnector:
+        return self._connectors[(target.host, target.token)]
+
+    def set_query_timeframe(self, from_date, to_date) -> object:
+        for conn in self._connectors.values():
+            conn.set_query_timeframe(from_date, to_date)
+        return self
+
+    def set_query_delta(self, hours=0, minutes=0) -> object:
+        for conn in self._connectors.values():
+            conn.set_query_delta(hours=hours, minutes=minutes)
+        return self
+
+    def set_page_size(self, size: int) -> object:
+        for conn in self._connectors.values():
+            conn.set_page_size(size)
+        return self
+
+    def get_events_df(self, fields: list | None = None, **kwargs) -> pd.DataFrame:
+        return self.run(lambda conn, target: conn.get_events_df(fields=fields,
+                                                                spec=conn.query_spec(tenant=target.tenant),
+                                                                **kwargs))
+
+    def get_alerts_df(self, fields: list | None = None, **kwargs) -> pd.DataFrame:
+        return self.run(lambda conn, target: conn.get_alerts_df(fields=fields,
+                                                                spec=conn.query_spec(tenant=target.tenant),
+                                                                **kwargs))
+
+    def search(self,
+               configure: Callable[[ESQueryBuilder], None],
+               composite: bool = False,
+               chunk_size: int = 1000) -> pd.DataFrame:
+        """
+        Out: merged flattened aggregation of every target
+
+        configure is called with a fresh ESQueryBuilder per target, with tenant and time range already set,
+        and adds index, qfilter and aggs. Composite aggregation is paged to the end when composite is set.
+        """
+        def query(conn: RESTSciriusConnector, target: Target) -> pd.DataFrame:
+            builder = self._builder(target)
+            builder.reset()
+            builder.set_tenant(target.tenant)
+            builder.set_query_timeframe(conn.from_date, conn.to_date)
+            configure(builder)
+            if composite:
+                return builder.get_composite_df(chunk_size)
+            resp = builder.post()
+            if resp.status_code not in (200, 302):
+                raise ValueError("search failed with status {}".format(resp.status_code))
+            return builder.flatten_aggregation(resp.json())
+
+        return self.run(query)
+
+    def run(self, query: Callable[[RESTSciriusConnector, Target], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Out: results of query for all targets, concatenated with source columns
+
+        query is called concurrently with connector and target, and must return a dataframe.
+        """
+        def timed(target: Target) -> tuple[pd.DataFrame | None, dict]:
+            start = time.perf_counter()
+            try:
+                df = query(self.connector(target), target)
+                error = None
+            except Exception as err:
+                if self.raise_errors:
+                    raise
+                df, error = None, "{}: {}".format(type(err).__name__, err)
+            return df, {
+                "target": target.label,
+                "host": target.host,
+                "tenant": target.tenant,
+                "seconds": time.perf_counter() - start,
+                "rows": 0 if df is None else len(df),
+                "error": error,
+            }
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(self.targets))) as pool:
+            results = list(pool.map(timed, self.targets))
+
+        self.report = pd.DataFrame([r for _, r in results])
+
+        frames = []
+        for df, rec in results:
+            if df is None or len(df) == 0:
+                continue
+            df = df.copy()
+            for col, field in reversed(SOURCE_COLS.items()):
+                df.insert(0, col, rec[field])
+            frames.append(df)
+
+        if len(frames) == 0:
+            return pd.DataFrame(columns=list(SOURCE_COLS))
+        return pd.concat(frames, axis=0, ignore_index=True)
+
+    def _builder(self, target: Target) -> ESQueryBuilder:
+        """
+        Out: query builder of target, builders hold mutable state so every target has its own, but they share
+        session and request scheduler of the target connector
+        """
+        with self._builders_lock:
+            if target not in self._builders:
+                self._builders[target] = self.connector(target).query_builder()
+            return self._builders[target]
@@ -0,0 +1,134 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Dotted path filters for nested records, such as host_id services, and for flattened dataframes
+"""
+
+from typing import Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+MODES = ("any", "all")
+
+
+class PathFilter():
+
+    """
+    Compiled set of dotted path predicates. A record matches when every predicate matches.
+
+    Path may cross lists at any depth. With any mode a predicate matches when at least one value reached by path
+    is accepted, with all mode every reached value must be accepted and there must be at least one. Expected value
+    can be a callable predicate, a set of accepted values, or a value compared for equality.
+    """
+
+    def __init__(self, filters: dict, mode: str = "any") -> None:
+        if mode not in MODES:
+            raise ValueError("mode must be one of {}".format(", ".join(MODES)))
+        self.mode = mode
+        self.predicates = [(tuple(path.split(".")), path, val, accept(val)) for path, val in filters.items()]
+
+    def match(self, record) -> bool:
+        return all(self._match_path(record, keys, test) for keys, _, _, test in self.predicates)
+
+    def _match_path(self, record, keys: tuple, test: Callable[[object], bool]) -> bool:
+        values = path_values(record, keys)
+        reduce = any if self.mode == "any" else all
+        return len(values) > 0 and reduce(test(v) for v in values)
+
+    def filter(self, records: Iterable) -> list:
+        return [r for r in records if self.match(r)]
+
+    def mask(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Out: boolean mask of dataframe rows that match
+
+        Path that names a column is compared column-wise. Otherwise the longest column prefix of path is used
+        and remaining keys are walked in each cell, for columns that hold nested lists or objects.
+        """
+        mask = pd.Series(True, index=df.index)
+        for keys, path, val, test in self.predicates:
+            if path in df.columns:
+                mask &= column_mask(df[path], val, test, self.mode)
+                continue
+
+            col, rest = None, None
+            for i in range(len(keys) - 1, 0, -1):
+                if ".".join(keys[:i]) in df.columns:
+                    col, rest = ".".join(keys[:i]), keys[i:]
+                    break
+            if col is None:
+                return pd.Series(False, index=df.index)
+
+            mask &= pd.Series([self._match_path(v, rest, test) for v in df[col].to_numpy(dtype=object)],
+                              index=df.index, dtype=bool)
+        return mask
+
+    def filter_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df[self.mask(df)]
+
+
+def accept(val) -> Callable[[object], bool]:
+    if callable(val):
+        return val
+    if isinstance(val, (set, frozenset)):
+        return lambda v: v in val
+    return lambda v: v == val
+
+
+def path_values(record, keys: tuple) -> list:
+    """
+    Out: every value reached by following keys from record, lists are expanded at any depth
+    """
+    out = []
+    stack = [(record, 0)]
+    while len(stack) > 0:
+        item, depth = stack.pop()
+        if isinstance(item, list):
+            stack.extend((sub, depth) for sub in reversed(item))
+        elif depth == len(keys):
+            out.append(item)
+        elif isinstance(item, dict) and keys[depth] in item:
+            stack.append((item[keys[depth]], depth + 1))
+    return out
+
+
+def column_mask(series: pd.Series, val, test: Callable[[object], bool], mode: str) -> pd.Series:
+    """
+    Out: boolean mask of column values accepted by test, list cells are reduced with any or all
+
+    Plain values and sets are compared with vectorized pandas operations when column holds no lists.
+    """
+    values = series.to_numpy(dtype=object)
+    is_list = np.fromiter((isinstance(v, list) for v in values), dtype=bool, count=len(values))
+    if not is_list.any():
+        if isinstance(val, (set, frozenset)):
+            return series.isin(val).astype(bool)
+        if not callable(val):
+            return (series == val).fillna(False).astype(bool)
+        return pd.Series([bool(test(v)) for v in values], index=series.index, dtype=bool)
+
+    reduce = any if mode == "any" else all
+    return pd.Series([(len(v) > 0 and reduce(test(x) for x in v)) if isinstance(v, list) else bool(test(v))
+                      for v in values], index=series.index, dtype=bool)
+
+
+def filter_records(records: Iterable, mode: str = "any", **filters) -> list:
+    return PathFilter(filters, mode).filter(records)
+
+
+def filter_df(df: pd.DataFrame, mode: str = "any", **filters) -> pd.DataFrame:
+    return PathFilter(filters, mode).filter_df(df)
@@ -0,0 +1,147 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Per request timing records of scirius API calls, to tell apart time spent on server, network and decoding
+"""
+
+import hashlib
+import json
+import threading
+import time
+import warnings
+from collections import deque
+from typing import Callable
+
+import pandas as pd
+
+RECORD_COLUMNS = ["time", "method", "endpoint", "params_hash", "status",
+                  "wall", "ttfb", "bytes", "decode", "rows"]
+
+SUMMARY_METRICS = ["wall", "ttfb", "decode"]
+
+
+class RequestLog():
+
+    """
+    Bounded in-memory log of request records. Oldest records are dropped once maxlen is reached.
+
+    Record times are in seconds. wall covers sending the request and reading the full body, ttfb ends when
+    response headers arrive, decode is JSON parsing on client side. Hooks are called with every record dict,
+    for example to export them, and exceptions raised by hooks are turned into warnings.
+    """
+
+    def __init__(self, maxlen: int = 10000) -> None:
+        if maxlen < 1:
+            raise ValueError("request log size must be positive integer")
+        self._records = deque(maxlen=maxlen)
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add_hook(self, hook: Callable[[dict], None]) -> Callable[[dict], None]:
+        self._hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook: Callable[[dict], None]) -> None:
+        self._hooks.remove(hook)
+
+    def record(self,
+               method: str,
+               endpoint: str,
+               params: dict | None,
+               status: int | None,
+               wall: float,
+               ttfb: float | None = None,
+               size: int | None = None,
+               decode: float | None = None,
+               rows: int | None = None) -> dict:
+        rec = {
+            "time": time.time(),
+            "method": method,
+            "endpoint": endpoint,
+            "params_hash": params_hash(params),
+            "status": status,
+            "wall": wall,
+            "ttfb": ttfb,
+            "bytes": size,
+            "decode": decode,
+            "rows": rows,
+        }
+        with self._lock:
+            self._records.append(rec)
+        for hook in list(self._hooks):
+            try:
+                hook(rec)
+            except Exception as err:
+                warnings.warn("request log hook failed: {}".format(err))
+        return rec
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    def to_df(self) -> pd.DataFrame:
+        with self._lock:
+            records = list(self._records)
+        df = pd.DataFrame(records, columns=RECORD_COLUMNS)
+        df["time"] = pd.to_datetime(df["time"], unit="s", utc=True)
+        return df
+
+    def summary(self, percentiles: tuple = (0.5, 0.9, 0.99)) -> pd.DataFrame:
+        """
+        Out: request count, bytes and rows totals, and timing percentiles per method and endpoint
+        """
+        df = self.to_df()
+        if df.empty:
+            columns = ["requests", "errors", "bytes", "rows"] + ["{}_p{}".format(m, int(p * 100))
+                                                                 for m in SUMMARY_METRICS for p in percentiles]
+            return pd.DataFrame(columns=columns,
+                                index=pd.MultiIndex.from_tuples([], names=["method", "endpoint"]))
+
+        # failed requests leave columns as None, which would make them object dtype
+        for col in ("status", "bytes", "rows") + tuple(SUMMARY_METRICS):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        groups = df.groupby(["method", "endpoint"])
+        out = groups.agg(requests=("wall", "size"),
+                         errors=("status", lambda s: int((s.isna() | (s >= 400)).sum())),
+                         bytes=("bytes", "sum"),
+                         rows=("rows", "sum"))
+        for metric in SUMMARY_METRICS:
+            values = groups[metric].quantile(list(percentiles)).unstack()
+            values.columns = ["{}_p{}".format(metric, int(p * 100)) for p in percentiles]
+            out = out.join(values)
+        return out
+
+
+def params_hash(params: dict | None) -> str | None:
+    if params is None:
+        return None
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def response_rows(data) -> int | None:
+    """
+    Out: number of rows in decoded response, None when response has no row list
+    """
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        for key in ("results", "fields"):
+            if isinstance(data.get(key), list):
+                return len(data[key])
+    return None
@@ -0,0 +1,227 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Request scheduling for scirius API. Bounds request rate and concurrency so that parallel queries do not
+overload elasticsearch behind scirius, and retries throttled or failed requests with jittered backoff.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable
+
+import requests
+
+# responses that signal overload, request is retried and concurrency limit is lowered
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# release status of a request that failed with an error that says nothing about server load
+UNSET = object()
+
+
+class RequestScheduler():
+
+    """
+    Token bucket rate limit combined with AIMD concurrency control.
+
+    Concurrency limit starts at initial_concurrency, half of max_concurrency by default, and grows by roughly one
+    slot per limit successful responses. A throttled or 5xx response, or one slower than target_latency seconds,
+    halves the limit. Only requests started after the previous decrease can lower it again, so a burst of failures
+    from one overloaded moment counts once. rate is requests per second, None disables rate limit.
+
+    Retryable responses and connection errors are retried up to retries times, waiting full jitter exponential
+    backoff or Retry-After header when server sends one.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = 10,
+                 rate: float | None = None,
+                 burst: int | None = None,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30,
+                 target_latency: float = 10,
+                 initial_concurrency: int | None = None) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max concurrency must be positive integer")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive number or None")
+        if retries < 0:
+            raise ValueError("retries must be 0 or positive integer")
+        if target_latency <= 0:
+            raise ValueError("target latency must be positive number")
+        if initial_concurrency is not None and not 1 <= initial_concurrency <= max_concurrency:
+            raise ValueError("initial concurrency must be between 1 and max concurrency")
+
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate or 1))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.target_latency = target_latency
+
+        self.limit = float(initial_concurrency) if initial_concurrency is not None else max(1.0, max_concurrency / 2)
+        self.in_flight = 0
+        self.retried = 0
+        self.throttled = 0
+
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "retried": self.retried,
+                "throttled": self.throttled,
+            }
+
+    def run(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Out: final response of send, after retries of retryable responses
+
+        Connection errors are raised once retries are exhausted, status codes are left for caller to check.
+        """
+        attempt = 0
+        while True:
+            started = self.acquire()
+            # slot is freed on any exit, exceptions other than connection errors do not adjust limit
+            status = UNSET
+            try:
+                resp = send()
+                status = resp.status_code
+            except (requests.ConnectionError, requests.Timeout):
+                status = None
+                if attempt >= self.retries:
+                    raise
+            finally:
+                self.release(started, status)
+
+            if status is None:
+                time.sleep(self.retry_delay(attempt))
+                attempt += 1
+                continue
+            if status not in RETRY_STATUS or attempt >= self.retries:
+                return resp
+            # dropped response would keep its pooled connection while streamed
+            resp.close()
+            time.sleep(self.retry_delay(attempt, resp.headers.get("Retry-After")))
+            attempt += 1
+
+    async def arun(self, send: Callable[[], Awaitable[tuple]], errors: tuple = ()) -> tuple:
+        """
+        Out: final (status, headers, body) tuple returned by send coroutine function, after retries
+
+        errors lists client exception types that are retried like connection errors.
+        """
+        attempt = 0
+        while True:
+            started = await self.aacquire()
+            # slot is freed on any exit, including cancellation
+            status = UNSET
+            try:
+                result = await send()
+                status = result[0]
+            except (asyncio.TimeoutError, *errors):
+                status = None
+                if attempt >= self.retries:
+                    raise
+            finally:
+                self.release(started, status)
+
+            if status is None:
+                await asyncio.sleep(self.retry_delay(attempt))
+                attempt += 1
+                continue
+            if status not in RETRY_STATUS or attempt >= self.retries:
+                return result
+            await asyncio.sleep(self.retry_delay(attempt, result[1].get("Retry-After")))
+            attempt += 1
+
+    def acquire(self) -> float:
+        """
+        Block until rate and concurrency limits allow a new request
+        Out: monotonic start time, to be passed to release
+        """
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return time.monotonic()
+                self._cond.wait(timeout=wait)
+
+    async def aacquire(self) -> float:
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return time.monotonic()
+            await asyncio.sleep(wait)
+
+    def release(self, started: float, status: int | None | object) -> None:
+        """
+        Free a concurrency slot and adjust limit from response status and latency. None status is a connection error,
+        UNSET is any other failure and leaves limit as is.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            if status is UNSET:
+                pass
+            elif status is None or status in RETRY_STATUS or now - started > self.target_latency:
+                self.throttled += 1
+                if started >= self._last_decrease:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            elif status < 400:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def retry_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """
+        Out: seconds to wait before next attempt
+        """
+        with self._cond:
+            self.retried += 1
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _try_acquire(self) -> float:
+        """
+        Out: 0 if slot and token were taken, otherwise seconds to wait before trying again. Caller holds lock.
+        """
+        if self.in_flight >= int(self.limit):
+            return 0.05
+
+        if self.rate is not None:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+
+        self.in_flight += 1
+        return 0
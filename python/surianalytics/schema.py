@@ -0,0 +1,179 @@
+# Copyright © 2022 Stamus Networks oss@stamus-networks.com
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Column profiles of flattened event data, kept up to date as rows are added and evicted
+"""
+
+import dataclasses
+
+import numpy as np
+import pandas as pd
+
+KINDS = ("scalar", "list", "dict")
+
+# number of smallest value hashes kept per column for cardinality estimate
+SKETCH_SIZE = 1024
+
+
+@dataclasses.dataclass
+class ColumnProfile():
+
+    """
+    Counts of non null, list and dict values of one column, with a sketch of smallest value hashes
+    """
+
+    name: str
+    count: int = 0
+    lists: int = 0
+    dicts: int = 0
+    sketch: np.ndarray = dataclasses.field(default_factory=lambda: np.empty(0, dtype=np.uint64))
+    dtype: str = "object"
+
+    @property
+    def kind(self) -> str:
+        if self.lists > 0:
+            return "list"
+        if self.dicts > 0:
+            return "dict"
+        return "scalar"
+
+    @property
+    def cardinality(self) -> int:
+        """
+        Out: distinct value estimate, exact below sketch size
+        """
+        if len(self.sketch) < SKETCH_SIZE:
+            return len(self.sketch)
+        return int((SKETCH_SIZE - 1) / (float(self.sketch[-1]) / 2**64))
+
+
+class SchemaProfile():
+
+    """
+    Per column kind, null ratio, distinct value estimate and dtype of a dataframe.
+
+    Profile is built once when data lands with reset, then kept in sync with add and remove for rows that enter and
+    leave the data, so widgets never scan cells. Only object columns are inspected per value, other dtypes can not
+    hold lists or dicts. Distinct values are estimated from the k smallest value hashes, which merge across added
+    rows but are not reduced by removed ones, so estimate covers every value seen since reset.
+    """
+
+    def __init__(self, df: pd.DataFrame | None = None) -> None:
+        self.reset(df)
+
+    def reset(self, df: pd.DataFrame | None = None) -> None:
+        self.rows = 0
+        self._columns = {}
+        if df is not None:
+            self.add(df)
+            self.set_dtypes(df)
+
+    def add(self, df: pd.DataFrame) -> None:
+        """
+        Count rows added to data. Columns missing from df count as null for those rows.
+        """
+        self.rows += len(df)
+        for col in df.columns:
+            prof = self._columns.setdefault(col, ColumnProfile(col, dtype=str(df[col].dtype)))
+            count, lists, dicts, values = value_counts(df[col])
+            prof.count += count
+            prof.lists += lists
+            prof.dicts += dicts
+            prof.sketch = merge_sketch(prof.sketch, value_hashes(values))
+
+    def remove(self, df: pd.DataFrame) -> None:
+        """
+        Uncount rows that left data, such as ones evicted from a ring buffer
+        """
+        self.rows = max(self.rows - len(df), 0)
+        for col in df.columns:
+            if col not in self._columns:
+                continue
+            prof = self._columns[col]
+            count, lists, dicts, _ = value_counts(df[col])
+            prof.count = max(prof.count - count, 0)
+            prof.lists = max(prof.lists - lists, 0)
+            prof.dicts = max(prof.dicts - dicts, 0)
+
+    def set_dtypes(self, df: pd.DataFrame) -> None:
+        """
+        Record dtypes of current data, they change when data is recast after rows arrive
+        """
+        for col, dtype in df.dtypes.items():
+            if col in self._columns:
+                self._columns[col].dtype = str(dtype)
+
+    def __contains__(self, col: str) -> bool:
+        return col in self._columns
+
+    def __getitem__(self, col: str) -> ColumnProfile:
+        return self._columns[col]
+
+    def kind(self, col: str) -> str:
+        return self._columns[col].kind if col in self._columns else "scalar"
+
+    def columns(self, kinds: tuple = KINDS) -> list:
+        return [col for col, prof in self._columns.items() if prof.kind in kinds]
+
+    def null_ratio(self, col: str) -> float:
+        if self.rows == 0 or col not in self._columns:
+            return 1.0
+        return 1 - self._columns[col].count / self.rows
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Out: profile as dataframe, one row per column
+        """
+        return pd.DataFrame([{
+            "column": col,
+            "kind": prof.kind,
+            "dtype": prof.dtype,
+            "null_ratio": self.null_ratio(col),
+            "cardinality": prof.cardinality,
+        } for col, prof in self._columns.items()], columns=["column", "kind", "dtype", "null_ratio", "cardinality"])
+
+
+def value_counts(series: pd.Series) -> tuple[int, int, int, pd.Series]:
+    """
+    Out: non null, list and dict value counts of series, and its non null values
+    """
+    values = series[pd.notna(series).to_numpy()]
+    if series.dtype != "object" or len(values) == 0:
+        return len(values), 0, 0, values
+    kinds = values.map(type)
+    return len(values), int((kinds == list).sum()), int((kinds == dict).sum()), values
+
+
+def value_hashes(values: pd.Series) -> np.ndarray:
+    """
+    Out: unique sorted 64 bit hashes of values, lists and dicts are hashed by their string form
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=np.uint64)
+    try:
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    except TypeError:
+        hashes = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+    return np.unique(hashes)
+
+
+def merge_sketch(sketch: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """
+    Out: SKETCH_SIZE smallest hashes of both sorted arrays
+    """
+    if len(hashes) == 0:
+        return sketch
+    return np.union1d(sketch, hashes[:SKETCH_SIZE])[:SKETCH_SIZE]
@@ -0,0 +1,146 @@
+"""
+Cached groupby aggregation of explored EVE data on factorized codes
+"""
+
+import numpy as np
+import pandas as pd
+
+from ..eve import TIME_COLS
+
+# unique values listed per group and column, nunique still counts all of them
+MAX_UNIQUE_VALUES = 10
+
+
+class GroupAggregator(object):
+
+    """
+    Aggregate tab engine. Every column is factorized once per data into integer codes and unique labels, which are
+    shared by all groupby choices. Distinct values per group are counted from unique (group, value) code pairs
+    with numpy, so no per group python arrays are built. Listed unique values are truncated to max_values per group
+    and only turned into lists for groups that are returned. Missing values count as empty string, same as filling
+    them before grouping. Time columns get min and max.
+
+    Results are cached per groupby column and columns until data is replaced with set_data.
+    """
+
+    def __init__(self, data: pd.DataFrame | None = None, max_values: int = MAX_UNIQUE_VALUES) -> None:
+        self.max_values = max_values
+        self.set_data(pd.DataFrame() if data is None else data)
+
+    def set_data(self, data: pd.DataFrame) -> None:
+        self.data = data
+        self._codes = {}
+        self._results = {}
+
+    def aggregate(self, groupby: str, columns: list | None = None, limit: int | None = None) -> pd.DataFrame:
+        """
+        Out: one row per groupby value, with unique and nunique, or min and max, column pairs per column
+
+        Only first limit groups in key order are returned when limit is set.
+        """
+        if groupby not in self.data.columns:
+            return pd.DataFrame()
+        if columns is None:
+            columns = list(self.data.columns)
+        columns = tuple(c for c in columns if c != groupby and c in self.data.columns)
+
+        key = (groupby, columns)
+        if key not in self._results:
+            self._results[key] = (self._aggregate(groupby, columns), {})
+        arrays, frames = self._results[key]
+
+        groups = len(arrays[(groupby, "")])
+        size = groups if limit is None else min(limit, groups)
+        if size not in frames:
+            frames[size] = self._frame(arrays, size)
+        return frames[size]
+
+    def factorize(self, col: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Out: codes of column values and labels they point to, missing values point to empty string label
+        """
+        if col not in self._codes:
+            self._codes[col] = factorize_filled(self.data[col])
+        return self._codes[col]
+
+    def _aggregate(self, groupby: str, columns: tuple) -> dict:
+        """
+        Out: per group arrays of all groups keyed by output column, frames of any size are sliced from them
+        """
+        groups, keys = self.factorize(groupby)
+        # drop labels of groups that do not occur, such as unused categories
+        present = np.bincount(groups, minlength=len(keys)) > 0
+        remap = np.cumsum(present) - 1
+        groups, keys = remap[groups], keys[present]
+
+        # unique column holds kept labels of all groups and group bounds into them, lists are built per frame
+        out = {(groupby, ""): keys}
+        for col in columns:
+            if col in TIME_COLS:
+                times = self.data[col].groupby(groups).agg(["min", "max"]).reindex(np.arange(len(keys)))
+                out[(col, "min")] = times["min"].to_numpy()
+                out[(col, "max")] = times["max"].to_numpy()
+                continue
+            codes, labels = self.factorize(col)
+            nunique, values, bounds = group_unique(groups, len(keys), codes, labels, self.max_values)
+            out[(col, "unique")] = (values, bounds)
+            out[(col, "nunique")] = nunique
+        return out
+
+    def _frame(self, arrays: dict, size: int) -> pd.DataFrame:
+        out = {}
+        for key, val in arrays.items():
+            if key[1] != "unique":
+                out[key] = val[:size]
+                continue
+            values, bounds = val
+            values = values[:bounds[size]].tolist()
+            bounds = bounds[:size + 1].tolist()
+            # slicing python list is much cheaper than creating a numpy view per group
+            out[key] = [values[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        return pd.DataFrame(out)
+
+
+def factorize_filled(series: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Out: codes and object labels of series, missing values get code of empty string label
+
+    Labels are sorted, in category order for categoricals, so groups come out ordered by key.
+    """
+    try:
+        codes, uniques = pd.factorize(series, sort=True, use_na_sentinel=True)
+    except TypeError:
+        # mixed types can not be sorted, unhashable values such as lists are grouped by their string form
+        codes, uniques = pd.factorize(series.map(lambda v: v if pd.api.types.is_scalar(v) else str(v)))
+    labels = np.asarray(uniques, dtype=object)
+
+    missing = codes < 0
+    if missing.any():
+        empty = np.flatnonzero(labels == "")
+        if len(empty) == 0:
+            labels = np.append(labels, "")
+            empty = [len(labels) - 1]
+        codes = np.where(missing, empty[0], codes)
+    return codes, labels
+
+
+def group_unique(groups: np.ndarray,
+                 n_groups: int,
+                 codes: np.ndarray,
+                 labels: np.ndarray,
+                 max_values: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Out: distinct value count of every group, first max_values distinct labels of all groups and group bounds
+    into them
+    """
+    size = max(len(labels), 1)
+    pairs = np.unique(groups.astype(np.int64) * size + codes)
+    pair_groups = pairs // size
+    nunique = np.bincount(pair_groups, minlength=n_groups)
+
+    # pairs are sorted by group, position within group is offset from group start
+    starts = np.searchsorted(pair_groups, np.arange(n_groups))
+    keep = (np.arange(len(pairs)) - starts[pair_groups]) < max_values
+    values = labels[pairs[keep] % size]
+    bounds = np.searchsorted(pair_groups[keep], np.arange(n_groups + 1))
+    return nunique, values, bounds
@@ -4,23 +4,32 @@ Reusable widgets
 
 from ipywidgets.widgets.interaction import display
 
+from ..buffers import EventRingBuffer
 from ..connectors import RESTSciriusConnector
 from ..datamining import min_max_scaling
+from ..eve import TIME_COLS, flatten_events, optimize_dtypes, parse_eve_time
+from ..schema import SchemaProfile
+from .aggregate import GroupAggregator
+from .pushdown import Pushdown
+from .search import Debounce
+from .view import ViewPipeline, filter_value_mask
 
 from copy import deepcopy
+from typing import TYPE_CHECKING
 
 import ipywidgets as widgets
+import requests
 
 import pandas as pd
 import numpy as np
 
-import networkx as nx
-import hvplot.networkx as hvnx
-import holoviews as hv
-
 import pickle
 import os
-import re
+import threading
+
+if TYPE_CHECKING:
+    # graph dependencies are slow to import, they are loaded when graph is drawn
+    import networkx as nx
 
 
 CORE_COLUMNS = ["timestamp",
@@ -47,8 +56,6 @@ DEFAULT_COLUMNS = ["timestamp",
                    "dest_ip",
                    "dest_port"]
 
-TIME_COLS = ["timestamp", "@timestamp", "http.date", "flow.start", "flow.end"]
-
 # ensure that values in these column are not shown as floating points
 NORMALIZE_COLS_FLOAT_TO_INT = ["flow_id", "src_port", "dest_port"]
 
@@ -63,12 +70,21 @@ GRAPH_RESOLUTIONS = [
     "3840x2160"
 ]
 
+# seconds to wait for live tail thread when it is stopped
+TAIL_JOIN_TIMEOUT = 5
+
 
 class Explorer(object):
 
-    def __init__(self, c=RESTSciriusConnector(), debug=False) -> None:
+    """
+    Tabbed EVE explorer. Only Explore tab is built on construction, other tabs are built when first selected.
+    Field name options come from shared field catalog of connector, which is fetched in background.
+    """
+
+    def __init__(self, c: RESTSciriusConnector | None = None, debug=False) -> None:
         # Data connector to backend
-        self._connector = c
+        self._connector = c if c is not None else RESTSciriusConnector()
+        self._catalog = self._connector.field_catalog()
 
         # Outputs
         self._output_eve_explorer = widgets.Output()
@@ -85,8 +101,19 @@ class Explorer(object):
         self.data_filtered = pd.DataFrame()
         self.data_aggregate = pd.DataFrame()
         self.data_uniq = pd.DataFrame()
+        self.data_memory = pd.DataFrame()
+
+        self.data_graph = None
+
+        # live tail thread publishes data, view and profile, downloads replace them
+        self._data_lock = threading.Lock()
 
-        self.data_graph = nx.Graph()
+        self._view = ViewPipeline()
+        # column kinds are profiled once per download and updated per tail poll, widgets never scan cells
+        self._profile = SchemaProfile()
+        self._aggregator = GroupAggregator()
+        # aggregations run in elastic over whole time range, downloaded rows are the fallback
+        self._pushdown = Pushdown(self._connector)
 
         self._cached_queries = []
         self._selected_columns = deepcopy(DEFAULT_COLUMNS)
@@ -101,11 +128,11 @@ class Explorer(object):
         self._register_shared_widgets()
         self._register_search_area()
         self._register_eve_explorer()
-        self._register_eve_aggregator()
-        self._register_uniq()
-        self._register_graph()
         self._register_tabs(debug)
 
+        self._catalog.subscribe(self._update_field_options)
+        self._catalog.fields()
+
     def _register_shared_widgets(self) -> None:
         self._select_agg_col = widgets.Dropdown(description="Group by")
 
@@ -143,8 +170,19 @@ class Explorer(object):
         self._button_download_eve = widgets.Button(description="Download EVE")
         self._button_download_eve.on_click(self._download_eve)
 
+        self._button_live_tail = widgets.ToggleButton(description="Live tail", value=False)
+        self._button_live_tail.observe(self._toggle_live_tail, names="value")
+
+        self._slider_tail_interval = widgets.IntSlider(description="Poll seconds",
+                                                       min=1,
+                                                       max=60,
+                                                       value=10,
+                                                       continuous_update=False)
+
         self._box_search_area = widgets.VBox([self._box_query_params,
-                                              self._button_download_eve])
+                                              self._slider_tail_interval,
+                                              widgets.HBox([self._button_download_eve,
+                                                            self._button_live_tail])])
 
         self._selection_eve_explore_columns = widgets.SelectMultiple(description="Columns", rows=20)
         self._selection_eve_explore_sort = widgets.SelectMultiple(description="Sort", rows=20)
@@ -153,7 +191,12 @@ class Explorer(object):
         self._slider_show_eve = widgets.IntSlider(min=10, max=1000, continuous_update=False)
 
         self._find_filtered_columns = widgets.Dropdown(description="Field")
-        self._find_filtered_value = widgets.Text(description="Value")
+        self._find_filtered_value = widgets.Text(description="Value",
+                                                 placeholder="regex, =exact, 1-1024, 10.0.0.0/8")
+        # typed value is applied once typing pauses, not on every keystroke
+        self._find_filtered_value_applied = widgets.Text()
+        self._debounce_filter_value = Debounce(self._apply_filter_value)
+        self._find_filtered_value.observe(lambda change: self._debounce_filter_value(change["new"]), names="value")
 
         self._find_filtered_event_type = widgets.Dropdown(description="Event Type")
 
@@ -163,7 +206,7 @@ class Explorer(object):
             columns=self._selection_eve_explore_columns,
             sort=self._selection_eve_explore_sort,
             filter_field=self._find_filtered_columns,
-            filter_value=self._find_filtered_value,
+            filter_value=self._find_filtered_value_applied,
             filter_event_type=self._find_filtered_event_type,
         )
 
@@ -187,7 +230,9 @@ class Explorer(object):
         self._button_eve_agg = widgets.Button(description="Aggregate EVE")
         self._interactive_aggregate_eve = widgets.interactive(self._display_eve_agg,
                                                               limit=widgets.IntSlider(min=10, max=1000, continuous_update=False),
-                                                              groupby=self._select_agg_col)
+                                                              groupby=self._select_agg_col,
+                                                              server=widgets.Checkbox(description="Aggregate in elastic",
+                                                                                      value=True))
 
         self._box_eve_agg = widgets.HBox([self._box_search_area,
                                           self._interactive_aggregate_eve])
@@ -197,9 +242,8 @@ class Explorer(object):
                                           self._output_debug])
 
     def _register_uniq(self) -> None:
-        options = self._connector.get_unique_fields()
         self._dropdown_select_field = widgets.Combobox(description="Select field",
-                                                       options=options)
+                                                       options=self._catalog.fields())
 
         self._tickbox_sort_counts = widgets.Checkbox(description="Sort by count", value=False)
         self._tickbox_show_simple = widgets.Checkbox(description="Show only simple values", value=False)
@@ -214,9 +258,12 @@ class Explorer(object):
         self._button_download_uniq = widgets.Button(description="Pull uniq")
         self._button_download_uniq.on_click(self._download_uniq)
 
+        self._tickbox_uniq_server = widgets.Checkbox(description="Count in elastic", value=True)
+
         self._box_uniq = widgets.VBox([self._dropdown_select_field,
                                        self._interactive_display_uniq,
-                                       self._button_download_uniq])
+                                       widgets.HBox([self._button_download_uniq,
+                                                     self._tickbox_uniq_server])])
 
         self._box_uniq = widgets.HBox([self._box_search_area,
                                        self._box_uniq])
@@ -225,8 +272,7 @@ class Explorer(object):
                                        self._output_uniq])
 
     def _register_graph(self) -> None:
-        options = self._connector.get_unique_fields()
-        options = col_cleanup(options)
+        options = col_cleanup(self._catalog.fields())
 
         self._dropdown_graph_node_src = widgets.Combobox(description="Node src", options=options, value="src_ip")
         self._dropdown_graph_node_dst = widgets.Combobox(description="Node dst", options=options, value="dest_ip")
@@ -269,11 +315,17 @@ class Explorer(object):
                                         self._output_graph_feedback])
 
     def _register_tabs(self, debug: bool) -> None:
+        # lazy tabs start as empty placeholders, filled by register function on first selection
+        self._lazy_tabs = {
+            1: (self._register_eve_aggregator, "_box_eve_agg"),
+            2: (self._register_uniq, "_box_uniq"),
+            3: (self._register_graph, "_box_graph"),
+        }
         boxes = [
             (self._box_eve_explorer, "Expore"),
-            (self._box_eve_agg, "Aggregate"),
-            (self._box_uniq, "Uniq"),
-            (self._box_graph, "Graph"),
+            (widgets.VBox(), "Aggregate"),
+            (widgets.VBox(), "Uniq"),
+            (widgets.VBox(), "Graph"),
         ]
         if debug:
             boxes.append((self._output_debug, "Debug"))
@@ -283,7 +335,31 @@ class Explorer(object):
         for i, item in enumerate(boxes):
             self._tabs.set_title(i, item[1])
 
+        self._tabs.observe(self._build_selected_tab, names="selected_index")
+
+    def _build_selected_tab(self, change: dict) -> None:
+        idx = change["new"]
+        if idx not in self._lazy_tabs:
+            return
+        register, box = self._lazy_tabs.pop(idx)
+        register()
+        self._tabs.children[idx].children = [getattr(self, box)]
+
+    def _update_field_options(self, event_type: str | None, fields: list) -> None:
+        # called from catalog refresh thread, only tabs that are already built have field widgets
+        if event_type is not None:
+            return
+        if hasattr(self, "_dropdown_select_field"):
+            self._dropdown_select_field.options = fields
+        if hasattr(self, "_dropdown_graph_node_src"):
+            options = col_cleanup(fields)
+            self._dropdown_graph_node_src.options = options
+            self._dropdown_graph_node_dst.options = options
+
     def _download_eve(self, args: None) -> None:
+        # downloaded data would be overwritten by next tail poll otherwise
+        self._button_live_tail.value = False
+
         self._connector.set_page_size(self._slider_page_size.value)
 
         if self._tickbox_time_use_relative.value is True:
@@ -294,7 +370,7 @@ class Explorer(object):
                                                 to_date=self._picker_date_to.value)
 
         self._output_debug.clear_output()
-        with self._output_debug:
+        with self._output_debug, self._data_lock:
             try:
                 self.data = self._connector.get_events_df(qfilter=self._text_query.value)
             except ConnectionError:
@@ -303,6 +379,12 @@ class Explorer(object):
             self.data = reorder_columns(self.data)
             self.data = df_parse_time_colums(self.data)
             self.data = df_recast_float_to_int(self.data)
+            self.data, self.data_memory = optimize_dtypes(self.data)
+            self._view.set_data(self.data)
+            self._profile.reset(self.data)
+
+            print("memory use %d KiB, %d KiB saved by dtype optimization" %
+                  (self.data_memory.bytes_after.sum() / 1024, self.data_memory.saved.sum() / 1024))
 
             self._selection_eve_explore_columns.options = self._data_column_values()
             self._selection_eve_explore_sort.options = self._data_column_values()
@@ -312,6 +394,9 @@ class Explorer(object):
         self._display_aggregate_event_types()
         display_df(self.data, self._output_eve_explorer)
 
+        self._refresh_eve_show()
+
+    def _refresh_eve_show(self) -> None:
         # initial display update and widget population when user has not interacted yet
         # empty dropdowns / boxes and noisy display otherwise
 
@@ -321,21 +406,98 @@ class Explorer(object):
             columns=self._selection_eve_explore_columns.value,
             sort=self._selection_eve_explore_sort.value,
             filter_field=self._find_filtered_columns.value,
-            filter_value=self._find_filtered_value.value,
+            filter_value=self._find_filtered_value_applied.value,
             filter_event_type=self._find_filtered_event_type.value,
         )
 
+    def _apply_filter_value(self, value: str) -> None:
+        self._find_filtered_value_applied.value = value
+
+    def _toggle_live_tail(self, change: dict) -> None:
+        if change["new"] is True:
+            self._start_live_tail()
+        else:
+            self._stop_live_tail()
+
+    def _start_live_tail(self) -> None:
+        self._connector.set_page_size(self._slider_page_size.value)
+
+        # keep already downloaded events, only newer ones are pulled from now on
+        # downloads are newest first, ring buffer evicts from its first row so it is seeded oldest first
+        with self._data_lock:
+            self._tail_buffer = EventRingBuffer(capacity=self._slider_page_size.value)
+            self._tail_buffer.append(df_oldest_first(self.data))
+            self.data = self._tail_buffer.to_df()
+            self._profile.reset(self.data)
+            self._view.set_data(self.data)
+
+        since = self._connector._to_date_param() if not self.data.empty else pd.Timestamp.now(tz="UTC").to_pydatetime()
+        self._tail = self._connector.tail_events(since=since, qfilter=self._text_query.value)
+
+        self._tail_stop = threading.Event()
+        self._tail_thread = threading.Thread(target=self._live_tail_loop, daemon=True)
+        self._tail_thread.start()
+
+    def _stop_live_tail(self) -> None:
+        if getattr(self, "_tail_stop", None) is not None:
+            self._tail_stop.set()
+        self._tail_stop = None
+
+        # poll in flight is bounded by connector timeouts, loop exits on its own if join gives up
+        thread = getattr(self, "_tail_thread", None)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=TAIL_JOIN_TIMEOUT)
+        self._tail_thread = None
+
+    def _live_tail_loop(self) -> None:
+        stop = self._tail_stop
+        while not stop.wait(self._slider_tail_interval.value):
+            try:
+                events = self._tail.poll()
+            except (OSError, requests.RequestException, ValueError) as err:
+                with self._output_debug:
+                    print("live tail poll to %s failed: %s" % (self._connector.endpoint, err))
+                continue
+
+            if len(events) == 0 or stop.is_set():
+                continue
+
+            # only new events are normalized and optimized, buffered ones already are
+            new = df_oldest_first(df_parse_time_colums(flatten_events(events)))
+            new = new.iloc[-self._tail_buffer.capacity:].reset_index(drop=True)
+            new, _ = optimize_dtypes(df_recast_float_to_int(new))
+
+            with self._data_lock:
+                # download may have replaced data while this poll was running
+                if stop.is_set():
+                    return
+
+                evicted = self._tail_buffer.append(new)
+                self._profile.add(new)
+                self._profile.remove(evicted)
+
+                self.data = reorder_columns(self._tail_buffer.to_df())
+                self._view.set_data(self.data)
+                self._profile.set_dtypes(self.data)
+
+                self._selection_eve_explore_columns.options = self._data_column_values()
+                self._selection_eve_explore_sort.options = self._data_column_values()
+                self._refresh_eve_show()
+
     def _download_uniq(self, args: None) -> None:
         self._output_debug.clear_output()
         with self._output_debug:
-            try:
-                values = self._connector.get_eve_unique_values(counts="yes",
-                                                               field=self._dropdown_select_field.value,
-                                                               qfilter=self._text_query.value)
-                self.data_uniq = pd.DataFrame(values)
-
-            except ConnectionError:
-                print("unable to connect to %s" % self._connector.endpoint)
+            if self._tickbox_uniq_server.value is not True:
+                self._download_uniq_api()
+            else:
+                try:
+                    self.data_uniq, distinct = self._pushdown.unique_values(self._dropdown_select_field.value,
+                                                                            qfilter=self._text_query.value,
+                                                                            known_fields=self._catalog.fields())
+                    print("%d distinct values, %d listed" % (distinct, len(self.data_uniq)))
+                except (ValueError, OSError) as err:
+                    print("elastic aggregation failed, using unique values API: %s" % err)
+                    self._download_uniq_api()
 
         self.data_uniq = pd.DataFrame(self.data_uniq)
         self._cache_params()
@@ -343,6 +505,16 @@ class Explorer(object):
                            checkbox_verify(self._tickbox_show_simple),
                            checkbox_verify(self._tickbox_sort_counts))
 
+    def _download_uniq_api(self) -> None:
+        try:
+            values = self._connector.get_eve_unique_values(counts="yes",
+                                                           field=self._dropdown_select_field.value,
+                                                           qfilter=self._text_query.value)
+            self.data_uniq = pd.DataFrame(values)
+
+        except ConnectionError:
+            print("unable to connect to %s" % self._connector.endpoint)
+
     def _download_graph(self, args: None) -> None:
         self._output_graph_feedback.clear_output()
         with self._output_graph_feedback:
@@ -387,6 +559,10 @@ class Explorer(object):
             display_df(self.data_uniq, self._output_uniq)
 
     def _display_graph(self, args) -> None:
+        import holoviews as hv
+        import hvplot.networkx as hvnx
+        import networkx as nx
+
         self._output_graph.clear_output()
         with self._output_graph:
             if self.data_graph is None or len(self.data_graph) == 0:
@@ -457,7 +633,7 @@ class Explorer(object):
                 df_agg = (
                     self
                     .data
-                    .groupby("event_type")
+                    .groupby("event_type", observed=True)
                     .agg({"event_type": ["count"]})
                 )
                 if df_agg is not None:
@@ -493,23 +669,22 @@ class Explorer(object):
 
         self._output_debug.clear_output()
         with self._output_debug:
-            self.data_filtered = (
-                self
-                .data[self._selected_columns]
-                .sort_values(by=sort_cols)
-            )
-            self.data_filtered = df_filter_value(self.data_filtered, filter_field, filter_value)
-            self.data_filtered = df_filter_value(self.data_filtered, "event_type", filter_event_type)
+            # sort order and filter masks are cached by view, only changed stages are recomputed
+            self.data_filtered = self._view.view(self._selected_columns,
+                                                 tuple(sort_cols),
+                                                 [(filter_field, filter_value),
+                                                  ("event_type", filter_event_type)])
 
-        self._find_filtered_columns.options = self._filtered_column_values()
+        set_options(self._find_filtered_columns, self._filtered_column_values())
 
-        update_values(self._find_filtered_event_type, self.data, "event_type")
+        set_options(self._find_filtered_event_type,
+                    [""] + [str(v) for v in self._view.unique_values("event_type")])
 
-        self._select_agg_col.options = self._filtered_column_values()
+        set_options(self._select_agg_col, self._filtered_column_values())
 
         display_df(self.data_filtered, self._output_eve_explorer)
 
-    def _display_eve_agg(self, limit: int, groupby: str) -> None:
+    def _display_eve_agg(self, limit: int, groupby: str, server: bool = False) -> None:
         pd.set_option('display.max_rows', limit)
         pd.set_option('display.min_rows', limit)
 
@@ -518,31 +693,53 @@ class Explorer(object):
         if groupby in ("", None):
             return
 
-        self.data_aggregate = (
-            df
-            .fillna("")
-            .dropna(axis=1, how="all")
-            .groupby(by=groupby)
-            .agg({
-                item: ["min", "max"] if item in TIME_COLS
-                else ["unique", "nunique"]
-                for item in list(df.columns.values) if item != groupby and item not in self._list_cols
-            })
+        if server is True:
+            self._output_debug.clear_output()
+            with self._output_debug:
+                try:
+                    self.data_aggregate = self._aggregate_server(groupby, limit)
+                    display_df(self.data_aggregate, self._output_eve_agg)
+                    return
+                except (ValueError, OSError) as err:
+                    print("elastic aggregation failed, aggregating downloaded events: %s" % err)
+
+        # aggregator caches per groupby column, so it is only reset when shown data changes
+        if self._aggregator.data is not df:
+            self._aggregator.set_data(df)
+
+        self.data_aggregate = self._aggregator.aggregate(
+            groupby,
+            [item for item in list(df.columns.values) if self._profile.kind(item) == "scalar"],
+            limit=limit,
         )
-        if self.data_aggregate is not None and not self.data_aggregate.empty:
-            self.data_aggregate = self.data_aggregate.reset_index()
 
         if isinstance(self.data_aggregate, pd.DataFrame):
             display_df(self.data_aggregate, self._output_eve_agg)
 
+    def _aggregate_server(self, groupby: str, limit: int) -> pd.DataFrame:
+        """
+        Out: aggregation of selected columns by groupby field over whole query time range, with Explore tab filters
+        """
+        field = self._find_filtered_columns.value
+        event_type = self._find_filtered_event_type.value
+        filters = [
+            (field, self._find_filtered_value_applied.value, self.data[field].dtype if field in self.data else None),
+            # dropdown holds exact event types
+            ("event_type", "=" + event_type if event_type not in ("", None) else "", None),
+        ]
+        return self._pushdown.aggregate(groupby,
+                                        [c for c in self._selected_columns if self._profile.kind(c) == "scalar"],
+                                        qfilter=self._text_query.value,
+                                        filters=filters,
+                                        size=limit,
+                                        known_fields=self._catalog.fields())
+
     def _data_column_values(self) -> list:
         return [] if self.data is None else list(self.data.columns.values)
 
     def _filtered_column_values(self) -> list:
-        self._list_cols = (self.data_filtered.applymap(type) == list).any()
-        self._list_cols = list(self._list_cols.loc[self._list_cols].index)
-
-        return [v for v in list(self.data_filtered.columns.values) if v not in self._list_cols]
+        # nested values can not be grouped or listed as unique values
+        return [v for v in list(self.data_filtered.columns.values) if self._profile.kind(v) == "scalar"]
 
     def _select_default_query(self) -> str:
         if len(self._cached_queries) > 0:
@@ -613,10 +810,19 @@ def df_existing_columns(df: pd.DataFrame, columns=CORE_COLUMNS) -> list:
 def df_parse_time_colums(df: pd.DataFrame, columns=TIME_COLS) -> pd.DataFrame:
     for ts in columns:
         if ts in list(df.columns.values):
-            df[ts] = pd.to_datetime(df[ts], errors="coerce")
+            df[ts] = parse_eve_time(df[ts])
     return df
 
 
+def df_oldest_first(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Out: dataframe sorted by timestamp ascending, rows with same timestamp keep their order
+    """
+    if "timestamp" not in df.columns:
+        return df
+    return df.sort_values(by="timestamp", kind="stable").reset_index(drop=True)
+
+
 def df_recast_float_to_int(df: pd.DataFrame, columns=NORMALIZE_COLS_FLOAT_TO_INT) -> pd.DataFrame:
     cols = [c for c in columns if c in list(df.columns.values)]
     df[cols].fillna(0, inplace=True)
@@ -629,18 +835,7 @@ def df_filter_value(df: pd.DataFrame, col: str, value: str) -> pd.DataFrame:
         return df
     if col not in list(df.columns.values):
         return df
-
-    df = df.loc[pd.notna(df[col])]
-
-    series = df[col]
-    if series.dtype == "object":
-        df = df.loc[series.str.contains(value, flags=re.IGNORECASE)]
-    elif series.dtype == "int64":
-        df = df.loc[series == int(value)]
-    elif series.dtype == "float64":
-        df = df.loc[series.astype(int) == int(value)]
-
-    return df
+    return df.loc[filter_value_mask(df[col], value)]
 
 
 def update_values(w: widgets.Dropdown | widgets.Combobox,
@@ -651,6 +846,14 @@ def update_values(w: widgets.Dropdown | widgets.Combobox,
     w.options = [""] + [str(v) for v in list(df[field].dropna().unique())]
 
 
+def set_options(w: widgets.Dropdown | widgets.Combobox, options: list) -> None:
+    """
+    Assign widget options only when they change, reassigning triggers observers and redraw
+    """
+    if list(w.options) != list(options):
+        w.options = options
+
+
 def checkbox_verify(c: widgets.Checkbox, default=False) -> bool:
     return c.value if isinstance(c.value, bool) else default
 
@@ -659,7 +862,7 @@ def col_cleanup(c: list[str]) -> list:
     return [i for i in c if i not in TIME_COLS and not i.startswith("@")]
 
 
-def nx_add_scaled_doc_count(g: nx.Graph):
+def nx_add_scaled_doc_count(g: "nx.Graph"):
     doc_counts = [attr["doc_count"] for (_, _, attr) in g.edges(data=True)]
 
     doc_counts = np.log2(doc_counts)
@@ -671,6 +874,6 @@ def nx_add_scaled_doc_count(g: nx.Graph):
             attr["scaled_doc_count"] = doc_counts[i]
 
 
-def nx_degree_scale(g: nx.Graph) -> pd.Series | pd.DataFrame:
+def nx_degree_scale(g: "nx.Graph") -> pd.Series | pd.DataFrame:
     degree = [g.degree(n) for n in g.nodes()]
     return min_max_scaling(pd.Series(degree))
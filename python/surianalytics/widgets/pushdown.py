@@ -0,0 +1,157 @@
+"""
+Server side aggregations for Explorer tabs, run over the whole query time range instead of downloaded rows
+"""
+
+from collections import OrderedDict
+
+import pandas as pd
+
+from ..connectors import ESQueryBuilder, RESTSciriusConnector
+from ..eve import TIME_COLS
+from .search import numeric_range
+
+# buckets requested for Uniq tab, distinct count beyond it is still reported
+UNIQ_SIZE = 10000
+
+# aggregation responses kept per Pushdown, least recently used ones are dropped first
+MAX_RESULTS = 64
+
+
+class Pushdown(object):
+
+    """
+    Translates Explorer groupby field, query and filters into ESQueryBuilder terms aggregation with cardinality or
+    min / max metrics, results come out of flatten_aggregation. Filters that elastic can not evaluate with same
+    meaning as local search, such as case insensitive substrings, raise ValueError so caller can fall back to
+    aggregating downloaded data.
+
+    String fields are aggregated on their keyword subfield when field catalog lists one. Index is event index of
+    connector config unless set. Last max_results responses are cached per query spec, so same aggregation over
+    same time range is requested once.
+    """
+
+    def __init__(self,
+                 connector: RESTSciriusConnector,
+                 index: str | None = None,
+                 max_results: int = MAX_RESULTS) -> None:
+        self._connector = connector
+        self.index = connector.event_index if index is None else index
+        self.max_results = max_results
+        self._builder = None
+        self._results = OrderedDict()
+
+    def builder(self) -> ESQueryBuilder:
+        if self._builder is None:
+            self._builder = self._connector.query_builder()
+        builder = self._builder
+        builder.reset()
+        builder.set_index(self.index)
+        builder.set_page_size(0)
+        builder.set_query_timeframe(self._connector.from_date, self._connector.to_date)
+        return builder
+
+    def aggregate(self,
+                  groupby: str,
+                  columns: list,
+                  qfilter: str | None = None,
+                  filters: list | None = None,
+                  size: int = 10,
+                  known_fields: list | None = None) -> pd.DataFrame:
+        """
+        Out: top size groupby values with exact event Count, distinct value estimate of every column and first
+        and last time of time columns
+
+        filters is a list of (field, value, dtype) tuples with same value syntax as Explore tab filter.
+        """
+        known = set(known_fields or [])
+        builder = self.builder()
+        builder.set_qfilter(filter_query(qfilter, filters or [], known))
+        builder.add_aggs(agg_field(groupby, known), groupby, order=True, sort="desc", size=size)
+        for col in columns:
+            if col == groupby:
+                continue
+            if col in TIME_COLS:
+                builder.add_metric(col, "{}.min".format(col), "min")
+                builder.add_metric(col, "{}.max".format(col), "max")
+            else:
+                builder.add_metric(agg_field(col, known), "{}.nunique".format(col), "cardinality")
+        return builder.flatten_aggregation(self._search(builder, builder.search_spec()))
+
+    def unique_values(self,
+                      field: str,
+                      qfilter: str | None = None,
+                      size: int = UNIQ_SIZE,
+                      known_fields: list | None = None) -> tuple[pd.DataFrame, int]:
+        """
+        Out: key and doc_count of top size values of field, and distinct value estimate over whole time range
+        """
+        known = set(known_fields or [])
+        field = agg_field(field, known)
+        builder = self.builder()
+        builder.set_qfilter(filter_query(qfilter, [], known))
+        builder.add_aggs(field, "key", order=True, sort="desc", size=size)
+
+        aggs = builder.search_spec().aggs_dict()
+        aggs["aggs"]["distinct"] = {"cardinality": {"field": field}}
+        content = self._search(builder, builder.search_spec().replace(aggs=aggs))
+
+        df = builder.flatten_aggregation(content).rename(columns={"Count": "doc_count"})
+        return df, int(content.get("aggregations", {}).get("distinct", {}).get("value") or 0)
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def _search(self, builder: ESQueryBuilder, spec) -> dict:
+        key = spec.key()
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        resp = builder.post(spec)
+        if resp.status_code not in (200, 302):
+            raise ValueError("aggregation failed with status {}".format(resp.status_code))
+        self._results[key] = resp.json()
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return self._results[key]
+
+
+def agg_field(field: str, known: set) -> str:
+    """
+    Out: keyword subfield of text field if catalog knows it, field itself otherwise
+    """
+    keyword = "{}.keyword".format(field)
+    return keyword if keyword in known else field
+
+
+def filter_query(qfilter: str | None, filters: list, known: set = frozenset()) -> str:
+    """
+    Out: query string of Explorer query and every set filter, joined with AND
+    """
+    clauses = [qfilter if qfilter not in (None, "") else "*"]
+    for field, value, dtype in filters:
+        if field in ("", None) or value in ("", None):
+            continue
+        clauses.append(filter_clause(field, value, dtype, known))
+    if len(clauses) == 1:
+        return clauses[0]
+    return ESQueryBuilder.filter_join(["({})".format(c) if i == 0 else c for i, c in enumerate(clauses)])
+
+
+def filter_clause(field: str, value: str, dtype, known: set = frozenset()) -> str:
+    """
+    Out: query string clause of one Explore filter, ValueError if elastic would match different events
+
+    Integer value or lo-hi range becomes range query. Exact =value becomes phrase query on keyword subfield, only
+    when value has no letters, as local exact match ignores case and keyword subfield does not. Substrings, regexes
+    and IP ranges are left to local search, their matching depends on field mapping.
+    """
+    if dtype is not None and pd.api.types.is_integer_dtype(dtype):
+        bounds = numeric_range(value[1:] if value.startswith("=") else value)
+        if bounds is None:
+            raise ValueError("{} is not a number or range".format(value))
+        return "{}: [{} TO {}]".format(field, *bounds)
+    keyword = agg_field(field, known)
+    if value.startswith("=") and keyword != field and value.lower() == value.upper():
+        return '{}: "{}"'.format(keyword, value[1:].replace("\\", "\\\\").replace('"', '\\"'))
+    raise ValueError("filter {}: {} has no exact server side equivalent".format(field, value))
@@ -0,0 +1,233 @@
+"""
+Per column search indexes for Explore tab filters
+"""
+
+import bisect
+import ipaddress
+import re
+import socket
+import threading
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from ..eve import ip_sort_key
+
+# inclusive numeric range, such as 1-1024 or -5--1
+NUMERIC_RANGE = re.compile(r"^\s*(-?\d+)\s*-\s*(-?\d+)\s*$")
+
+# characters that make filter value a regex, anything else is matched as plain text
+REGEX_CHARS = frozenset("()[]{}?*+|^$\\.")
+
+
+class SearchIndex(object):
+
+    """
+    Search indexes of dataframe columns, each one built on first search of column and kept until data changes.
+
+    Value syntax is same for every column. Strings match case insensitive regex or plain substring, =value
+    matches whole value. Numbers match integer value or inclusive lo-hi range. IP columns also take CIDR
+    network or first-last address range.
+    """
+
+    def __init__(self, data: pd.DataFrame | None = None) -> None:
+        self.data = pd.DataFrame() if data is None else data
+        self._columns = {}
+
+    def index(self, field: str):
+        if field not in self._columns:
+            self._columns[field] = column_index(self.data[field])
+        return self._columns[field]
+
+    def mask(self, field: str, value: str) -> np.ndarray | None:
+        """
+        Out: boolean mask of rows where field matches value, None if column dtype is not indexed
+        """
+        idx = self.index(field)
+        return None if idx is None else idx.search(value)
+
+
+class LabelIndex(object):
+
+    """
+    Index of string values kept as integer codes into unique labels, as categoricals already are.
+
+    Searches are evaluated on unique labels only, lower cased once when index is built, and mapped to rows with a
+    lookup of codes. IP lookups use addresses of labels sorted into an array, built on first range search.
+    """
+
+    def __init__(self, codes: np.ndarray, labels: list) -> None:
+        self.codes = codes
+        self.labels = labels
+        self._lower = np.array([v.lower() for v in labels], dtype=object)
+        self._addrs = None
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> object:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return cls(series.cat.codes.to_numpy(), [str(v) for v in series.cat.categories])
+        # only string cells are searched, lists and other objects never match
+        values = [v if isinstance(v, str) else None for v in series.to_numpy(dtype=object)]
+        codes, uniques = pd.factorize(np.array(values, dtype=object), use_na_sentinel=True)
+        return cls(codes, list(uniques))
+
+    def search(self, value: str) -> np.ndarray:
+        matched = self.match_labels(value)
+        lookup = np.append(matched, False)
+        # missing values have code -1, which picks the trailing False
+        return lookup[self.codes]
+
+    def match_labels(self, value: str) -> np.ndarray:
+        """
+        Out: boolean array of labels matching value
+        """
+        if value.startswith("="):
+            return self._match_exact(value[1:])
+        addrs = ip_range(value)
+        if addrs is not None:
+            return self._match_addrs(*addrs)
+        if any(c in REGEX_CHARS for c in value):
+            try:
+                pattern = re.compile(value, flags=re.IGNORECASE)
+            except re.error:
+                # incomplete pattern while typing, such as an open bracket, is searched as text
+                return self._match_substring(value)
+            return np.fromiter((pattern.search(v) is not None for v in self.labels),
+                               dtype=bool, count=len(self.labels))
+        return self._match_substring(value)
+
+    def _match_substring(self, value: str) -> np.ndarray:
+        value = value.lower()
+        return np.fromiter((value in v for v in self._lower), dtype=bool, count=len(self._lower))
+
+    def _match_exact(self, value: str) -> np.ndarray:
+        return (self._lower == value.lower()).astype(bool)
+
+    def _match_addrs(self, first: tuple[int, int], last: tuple[int, int]) -> np.ndarray:
+        if self._addrs is None:
+            keys = sorted((key, i) for i, key in enumerate(map(addr_key, self.labels)) if key is not None)
+            self._addrs = ([k for k, _ in keys], np.array([i for _, i in keys], dtype=np.int64))
+
+        addrs, ids = self._addrs
+        matched = np.zeros(len(self.labels), dtype=bool)
+        matched[ids[bisect.bisect_left(addrs, first):bisect.bisect_right(addrs, last)]] = True
+        return matched
+
+
+class NumericIndex(object):
+
+    """
+    Index of numeric column as sorted non null values and their row positions. Value and range lookups are binary
+    searches. Floats match on integer part, same as casting them to int.
+    """
+
+    def __init__(self, series: pd.Series) -> None:
+        valid = pd.notna(series).to_numpy()
+        self.size = len(series)
+        self.is_float = pd.api.types.is_float_dtype(series.dtype)
+        values = series[valid].to_numpy(dtype=np.float64 if self.is_float else np.int64)
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.rows = np.flatnonzero(valid)[order]
+
+    def search(self, value: str) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        bounds = numeric_range(value)
+        if bounds is None:
+            return mask
+        lo, hi = bounds
+        if self.is_float:
+            # integer part of x is in lo..hi
+            left = np.searchsorted(self.values, lo, "left") if lo > 0 else np.searchsorted(self.values, lo - 1, "right")
+            right = np.searchsorted(self.values, hi + 1, "left") if hi >= 0 else np.searchsorted(self.values, hi, "right")
+        else:
+            left = np.searchsorted(self.values, lo, "left")
+            right = np.searchsorted(self.values, hi, "right")
+        mask[self.rows[left:right]] = True
+        return mask
+
+
+def column_index(series: pd.Series) -> LabelIndex | NumericIndex | None:
+    """
+    Out: search index fitting column dtype, None for dtypes that are not indexed, such as datetimes
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == "object":
+        return LabelIndex.from_series(series)
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return None
+    if pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_float_dtype(series.dtype):
+        return NumericIndex(series)
+    return None
+
+
+def numeric_range(value: str) -> tuple[int, int] | None:
+    """
+    Out: inclusive integer bounds of value or lo-hi range, None if value is not a number
+    """
+    m = NUMERIC_RANGE.match(value)
+    if m is not None:
+        lo, hi = int(m.group(1)), int(m.group(2))
+        return min(lo, hi), max(lo, hi)
+    try:
+        num = int(value.strip())
+    except ValueError:
+        return None
+    return num, num
+
+
+def addr_key(value: str) -> tuple[int, int] | None:
+    """
+    Out: address family and numeric value of IP address string, None for other strings
+
+    Same key as ip_sort_key, parsed with inet_pton which is much faster than ipaddress on large label sets.
+    """
+    for family, version in ((socket.AF_INET, 4), (socket.AF_INET6, 6)):
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, value), "big")
+        except OSError:
+            continue
+    return None
+
+
+def ip_range(value: str) -> tuple[tuple[int, int], tuple[int, int]] | None:
+    """
+    Out: first and last address sort keys of CIDR network or first-last range, None for other values
+    """
+    try:
+        if "/" in value:
+            net = ipaddress.ip_network(value.strip(), strict=False)
+            return ((net.version, int(net.network_address)), (net.version, int(net.broadcast_address)))
+        if "-" in value:
+            first, last = (ip_sort_key(v.strip()) for v in value.split("-", 1))
+            return (first, last) if first <= last else (last, first)
+    except ValueError:
+        return None
+    return None
+
+
+class Debounce(object):
+
+    """
+    Calls function with latest arguments once no new call arrived for wait seconds
+    """
+
+    def __init__(self, func: Callable, wait: float = 0.3) -> None:
+        self.func = func
+        self.wait = wait
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.wait, self.func, args=args, kwargs=kwargs)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
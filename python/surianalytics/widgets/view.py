@@ -0,0 +1,109 @@
+"""
+Memoized sort, filter and projection of explored EVE data
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .search import SearchIndex
+
+
+class ViewPipeline(object):
+
+    """
+    Explore tab view of a dataframe, built as sort, filter and column projection stages.
+
+    Sort permutations are cached per sort key tuple and filter masks per field and value, so changing one widget
+    only recomputes the stage it feeds. Stages are composed with numpy indexing on row positions. Filter masks come
+    from per column search indexes. Caches and indexes are dropped when data is replaced with set_data.
+    """
+
+    def __init__(self, data: pd.DataFrame | None = None) -> None:
+        self.set_data(pd.DataFrame() if data is None else data)
+
+    def set_data(self, data: pd.DataFrame) -> None:
+        self.data = data
+        self._index = SearchIndex(data)
+        self._orders = {}
+        self._masks = {}
+        self._uniques = {}
+        self._last = None
+
+    def order(self, sort: tuple) -> np.ndarray:
+        """
+        Out: row positions of data sorted by columns in sort
+        """
+        sort = tuple(c for c in sort if c in self.data.columns)
+        if sort not in self._orders:
+            if len(sort) == 0:
+                self._orders[sort] = np.arange(len(self.data))
+            else:
+                self._orders[sort] = (
+                    self
+                    .data[list(sort)]
+                    .reset_index(drop=True)
+                    .sort_values(by=list(sort), kind="stable")
+                    .index
+                    .to_numpy()
+                )
+        return self._orders[sort]
+
+    def mask(self, field: str, value: str) -> np.ndarray | None:
+        """
+        Out: boolean mask of rows where field matches value, None when filter is not set
+        """
+        if field in ("", None) or value in ("", None) or field not in self.data.columns:
+            return None
+        key = (field, value)
+        if key not in self._masks:
+            mask = self._index.mask(field, value)
+            self._masks[key] = filter_value_mask(self.data[field], value) if mask is None else mask
+        return self._masks[key]
+
+    def unique_values(self, field: str) -> list:
+        if field not in self._uniques:
+            self._uniques[field] = [] if field not in self.data.columns else list(self.data[field].dropna().unique())
+        return self._uniques[field]
+
+    def view(self, columns: list, sort: tuple, filters: list) -> pd.DataFrame:
+        """
+        Out: data rows matching every (field, value) filter, sorted and limited to columns
+
+        Filters on fields outside of columns are ignored, same as filtering an already projected frame.
+        """
+        columns = [c for c in columns if c in self.data.columns]
+        filters = tuple((f, v) for f, v in filters if f in columns)
+        key = (tuple(columns), tuple(sort), filters)
+        if self._last is not None and self._last[0] == key:
+            return self._last[1]
+
+        rows = self.order(tuple(sort))
+        for field, value in filters:
+            mask = self.mask(field, value)
+            if mask is not None:
+                rows = rows[mask[rows]]
+
+        df = self.data.iloc[rows][columns]
+        self._last = (key, df)
+        return df
+
+
+def filter_value_mask(series: pd.Series, value: str) -> np.ndarray:
+    """
+    Out: boolean mask of values matching case insensitive regex for strings, or equal integer for numbers
+    """
+    mask = pd.notna(series).to_numpy()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.to_series().astype(str)
+        matches = categories.str.contains(value, flags=re.IGNORECASE, regex=True).to_numpy()
+        codes = series.cat.codes.to_numpy()
+        return mask & (codes >= 0) & matches[np.maximum(codes, 0)]
+    if series.dtype == "object":
+        return mask & series.str.contains(value, flags=re.IGNORECASE).fillna(False).to_numpy(dtype=bool)
+    if series.dtype == "int64" or series.dtype == "Int64":
+        return mask & (series == int(value)).fillna(False).to_numpy(dtype=bool)
+    if series.dtype == "float64":
+        return mask & (np.trunc(series.to_numpy()) == int(value))
+    return mask
@@ -0,0 +1,74 @@
+import json
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from surianalytics.connectors import RESTSciriusConnector
+
+
+def json_response(data, status: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps(data).encode()
+    resp._content_consumed = True
+    resp.elapsed = timedelta(milliseconds=1)
+    return resp
+
+
+class FakeSession():
+
+    """
+    Stands in for requests session of a connector. Every request is recorded as (method, path, params, body) and
+    answered by handler called with same arguments, which returns decoded body or a response.
+    """
+
+    def __init__(self, handler) -> None:
+        self.handler = handler
+        self.requests = []
+        self.closed = False
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self._send("GET", url, None)
+
+    def post(self, url, json=None, **kwargs) -> requests.Response:
+        return self._send("POST", url, json)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def _send(self, method: str, url: str, body) -> requests.Response:
+        parsed = urlparse(url)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.requests.append((method, parsed.path, params, body))
+        data = self.handler(method, parsed.path, params, body)
+        return data if isinstance(data, requests.Response) else json_response(data)
+
+
+@pytest.fixture
+def env_file(tmp_path, monkeypatch):
+    """
+    Scirius env config in a temporary home, so connectors can be built without a real manager
+    """
+    (tmp_path / ".env").write_text("SCIRIUS_TOKEN=test\nSCIRIUS_HOST=scirius.test\nSCIRIUS_TLS_VERIFY=no\n")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("SCIRIUS_ENVFILE_IN_HOME", "yes")
+    return tmp_path / ".env"
+
+
+@pytest.fixture
+def serve():
+    """
+    Out: function that replaces session of a connector with a FakeSession over handler and returns it
+    """
+    def install(conn, handler) -> FakeSession:
+        conn.session = FakeSession(handler)
+        conn.scheduler.retry_delay = lambda attempt, retry_after=None: 0
+        return conn.session
+    return install
+
+
+@pytest.fixture
+def connector(env_file) -> RESTSciriusConnector:
+    return RESTSciriusConnector()
@@ -0,0 +1,55 @@
+"""
+Event fixtures shared by test modules
+"""
+
+import re
+from datetime import datetime, timezone
+
+from surianalytics.connectors import doc_times_ms
+
+NOW = 1_700_000_000_000
+
+
+def iso(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+
+
+def eve_time(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+0000")
+
+
+def event(ms: int, **fields) -> dict:
+    return {"timestamp": eve_time(ms), "event_type": "flow", **fields}
+
+
+def tail_handler(store: list):
+    """
+    Out: events_tail handler returning newest page_size events of requested window, newest first
+    """
+    def handler(method, path, params, body):
+        lo, hi, size = int(params["from_date"]), int(params["to_date"]), int(params["page_size"])
+        page = [e for e, t in zip(store, doc_times_ms(store)) if lo <= t <= hi] if len(store) > 0 else []
+        return {"results": sorted(page, key=lambda e: e["timestamp"], reverse=True)[:size]}
+    return handler
+
+
+def retrosearch_handler(store: list):
+    """
+    Out: events_tail handler that evaluates retrosearch qfilters over tls.sni and http.hostname of store events
+    """
+    pattern = re.compile(r"^event_type: (\w+) AND ([\w.]+)\.keyword: \((.*)\)$")
+
+    def handler(method, path, params, body):
+        m = pattern.match(params["qfilter"])
+        event_type, field = m.group(1), m.group(2).split(".")[1]
+        values = [v.replace("\\", "") for v in m.group(3).split(" OR ")]
+        exact = {v for v in values if not v.startswith("*.")}
+        suffixes = tuple(v[1:] for v in values if v.startswith("*."))
+
+        def hit(e) -> bool:
+            value = e.get(event_type, {}).get(field)
+            return e["event_type"] == event_type and value is not None and \
+                (value in exact or (len(suffixes) > 0 and value.endswith(suffixes)))
+
+        return tail_handler([e for e in store if hit(e)])(method, path, params, body)
+    return handler
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from surianalytics.widgets.aggregate import GroupAggregator, factorize_filled, group_unique
+
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "src_ip": ["10.0.0.2", "10.0.0.1", "10.0.0.2", "10.0.0.2", None],
+        "dest_port": [80, 443, 80, 53, 22],
+        "proto": pd.Categorical(["TCP", "TCP", "UDP", "UDP", None], categories=["ICMP", "TCP", "UDP"]),
+        "timestamp": pd.to_datetime(["2022-01-01", "2022-01-02", "2022-01-03", "2022-01-04", "2022-01-05"], utc=True),
+    })
+
+
+def reference(df: pd.DataFrame, groupby: str, col: str) -> pd.Series:
+    return df.fillna({groupby: "", col: ""}).astype({groupby: object, col: object}).groupby(groupby)[col].nunique()
+
+
+def test_factorize_filled_maps_missing_to_empty_label():
+    codes, labels = factorize_filled(pd.Series(["b", None, "a"]))
+    assert labels[codes].tolist() == ["b", "", "a"]
+
+
+def test_group_unique_counts_and_truncates():
+    groups = np.array([0, 0, 0, 1])
+    codes = np.array([0, 1, 1, 2])
+    nunique, values, bounds = group_unique(groups, 2, codes, np.array(["x", "y", "z"], dtype=object), 1)
+    assert nunique.tolist() == [2, 1]
+    assert values.tolist() == ["x", "z"]
+    assert bounds.tolist() == [0, 1, 2]
+
+
+def test_aggregate_matches_pandas_groupby():
+    df = frame()
+    out = GroupAggregator(df).aggregate("src_ip", ["dest_port", "proto", "timestamp"])
+
+    # missing values group under empty string label, after present keys
+    assert out[("src_ip", "")].tolist() == ["10.0.0.1", "10.0.0.2", ""]
+    expected = reference(df, "src_ip", "dest_port")
+    assert out[("dest_port", "nunique")].tolist() == expected[out[("src_ip", "")]].tolist()
+    assert out[("dest_port", "unique")].tolist()[1] == [53, 80]
+    assert out[("timestamp", "max")].iloc[1] == df["timestamp"].iloc[3]
+
+
+def test_unused_categories_are_not_groups():
+    out = GroupAggregator(frame()).aggregate("proto", ["dest_port"])
+    assert out[("proto", "")].tolist() == ["TCP", "UDP", ""]
+
+
+def test_limit_and_cache():
+    agg = GroupAggregator(frame(), max_values=1)
+    first = agg.aggregate("src_ip", ["dest_port"], limit=2)
+    assert len(first) == 2
+    assert all(len(v) <= 1 for v in first[("dest_port", "unique")])
+    assert agg.aggregate("src_ip", ["dest_port"], limit=2) is first
+
+    agg.set_data(frame().iloc[:2])
+    assert len(agg.aggregate("src_ip", ["dest_port"])) == 2
+    assert agg.aggregate("missing").empty
@@ -0,0 +1,165 @@
+import asyncio
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+import requests
+
+from helpers import NOW, event, iso, tail_handler
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from surianalytics.connectors import AsyncRESTSciriusConnector  # noqa: E402
+
+
+class FakeResponse():
+
+    def __init__(self, status: int, body: bytes) -> None:
+        self.status = status
+        self.headers = {}
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return self._body
+
+
+class FakeAioSession():
+
+    """
+    Stands in for aiohttp session, requests are answered by same handlers as blocking FakeSession
+    """
+
+    closed = False
+
+    def __init__(self, handler) -> None:
+        self.handler = handler
+        self.requests = []
+
+    def request(self, method: str, url: str, **kwargs) -> FakeResponse:
+        parsed = urlparse(url)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.requests.append((method, parsed.path, params, kwargs.get("json")))
+        data = self.handler(method, parsed.path, params, kwargs.get("json"))
+        status, data = data if isinstance(data, tuple) else (200, data)
+        return FakeResponse(status, json.dumps(data).encode())
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def aserve():
+    """
+    Out: function that makes async connector send requests to a FakeAioSession over handler
+    """
+    def install(conn, handler) -> FakeAioSession:
+        session = FakeAioSession(handler)
+
+        def async_session():
+            if conn._semaphore is None:
+                conn._semaphore = asyncio.Semaphore(conn.max_in_flight)
+            return session
+
+        conn._async_session = async_session
+        conn.scheduler.retry_delay = lambda attempt, retry_after=None: 0
+        return session
+    return install
+
+
+@pytest.fixture
+def aconn(env_file) -> AsyncRESTSciriusConnector:
+    return AsyncRESTSciriusConnector()
+
+
+def test_getters_are_coroutines(aconn, aserve):
+    store = [event(NOW - i, n=i, alert={"signature": "s"}) for i in range(3)]
+    aserve(aconn, lambda method, path, params, body: {
+        "results": store if "events" in path else [{"_source": e} for e in store],
+        "fields": ["a", "b"],
+    })
+    aconn.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+
+    async def main():
+        return await asyncio.gather(aconn.get_events_tail(),
+                                    aconn.get_alerts_df(),
+                                    aconn.get_unique_fields())
+
+    events, alerts, fields = asyncio.run(main())
+    assert [e["n"] for e in events] == [0, 1, 2]
+    assert isinstance(alerts, pd.DataFrame) and alerts["alert.signature"].tolist() == ["s"] * 3
+    assert fields == ["a", "b"]
+
+
+def test_failed_status_raises_and_is_logged(aconn, aserve):
+    aserve(aconn, lambda method, path, params, body: (404, {}))
+    with pytest.raises(requests.RequestException):
+        asyncio.run(aconn.get_events_tail())
+    assert aconn.request_log.to_df()["status"].tolist() == [404]
+
+
+def test_throttled_requests_are_retried(aconn, aserve):
+    answers = iter([(503, {}), (200, {"results": [event(NOW)]})])
+    session = aserve(aconn, lambda method, path, params, body: next(answers))
+    assert len(asyncio.run(aconn.get_events_tail())) == 1
+    assert len(session.requests) == 2
+    assert aconn.scheduler.in_flight == 0
+
+
+def test_iter_and_sliced_fetch_walk_whole_window(aconn, aserve):
+    aserve(aconn, tail_handler([event(NOW - 1000 * i, n=i) for i in range(50)]))
+    aconn.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    aconn.set_page_size(7)
+
+    async def walk():
+        return [e async for chunk in aconn.iter_events_tail() for e in chunk]
+
+    assert sorted(e["n"] for e in asyncio.run(walk())) == list(range(50))
+    assert asyncio.run(aconn.get_events_df_sliced(slices=3))["n"].tolist() == list(range(50))
+
+
+def test_invalid_max_in_flight(env_file):
+    with pytest.raises(ValueError):
+        AsyncRESTSciriusConnector(max_in_flight=0)
+
+
+def test_query_builder_shares_async_session(aconn, aserve):
+    session = aserve(aconn, lambda method, path, params, body: {"aggregations": {
+        "1": {"buckets": [{"key": "dns", "doc_count": 4}]}}})
+    builder = aconn.query_builder()
+    assert builder.scheduler is aconn.scheduler and builder.request_log is aconn.request_log
+    builder.set_index("logstash-*")
+    builder.add_aggs("event_type", "event_type")
+
+    async def main():
+        content = await builder.post()
+        await builder.aclose()
+        return content
+
+    assert builder.flatten_aggregation(asyncio.run(main()))["Count"].tolist() == [4]
+    assert session.requests[0][0] == "POST"
+    assert not session.closed
+    assert len(aconn.request_log.to_df()) == 1
+
+
+def test_field_catalog_needs_blocking_connector(aconn):
+    with pytest.raises(NotImplementedError):
+        aconn.field_catalog()
+
+
+def test_response_cache(aconn, aserve, tmp_path):
+    session = aserve(aconn, lambda method, path, params, body: {"fields": ["a"]})
+    aconn.enable_cache(path=str(tmp_path / "cache"))
+    aconn.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+
+    async def main():
+        return [await aconn.get_unique_fields() for _ in range(2)]
+
+    assert asyncio.run(main()) == [["a"], ["a"]]
+    assert len(session.requests) == 1
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from surianalytics.buffers import EventRingBuffer
+
+
+def frame(start: int, n: int) -> pd.DataFrame:
+    return pd.DataFrame({"seq": list(range(start, start + n))})
+
+
+def test_append_within_capacity_evicts_nothing():
+    buf = EventRingBuffer(capacity=5)
+    evicted = buf.append(frame(0, 3))
+    assert len(evicted) == 0
+    assert len(buf) == 3
+    assert buf.to_df()["seq"].tolist() == [0, 1, 2]
+
+
+def test_append_evicts_oldest_rows_first():
+    buf = EventRingBuffer(capacity=5)
+    buf.append(frame(0, 4))
+    evicted = buf.append(frame(4, 3))
+    assert evicted["seq"].tolist() == [0, 1]
+    assert buf.to_df()["seq"].tolist() == [2, 3, 4, 5, 6]
+
+
+def test_batch_larger_than_capacity_keeps_its_tail():
+    buf = EventRingBuffer(capacity=3)
+    buf.append(frame(0, 2))
+    evicted = buf.append(frame(10, 5))
+    assert evicted["seq"].tolist() == [0, 1]
+    assert buf.to_df()["seq"].tolist() == [12, 13, 14]
+
+
+def test_new_and_missing_columns_are_filled():
+    buf = EventRingBuffer(capacity=4)
+    buf.append(pd.DataFrame({"a": [1, 2]}))
+    buf.append(pd.DataFrame({"b": ["x"]}))
+    df = buf.to_df()
+    assert sorted(buf.columns) == ["a", "b"]
+    assert df["a"].isna().tolist() == [False, False, True]
+    assert df["b"].tolist()[-1] == "x"
+
+
+def test_clear():
+    buf = EventRingBuffer(capacity=2)
+    buf.append(frame(0, 2))
+    buf.clear()
+    assert len(buf) == 0
+    assert len(buf.to_df()) == 0
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        EventRingBuffer(capacity=0)
+
+
+def test_categorical_columns_stay_categorical():
+    buf = EventRingBuffer(capacity=3)
+    buf.append(pd.DataFrame({"proto": pd.Categorical(["TCP", "UDP"])}))
+    evicted = buf.append(pd.DataFrame({"proto": pd.Categorical(["ICMP", "TCP"])}))
+    assert evicted["proto"].tolist() == ["TCP"]
+    assert isinstance(buf.to_df()["proto"].dtype, pd.CategoricalDtype)
+    assert buf.to_df()["proto"].tolist() == ["UDP", "ICMP", "TCP"]
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from surianalytics.cache import ResponseCache
+from surianalytics.connectors import QuerySpec
+
+from helpers import NOW
+
+API = "rest/rules/es/events_tail/"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(path=str(tmp_path / "cache"), max_bytes=4096, granularity=60)
+
+
+def test_round_params_floors_start_and_ceils_end(cache):
+    params = {"from_date": NOW + 1, "to_date": NOW + 61_000, "qfilter": "x"}
+    key = cache.round_params(params)
+    assert key["from_date"] <= params["from_date"] and key["from_date"] % 60_000 == 0
+    assert key["to_date"] >= params["to_date"] and key["to_date"] % 60_000 == 0
+    assert key["qfilter"] == "x"
+    assert params["from_date"] == NOW + 1
+
+
+def test_ttl_expiry_and_closed_windows(cache, monkeypatch):
+    now = time.time()
+    open_params = {"to_date": int(now * 1000)}
+    closed_params = {"to_date": int((now - 3600) * 1000)}
+    cache.put("ns", API, open_params, {"results": [1]})
+    cache.put("ns", API, closed_params, {"results": [2]})
+    assert cache.get("ns", API, open_params) == {"results": [1]}
+
+    monkeypatch.setattr(time, "time", lambda: now + cache.default_ttl + 1)
+    assert cache.get("ns", API, open_params) is None
+    assert cache.get("ns", API, closed_params) == {"results": [2]}
+    assert cache.hits[API] == 2 and cache.misses[API] == 1
+
+
+def test_lru_eviction_keeps_recent_entries(cache):
+    payload = {"results": ["x" * 1000]}
+    for i in range(3):
+        cache.put("ns", API, {"page": i}, payload)
+    cache.get("ns", API, {"page": 0})
+    cache.put("ns", API, {"page": 3}, payload)
+    cache.put("ns", API, {"page": 4}, payload)
+
+    assert cache.size <= cache.max_bytes
+    assert cache.get("ns", API, {"page": 0}) == payload
+    assert cache.get("ns", API, {"page": 1}) is None
+    assert cache.get("ns", API, {"page": 4}) == payload
+
+
+def test_connector_sends_exact_params_and_skips_open_windows(connector, serve, tmp_path):
+    session = serve(connector, lambda method, path, params, body: {"results": [{"n": len(session.requests)}]})
+    connector.enable_cache(path=str(tmp_path / "cache"))
+
+    spec = QuerySpec(NOW - 3_600_000 + 17, NOW + 17)
+    first = connector.get_data(API, spec=spec)
+    assert connector.get_data(API, spec=spec) == first
+    assert len(session.requests) == 1
+    assert session.requests[0][2]["from_date"] == str(NOW - 3_600_000 + 17)
+    assert session.requests[0][2]["to_date"] == str(NOW + 17)
+
+    live = QuerySpec(int(time.time() * 1000) - 60_000, int(time.time() * 1000) + 60_000)
+    connector.get_data(API, spec=live)
+    connector.get_data(API, spec=live)
+    assert len(session.requests) == 3
+
+
+def test_cache_entries_are_scoped_by_token(connector, serve, tmp_path):
+    session = serve(connector, lambda method, path, params, body: {"results": []})
+    connector.enable_cache(path=str(tmp_path / "cache"))
+    spec = QuerySpec(NOW - 60_000, NOW)
+
+    connector.get_data(API, spec=spec)
+    connector.token = "other"
+    connector.get_data(API, spec=spec)
+    assert len(session.requests) == 2
@@ -0,0 +1,59 @@
+import threading
+
+from surianalytics.catalog import FieldCatalog
+
+
+class Connector():
+
+    def __init__(self) -> None:
+        self.calls = []
+        self.release = threading.Event()
+
+    def get_unique_fields(self, event_type=None) -> list:
+        self.calls.append(event_type)
+        self.release.wait(5)
+        return ["{}.field".format(event_type or "all")]
+
+
+def test_fields_refresh_in_background_and_notify():
+    conn = Connector()
+    catalog = FieldCatalog(conn)
+    seen = []
+    catalog.subscribe(lambda event_type, fields: seen.append((event_type, fields)))
+
+    assert catalog.fields("dns") == []
+    # second call while refresh runs does not start another one
+    assert catalog.fields("dns") == []
+    conn.release.set()
+    catalog.refresh("dns").join()
+
+    assert conn.calls == ["dns"]
+    assert seen == [("dns", ["dns.field"])]
+    assert catalog.fields("dns") == ["dns.field"]
+
+
+def test_wait_fetches_and_all_maps_to_none():
+    conn = Connector()
+    conn.release.set()
+    catalog = FieldCatalog(conn)
+    assert catalog.fields("all", wait=True) == ["all.field"]
+    assert catalog.fields() == ["all.field"]
+    assert conn.calls == [None]
+
+
+def test_expired_list_is_returned_while_refreshing():
+    conn = Connector()
+    conn.release.set()
+    catalog = FieldCatalog(conn, ttl=0)
+    catalog.fields("tls", wait=True)
+    assert catalog.fields("tls") == ["tls.field"]
+    catalog.refresh("tls").join()
+    assert len(conn.calls) >= 2
+
+
+def test_connector_shares_one_catalog(connector, serve):
+    session = serve(connector, lambda method, path, params, body: {"fields": ["src_ip", "dest_ip"]})
+    catalog = connector.field_catalog()
+    assert connector.field_catalog() is catalog
+    assert catalog.fields(wait=True) == ["src_ip", "dest_ip"]
+    assert [r[1] for r in session.requests] == ["/rest/rules/es/unique_fields/"]
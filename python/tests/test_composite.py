@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+from surianalytics.connectors import ESQueryBuilder
+
+from conftest import json_response
+
+BUCKETS = [{"key": {"src": "10.0.0.%d" % i}, "doc_count": i, "bytes": {"value": i * 100.0}} for i in range(1, 6)]
+
+
+def composite_handler(buckets: list):
+    """
+    Out: search handler that pages buckets by composite size and after key
+    """
+    def handler(method, path, params, body):
+        composite = body["aggs"]["aggs"]["composite"]["composite"]
+        after = composite.get("after")
+        start = 0 if after is None else [b["key"] for b in buckets].index(after) + 1
+        page = buckets[start:start + composite["size"]]
+        agg = {"buckets": page}
+        if len(page) > 0:
+            agg["after_key"] = page[-1]["key"]
+        return {"aggregations": {"composite": agg}}
+    return handler
+
+
+@pytest.fixture
+def builder(env_file):
+    builder = ESQueryBuilder()
+    builder.set_index("logstash-*")
+    builder.add_composite("src_ip", "src")
+    builder.add_metric("flow.bytes", "bytes")
+    return builder
+
+
+def test_iter_composite_pages_with_after_key(builder, serve):
+    session = serve(builder, composite_handler(BUCKETS))
+    pages = list(builder.iter_composite(chunk_size=2))
+
+    assert [len(p) for p in pages] == [2, 2, 1]
+    # last page is followed by one empty page that ends paging
+    assert len(session.requests) == 4
+    afters = [r[3]["aggs"]["aggs"]["composite"]["composite"].get("after") for r in session.requests]
+    assert afters == [None, {"src": "10.0.0.2"}, {"src": "10.0.0.4"}, {"src": "10.0.0.5"}]
+    assert all(r[3]["size"] == 0 for r in session.requests)
+
+
+def test_get_composite_df_concatenates_pages(builder, serve):
+    serve(builder, composite_handler(BUCKETS))
+    df = builder.get_composite_df(chunk_size=3)
+    assert df["src"].tolist() == ["10.0.0.%d" % i for i in range(1, 6)]
+    assert df["Count"].tolist() == [1, 2, 3, 4, 5]
+    assert df["bytes"].tolist() == [100.0, 200.0, 300.0, 400.0, 500.0]
+
+
+def test_empty_composite_keeps_columns(builder, serve):
+    serve(builder, composite_handler([]))
+    assert list(builder.get_composite_df().columns) == ["src", "Count", "bytes"]
+
+
+def test_composite_errors(builder, serve):
+    serve(builder, lambda method, path, params, body: json_response({}, status=400))
+    with pytest.raises(requests.RequestException):
+        list(builder.iter_composite())
+    with pytest.raises(ValueError):
+        ESQueryBuilder().composite_aggs()
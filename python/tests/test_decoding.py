@@ -0,0 +1,50 @@
+import json
+
+from surianalytics.decoding import ChunkReader, iter_items, loads
+
+
+def chunks(data: bytes, size: int) -> list:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_sized_reads_across_chunks():
+    data = bytes(range(256)) * 4
+    reader = ChunkReader(chunks(data, 7))
+    out = b""
+    while True:
+        part = reader.read(10)
+        if len(part) == 0:
+            break
+        assert len(part) <= 10
+        out += part
+    assert out == data
+    assert reader.bytes == len(data)
+
+
+def test_read_all_after_partial_read():
+    data = b"0123456789" * 100
+    reader = ChunkReader(chunks(data, 33))
+    assert reader.read(5) == b"01234"
+    assert reader.read() == data[5:]
+    assert reader.read(3) == b""
+
+
+def test_iter_items_yields_results():
+    doc = {"count": 3, "results": [{"a": 1}, {"a": 2.5}, {"a": "x"}]}
+    reader = ChunkReader(chunks(json.dumps(doc).encode(), 4))
+    assert list(iter_items(reader)) == doc["results"]
+
+
+def test_iter_items_nested_prefix_and_missing_key():
+    doc = {"data": {"rows": [1, 2]}}
+    assert list(iter_items(ChunkReader([json.dumps(doc).encode()]), prefix="data.rows")) == [1, 2]
+    assert list(iter_items(ChunkReader([b"{}"]))) == []
+
+
+def test_loads_bytes():
+    assert loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_connector_streams_results(connector, serve):
+    serve(connector, lambda method, path, params, body: {"count": 2, "results": [{"a": 1}, {"a": 2}]})
+    assert list(connector.iter_data("rest/rules/es/events_tail/")) == [{"a": 1}, {"a": 2}]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from surianalytics.eve import (EveFlattener, concat_optimized, flatten_events, ip_categorical, ip_sort_key,
+                               optimize_dtypes, parse_eve_time)
+
+EVENTS = [
+    {"timestamp": "2022-10-12T10:00:00.123456+0200", "event_type": "dns", "src_ip": "10.0.0.10",
+     "dns": {"query": [{"rrname": "a.example.com"}], "type": "query"}},
+    {"timestamp": "2022-10-12T08:00:01.000000+0000", "event_type": "flow", "src_ip": "10.0.0.9",
+     "flow": {"bytes": 10, "meta": {}}},
+]
+
+
+def test_flatten_matches_json_normalize():
+    df = flatten_events(EVENTS)
+    expected = pd.json_normalize(EVENTS)
+    assert sorted(df.columns) == sorted(expected.columns)
+    assert df["dns.type"].tolist()[0] == "query"
+    assert df["flow.bytes"].tolist()[1] == 10
+
+
+def test_flatten_fields_keep_objects():
+    df = EveFlattener(chunk_size=1).flatten(EVENTS, fields=["event_type", "dns"])
+    assert list(df.columns) == ["event_type", "dns"]
+    assert df["dns"].iloc[0] == EVENTS[0]["dns"]
+
+
+def test_parse_eve_time_applies_offset():
+    parsed = parse_eve_time(pd.Series([e["timestamp"] for e in EVENTS] + [None]))
+    assert parsed.iloc[0] == pd.Timestamp("2022-10-12T08:00:00.123456Z")
+    assert parsed.iloc[1] == pd.Timestamp("2022-10-12T08:00:01Z")
+    assert pd.isna(parsed.iloc[2])
+
+
+def test_ip_categorical_sorts_by_address():
+    series = ip_categorical(pd.Series(["10.0.0.10", "10.0.0.9", "::1", None]))
+    assert series.cat.ordered
+    assert list(series.cat.categories) == ["10.0.0.9", "10.0.0.10", "::1"]
+    assert ip_sort_key("10.0.0.9") < ip_sort_key("10.0.0.10")
+    assert ip_categorical(pd.Series(["not an ip"])).dtype == "object"
+
+
+def test_optimize_dtypes_reports_memory():
+    df = pd.DataFrame({"event_type": ["dns"] * 50, "src_ip": ["10.0.0.1"] * 50, "uniq": [str(i) for i in range(50)]})
+    out, report = optimize_dtypes(df)
+    assert isinstance(out["event_type"].dtype, pd.CategoricalDtype)
+    assert out["src_ip"].cat.ordered
+    assert out["uniq"].dtype == "object"
+    assert (report["saved"] > 0).any()
+
+
+def test_concat_optimized_keeps_categoricals():
+    a, _ = optimize_dtypes(pd.DataFrame({"src_ip": ["10.0.0.10", "10.0.0.2"], "event_type": ["dns", "dns"]}))
+    b, _ = optimize_dtypes(pd.DataFrame({"src_ip": ["10.0.0.9"], "event_type": ["flow"], "extra": [1]}))
+    df = concat_optimized([a, pd.DataFrame(), b])
+
+    assert df["src_ip"].tolist() == ["10.0.0.10", "10.0.0.2", "10.0.0.9"]
+    assert df["src_ip"].cat.ordered
+    assert list(df["src_ip"].cat.categories) == ["10.0.0.2", "10.0.0.9", "10.0.0.10"]
+    assert isinstance(df["event_type"].dtype, pd.CategoricalDtype)
+    assert np.isnan(df["extra"].iloc[0])
+    assert concat_optimized([]).empty
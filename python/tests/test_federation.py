@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from surianalytics.federation import SOURCE_COLS, Federation, Target
+
+
+def search_handler(method, path, params, body):
+    return {"aggregations": {"1": {"buckets": [{"key": "a", "doc_count": 3}]}}}
+
+
+def unreachable(method, path, params, body):
+    raise ValueError("unreachable")
+
+
+def test_target_label():
+    assert Target("h", "t").label == "h"
+    assert Target("h", "t", 2).label == "h/2"
+    assert Target("h", "t", 2, "prod").label == "prod"
+
+
+def test_search_merges_targets_and_shares_connectors(env_file, serve):
+    fed = Federation([("h1", "t", 1), ("h1", "t", 2), ("h2", "t")])
+    assert len(fed._connectors) == 2
+    sessions = {key: serve(conn, unreachable if key[0] == "h2" else search_handler)
+                for key, conn in fed._connectors.items()}
+
+    df = fed.search(lambda b: (b.set_index("logstash-*"), b.add_aggs("src_ip", "src_ip")))
+
+    assert list(df.columns) == list(SOURCE_COLS) + ["src_ip", "Count"]
+    assert df["federation.target"].tolist() == ["h1/1", "h1/2"]
+    tenants = [r[2]["tenant"] for r in sessions[("h1", "t")].requests]
+    assert sorted(tenants) == ["1", "2"]
+    assert fed.report.set_index("target").loc["h2", "error"].startswith("ValueError")
+
+    for target, builder in fed._builders.items():
+        assert builder.session is fed.connector(target).session
+        assert builder.scheduler is fed.connector(target).scheduler
+
+
+def test_raise_errors(env_file):
+    fed = Federation([("h1", "t")], raise_errors=True)
+    with pytest.raises(KeyError):
+        fed.run(lambda conn, target: pd.DataFrame()[["missing"]])
+
+
+def test_invalid_arguments(env_file):
+    with pytest.raises(ValueError):
+        Federation([])
+    with pytest.raises(ValueError):
+        Federation([("h", "t")], workers=0)
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from surianalytics.filters import PathFilter, filter_df, filter_records, path_values
+
+RECORDS = [
+    {"event_type": "dns", "dns": {"answers": [{"rrtype": "A"}, {"rrtype": "CNAME"}]}},
+    {"event_type": "dns", "dns": {"answers": [{"rrtype": "A"}, {"rrtype": "A"}]}},
+    {"event_type": "flow", "dest_port": 443},
+]
+
+
+def test_path_values_expands_lists_at_any_depth():
+    assert path_values(RECORDS[0], ("dns", "answers", "rrtype")) == ["A", "CNAME"]
+    assert path_values([RECORDS[0], RECORDS[2]], ("event_type",)) == ["dns", "flow"]
+    assert path_values(RECORDS[2], ("dns", "answers")) == []
+
+
+def test_any_and_all_modes():
+    assert filter_records(RECORDS, **{"dns.answers.rrtype": "CNAME"}) == [RECORDS[0]]
+    assert filter_records(RECORDS, mode="all", **{"dns.answers.rrtype": "A"}) == [RECORDS[1]]
+
+
+def test_sets_and_callables():
+    assert PathFilter({"event_type": {"flow", "http"}}).filter(RECORDS) == [RECORDS[2]]
+    assert PathFilter({"dest_port": lambda v: v > 100}).filter(RECORDS) == [RECORDS[2]]
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        PathFilter({}, mode="some")
+
+
+def test_mask_on_flat_and_nested_columns():
+    df = pd.DataFrame({
+        "event_type": ["dns", "dns", "flow"],
+        "dns.answers": [RECORDS[0]["dns"]["answers"], RECORDS[1]["dns"]["answers"], None],
+        "tags": [["a", "b"], [], "a"],
+    })
+    assert filter_df(df, **{"dns.answers.rrtype": "CNAME"}).index.tolist() == [0]
+    assert filter_df(df, event_type="dns").index.tolist() == [0, 1]
+    assert filter_df(df, tags="a").index.tolist() == [0, 2]
+    assert filter_df(df, **{"missing.path": 1}).empty
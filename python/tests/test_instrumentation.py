@@ -0,0 +1,65 @@
+import pytest
+
+from surianalytics.instrumentation import RequestLog, params_hash, response_rows
+
+
+def test_summary_of_empty_log():
+    summary = RequestLog().summary()
+    assert summary.empty
+    assert "wall_p50" in summary.columns
+    assert summary.index.names == ["method", "endpoint"]
+
+
+def test_summary_when_every_request_failed():
+    log = RequestLog()
+    log.record("GET", "events_tail", None, None, 0.5)
+    log.record("GET", "events_tail", None, 503, 0.7)
+    row = log.summary().loc[("GET", "events_tail")]
+    assert row["requests"] == 2
+    assert row["errors"] == 2
+    assert row["wall_p50"] == pytest.approx(0.6)
+
+
+def test_summary_per_endpoint():
+    log = RequestLog()
+    log.record("GET", "a", {"x": 1}, 200, 0.1, ttfb=0.05, size=100, decode=0.01, rows=3)
+    log.record("GET", "a", {"x": 2}, 200, 0.3, ttfb=0.05, size=50, decode=0.01, rows=1)
+    log.record("POST", "b", None, 200, 1.0)
+    summary = log.summary()
+    assert summary.loc[("GET", "a"), "bytes"] == 150
+    assert summary.loc[("GET", "a"), "rows"] == 4
+    assert summary.loc[("GET", "a"), "errors"] == 0
+    assert len(summary) == 2
+
+
+def test_hooks_get_records_and_failures_do_not_propagate():
+    log = RequestLog()
+    seen = []
+    log.add_hook(seen.append)
+    log.add_hook(lambda rec: 1 / 0)
+    with pytest.warns(UserWarning, match="hook failed"):
+        log.record("GET", "a", None, 200, 0.1)
+    assert len(seen) == 1 and seen[0]["endpoint"] == "a"
+    assert len(log.to_df()) == 1
+
+
+def test_params_hash_ignores_key_order():
+    assert params_hash({"a": 1, "b": 2}) == params_hash({"b": 2, "a": 1})
+    assert params_hash(None) is None
+
+
+def test_response_rows():
+    assert response_rows([1, 2]) == 2
+    assert response_rows({"results": [1]}) == 1
+    assert response_rows({"count": 3}) is None
+
+
+def test_connector_records_requests(connector, serve):
+    serve(connector, lambda method, path, params, body: {"results": [{"a": 1}, {"a": 2}]})
+    connector.get_events_tail()
+    connector.get_eve_unique_values(field="a")
+
+    log = connector.request_log.to_df()
+    assert len(log) == 2
+    assert log["rows"].tolist() == [2, 2]
+    assert len(connector.request_stats()) == 2
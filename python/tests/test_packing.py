@@ -0,0 +1,64 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from helpers import NOW, event, iso, retrosearch_handler
+from surianalytics.connectors import (escape, normalize_domains, pack_retrosearch_domains, retrosearch_cost,
+                                      retrosearch_overhead, retrosearch_queries)
+
+
+def test_normalize_domains_dedups_and_drops_subdomains():
+    domains = ["Example.com.", "a.example.com", "example.com", " other.org ", "", "b.other.org.uk"]
+    assert sorted(normalize_domains(domains)) == ["b.other.org.uk", "example.com", "other.org"]
+
+
+def test_escape_reserved_characters():
+    assert escape("a/b:c") == "a\\/b\\:c"
+
+
+def test_packing_stays_within_budget():
+    domains = ["d{}.example{}.net".format(i, "x" * (i % 7)) for i in range(300)]
+    budget = 2000
+    batches = pack_retrosearch_domains(domains, budget, max_clauses=50)
+
+    assert sorted(v for b in batches for v in b) == sorted(escape(d) for d in normalize_domains(domains))
+    for batch in batches:
+        assert len(batch) <= 50
+        assert retrosearch_overhead() + sum(retrosearch_cost(v) for v in batch) <= budget
+        assert all(len(q[0]) < budget for q in retrosearch_queries(batch))
+
+
+def test_packing_rejects_oversized_value():
+    with pytest.raises(ValueError):
+        pack_retrosearch_domains(["x" * 500 + ".com"], 200)
+
+
+def test_retrosearch_urls_fit_budget(connector, serve):
+    session = serve(connector, retrosearch_handler([event(NOW, event_type="tls", tls={"sni": "a/b.org"})]))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    domains = ["Sub.Example.com", "example.com", "a/b.org"] + ["d{}.example.net".format(i) for i in range(200)]
+
+    df = connector.retrosearch(domains, batchsize=100, max_url_bytes=1500)
+    assert len(connector.last_request) <= 1500
+    qfilters = [r[2]["qfilter"] for r in session.requests]
+    assert not any("sub.example.com" in q.lower() for q in qfilters)
+    assert sum(q.count("a\\/b.org") for q in qfilters) == 4
+    assert df["ioc.value.match"].tolist() == ["a/b.org"]
+
+
+def test_async_retrosearch_packs_like_blocking(env_file):
+    pytest.importorskip("aiohttp")
+    from surianalytics.connectors import AsyncRESTSciriusConnector
+
+    conn = AsyncRESTSciriusConnector()
+    qfilters = []
+
+    async def get_events_df(spec=None, **kwargs):
+        qfilters.append(spec.qfilter)
+        return pd.DataFrame()
+
+    conn.get_events_df = get_events_df
+    asyncio.run(conn.retrosearch(["Example.com", "a.example.com", "x/y.org"]))
+    assert len(qfilters) == 4
+    assert all("x\\/y.org" in q and "a.example.com" not in q for q in qfilters)
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from helpers import NOW, event, iso, tail_handler
+from surianalytics.connectors import doc_key, tail_cursor_step
+
+
+def test_tail_cursor_step_moves_to_oldest_and_skips_seen():
+    page = [event(300, n=1), event(200, n=2), event(200, n=3)]
+    fresh, to_ms, seen = tail_cursor_step(page, 400, set(), 3)
+    assert fresh == page and to_ms == 200 and len(seen) == 2
+
+    again = [event(200, n=2), event(200, n=3), event(100, n=4)]
+    fresh, to_ms, _ = tail_cursor_step(again, to_ms, seen, 3)
+    assert fresh == [event(100, n=4)] and to_ms == 100
+
+    fresh, to_ms, _ = tail_cursor_step([event(50)], 100, set(), 3)
+    assert to_ms is None
+
+
+def test_tail_cursor_step_warns_when_millisecond_overflows_page():
+    page = [event(100, n=i) for i in range(3)]
+    with pytest.warns(UserWarning):
+        fresh, to_ms, seen = tail_cursor_step(page, 100, {doc_key(d) for d in page}, 3)
+    assert fresh == [] and to_ms == 99 and seen == set()
+
+
+def test_iter_events_tail_walks_whole_window(connector, serve):
+    # several events share boundary milliseconds of pages
+    store = [event(NOW - 1000 * (i // 2), n=i) for i in range(25)]
+    session = serve(connector, tail_handler(store))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(4)
+
+    chunks = list(connector.iter_events_tail())
+    assert all(len(c) <= 4 for c in chunks)
+    assert sorted(e["n"] for c in chunks for e in c) == list(range(25))
+    assert len(session.requests) > 25 // 4
+
+
+def test_iter_events_df_yields_bounded_frames(connector, serve):
+    serve(connector, tail_handler([event(NOW - i, n=i) for i in range(10)]))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(3)
+
+    frames = list(connector.iter_events_df(fields=["n"]))
+    assert all(isinstance(f, pd.DataFrame) and len(f) <= 3 for f in frames)
+    assert pd.concat(frames)["n"].tolist() == list(range(10))
+
+
+def test_iteration_requires_page_size(connector, serve):
+    serve(connector, tail_handler([]))
+    connector.set_page_size(0)
+    with pytest.raises(ValueError):
+        next(connector.iter_events_tail())
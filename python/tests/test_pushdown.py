@@ -0,0 +1,117 @@
+import pandas as pd
+import pytest
+
+from surianalytics.connectors import DEFAULT_EVENT_INDEX, RESTSciriusConnector
+from surianalytics.widgets.pushdown import Pushdown, agg_field, filter_clause, filter_query
+
+
+def search_handler(method, path, params, body):
+    return {"aggregations": {
+        "1": {"buckets": [{"key": "10.0.0.1", "doc_count": 5, "dest_port.nunique": {"value": 2}}]},
+        "distinct": {"value": 42},
+    }}
+
+
+@pytest.fixture
+def connector(env_file, serve) -> RESTSciriusConnector:
+    conn = RESTSciriusConnector(scirius_event_index="eve-*")
+    serve(conn, search_handler)
+    return conn
+
+
+def bodies(conn: RESTSciriusConnector) -> list:
+    return [r[3] for r in conn.session.requests]
+
+
+def test_connector_event_index(env_file):
+    assert RESTSciriusConnector().event_index == DEFAULT_EVENT_INDEX
+    assert RESTSciriusConnector(scirius_event_index="eve-*").event_index == "eve-*"
+
+
+def test_query_builder_shares_session_and_scheduler(env_file):
+    conn = RESTSciriusConnector()
+    conn.set_query_delta(hours=2)
+    builder = conn.query_builder()
+    assert builder.session is conn.session
+    assert builder.scheduler is conn.scheduler
+    assert builder.request_log is conn.request_log
+    assert (builder.from_date, builder.to_date) == (conn.from_date, conn.to_date)
+
+
+def test_filter_clause():
+    known = {"host.keyword", "src_ip.keyword"}
+    assert filter_clause("src_ip", '=10.0.0."1', None, known) == 'src_ip.keyword: "10.0.0.\\"1"'
+    assert filter_clause("dest_port", "1-1024", pd.Int64Dtype()) == "dest_port: [1 TO 1024]"
+    assert filter_clause("dest_port", "=443", pd.Int64Dtype()) == "dest_port: [443 TO 443]"
+    # local exact match ignores case, keyword term match does not
+    with pytest.raises(ValueError):
+        filter_clause("host", "=Example.com", None, known)
+    # analyzed text field has no exact match
+    with pytest.raises(ValueError):
+        filter_clause("dest_ip", "=10.0.0.1", None, known)
+    with pytest.raises(ValueError):
+        filter_clause("host", "exam", None, known)
+    with pytest.raises(ValueError):
+        filter_clause("dest_port", "http", pd.Int64Dtype())
+
+
+def test_filter_query_joins_set_filters():
+    assert filter_query(None, []) == "*"
+    assert filter_query("a OR b", [("src_ip", "=1.2.3.4", None), ("", "=y", None)], {"src_ip.keyword"}) == \
+        '((a OR b) AND src_ip.keyword: "1.2.3.4")'
+
+
+def test_agg_field_prefers_keyword():
+    assert agg_field("host", {"host.keyword"}) == "host.keyword"
+    assert agg_field("dest_port", {"host.keyword"}) == "dest_port"
+
+
+def test_aggregate_uses_connector_index_and_caches(connector):
+    push = Pushdown(connector)
+    df = push.aggregate("src_ip", ["src_ip", "dest_port"])
+    assert df["Count"].tolist() == [5]
+    assert df["dest_port.nunique"].tolist() == [2]
+
+    assert bodies(connector)[0]["index"] == "eve-*"
+    push.aggregate("src_ip", ["src_ip", "dest_port"])
+    assert len(bodies(connector)) == 1
+
+
+def test_cache_is_bounded(connector):
+    push = Pushdown(connector, index="logstash-*", max_results=2)
+    for field in ["a", "b", "a", "c", "a", "b"]:
+        push.aggregate(field, [])
+    # a stays cached as most recently used, b is evicted by c
+    assert len(bodies(connector)) == 4
+    assert len(push._results) == 2
+    assert bodies(connector)[0]["index"] == "logstash-*"
+
+
+def test_unique_values_reports_distinct(connector):
+    df, distinct = Pushdown(connector).unique_values("src_ip", known_fields=["src_ip"])
+    assert distinct == 42
+    assert df["doc_count"].tolist() == [5]
+
+
+def test_explorer_uniq_skips_elastic_when_disabled(env_file, serve, tmp_path, monkeypatch):
+    from surianalytics.widgets.explorer import Explorer
+
+    # explorer pickles query params to working directory
+    monkeypatch.chdir(tmp_path)
+    conn = RESTSciriusConnector()
+    session = serve(conn, lambda method, path, params, body: {"fields": [], "src_ip": 3} if method == "GET"
+                    else search_handler(method, path, params, body))
+    explorer = Explorer(conn)
+    explorer._catalog.fields(wait=True)
+    explorer._tabs.selected_index = 2
+    explorer._text_query.value = "event_type: flow"
+    explorer._dropdown_select_field.options = ["src_ip"]
+    explorer._dropdown_select_field.value = "src_ip"
+    explorer._tickbox_uniq_server.value = False
+    explorer._download_uniq(None)
+    assert [r[0] for r in session.requests] == ["GET", "GET"]
+    assert session.requests[-1][1] == "/rest/rules/es/unique_values/"
+
+    explorer._tickbox_uniq_server.value = True
+    explorer._download_uniq(None)
+    assert session.requests[-1][0] == "POST"
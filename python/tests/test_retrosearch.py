@@ -0,0 +1,146 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from helpers import NOW, event, iso, retrosearch_handler
+from surianalytics.connectors import RETROSEARCH_KINDS
+
+
+def sighting(ms: int, sni: str, **fields) -> dict:
+    return event(ms, event_type="tls", tls={"sni": sni}, **fields)
+
+
+@pytest.fixture
+def store() -> list:
+    return [
+        sighting(NOW - 1000, "example.com", n=0),
+        sighting(NOW - 2000, "www.example.com", n=1),
+        event(NOW - 3000, event_type="http", http={"hostname": "evil.org"}, n=2),
+        sighting(NOW - 4000, "unrelated.net", n=3),
+    ]
+
+
+@pytest.fixture
+def retro(connector, serve, store):
+    serve(connector, retrosearch_handler(store))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(10)
+    return connector
+
+
+def test_sightings_are_annotated(retro):
+    df = retro.retrosearch(["example.com", "evil.org"])
+    matches = df.set_index("n")[["ioc.match", "ioc.source", "ioc.value.match"]].sort_index()
+    assert matches.to_dict("index") == {
+        0: {"ioc.match": "exact", "ioc.source": "tls.sni", "ioc.value.match": "example.com"},
+        1: {"ioc.match": "sub", "ioc.source": "tls.sni", "ioc.value.match": "www.example.com"},
+        2: {"ioc.match": "exact", "ioc.source": "http.hostname", "ioc.value.match": "evil.org"},
+    }
+    assert not df["ioc.batch.partial"].any()
+    assert pd.api.types.is_datetime64_any_dtype(df["timestamp"])
+
+
+def test_workers_give_same_result(retro):
+    domains = ["example.com", "evil.org"] + ["d{}.net".format(i) for i in range(20)]
+    serial = retro.retrosearch(domains, batchsize=5)
+    parallel = retro.retrosearch(domains, batchsize=5, workers=4)
+    assert sorted(serial["n"]) == sorted(parallel["n"])
+    # every batch runs four sub-queries
+    assert len(retro.retrosearch_timings) == 4 * 5
+
+
+def test_full_page_is_flagged_partial(connector, serve):
+    serve(connector, retrosearch_handler([sighting(NOW - i, "a.com") for i in range(5)]))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(5)
+    df = connector.retrosearch(["a.com"])
+    assert df["ioc.batch.partial"].all()
+    timings = connector.retrosearch_timings
+    assert timings[timings["partial"]]["match"].tolist() == ["exact"]
+
+
+def test_no_sightings(retro):
+    assert retro.retrosearch(["nothing.here"]).empty
+
+
+def test_invalid_arguments(retro):
+    with pytest.raises(ValueError):
+        retro.retrosearch(["a.com"], batchsize=101)
+    with pytest.raises(ValueError):
+        retro.retrosearch(["a.com"], workers=0)
+
+
+def test_adaptive_bisects_domains_and_window(connector, serve):
+    # a.com alone fills several pages over the window, other domains are sparse
+    store = [sighting(NOW - 2000 * i, "a.com", n=i) for i in range(12)]
+    store += [sighting(NOW - 500 - 7000 * i, "d{}.net".format(i), n=100 + i) for i in range(4)]
+    session = serve(connector, retrosearch_handler(store))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(5)
+
+    plain = connector.retrosearch(["a.com"] + ["d{}.net".format(i) for i in range(4)])
+    assert plain["ioc.batch.partial"].any()
+
+    session.requests.clear()
+    df = connector.retrosearch(["a.com"] + ["d{}.net".format(i) for i in range(4)], adaptive=True)
+    assert sorted(df["n"]) == sorted(e["n"] for e in store)
+    assert not df["ioc.batch.partial"].any()
+
+    timings = connector.retrosearch_timings
+    assert timings["bisected"].any()
+    assert not timings["partial"].any()
+    assert len(session.requests) == len(timings)
+
+
+def test_adaptive_shrinks_batch_after_truncation(connector, serve):
+    store = [sighting(NOW - 100 * i, "d{}.net".format(i % 8), n=i) for i in range(40)]
+    serve(connector, retrosearch_handler(store))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(10)
+
+    spec = connector.query_spec()
+    domains = ["d{}.net".format(i) for i in range(8)] + ["e{}.net".format(i) for i in range(8)]
+    results = connector._retrosearch_adaptive(domains, RETROSEARCH_KINDS[0], 8, 8000, spec)
+
+    rows = pd.concat([r[0] for r in results if len(r[0]) > 0])
+    assert sorted(rows["n"]) == list(range(40))
+    # first batch of 8 is truncated, so next ones hold 4 domains until results are sparse again
+    assert max(r[1]["batch"] for r in results) == 2
+
+
+def test_adaptive_runs_bisected_queries_on_pool(connector, serve):
+    store = [sighting(NOW - 100 * i, "d{}.net".format(i % 8), n=i) for i in range(40)]
+    handler = retrosearch_handler(store)
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def slow(method, path, params, body):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return handler(method, path, params, body)
+
+    serve(connector, slow)
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(10)
+
+    domains = ["d{}.net".format(i) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = connector._retrosearch_adaptive(domains, RETROSEARCH_KINDS[0], 8, 8000, connector.query_spec(),
+                                                  pool=pool)
+
+    assert sorted(pd.concat([r[0] for r in results if len(r[0]) > 0])["n"]) == list(range(40))
+    # one sub-query kind keeps more than one worker busy once its batch is bisected
+    assert in_flight[1] > 1
+
+
+def test_adaptive_requires_page_size(retro):
+    retro.set_page_size(0)
+    with pytest.raises(ValueError):
+        retro.retrosearch(["a.com"], adaptive=True)
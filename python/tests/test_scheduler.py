@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+import requests
+
+from surianalytics.scheduler import RequestScheduler
+
+
+class Resp():
+
+    def __init__(self, status_code: int, headers: dict | None = None) -> None:
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def scheduler(**kwargs) -> RequestScheduler:
+    sched = RequestScheduler(**kwargs)
+    sched.retry_delay = lambda attempt, retry_after=None: 0
+    return sched
+
+
+def test_limit_grows_on_success_and_halves_on_throttle():
+    sched = scheduler(max_concurrency=8)
+    assert sched.limit == 4
+
+    for _ in range(20):
+        sched.release(sched.acquire(), 200)
+    grown = sched.limit
+    assert 4 < grown <= 8
+
+    sched.release(sched.acquire(), 503)
+    assert sched.limit == grown / 2
+    assert sched.throttled == 1
+
+
+def test_burst_of_failures_decreases_limit_once():
+    sched = scheduler(max_concurrency=8)
+    started = [sched.acquire() for _ in range(3)]
+    for s in started:
+        sched.release(s, 429)
+    assert sched.limit == 2
+    assert sched.in_flight == 0
+
+
+def test_run_retries_and_closes_dropped_responses():
+    sched = scheduler(retries=3)
+    responses = [Resp(503), Resp(429, {"Retry-After": "0"}), Resp(200)]
+    sent = iter(responses)
+
+    resp = sched.run(lambda: next(sent))
+    assert resp.status_code == 200
+    assert [r.closed for r in responses] == [True, True, False]
+    assert sched.in_flight == 0
+
+
+def test_run_returns_last_response_when_retries_exhausted():
+    sched = scheduler(retries=1)
+    resp = sched.run(lambda: Resp(502))
+    assert resp.status_code == 502
+    assert sched.in_flight == 0
+
+
+@pytest.mark.parametrize("error", [requests.ConnectionError, requests.exceptions.InvalidURL, KeyError])
+def test_run_frees_slot_on_error(error):
+    sched = scheduler(retries=1)
+
+    def send():
+        raise error("failed")
+
+    with pytest.raises(error):
+        sched.run(send)
+    assert sched.in_flight == 0
+
+
+def test_unrelated_error_leaves_limit():
+    sched = scheduler(max_concurrency=8)
+
+    def send():
+        raise KeyError("x")
+
+    with pytest.raises(KeyError):
+        sched.run(send)
+    assert sched.limit == 4
+    assert sched.throttled == 0
+
+
+def test_arun_frees_slot_on_cancel():
+    sched = scheduler()
+
+    async def send():
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(sched.arun(send))
+        await asyncio.sleep(0.01)
+        assert sched.in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert sched.in_flight == 0
+
+
+def test_arun_retries_retryable_status():
+    sched = scheduler()
+    results = iter([(503, {}, b""), (200, {}, b"ok")])
+
+    async def send():
+        return next(results)
+
+    assert asyncio.run(sched.arun(send)) == (200, {}, b"ok")
+    assert sched.in_flight == 0
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        RequestScheduler(max_concurrency=0)
+    with pytest.raises(ValueError):
+        RequestScheduler(rate=0)
+    with pytest.raises(ValueError):
+        RequestScheduler(target_latency=0)
+    with pytest.raises(ValueError):
+        RequestScheduler(max_concurrency=4, initial_concurrency=5)
+
+
+def test_initial_limit_and_target_latency(monkeypatch):
+    sched = scheduler(max_concurrency=8, initial_concurrency=6, target_latency=0.5)
+    assert sched.limit == 6
+
+    started = sched.acquire()
+    monkeypatch.setattr("time.monotonic", lambda: started + 1)
+    sched.release(started, 200)
+    assert sched.limit == 3
+
+
+def test_connector_scheduler_settings(env_file):
+    from surianalytics.connectors import RESTSciriusConnector
+
+    env_file.write_text(env_file.read_text() + "SCIRIUS_TARGET_LATENCY=2.5\nSCIRIUS_INITIAL_CONCURRENCY=3\n")
+    conn = RESTSciriusConnector()
+    assert conn.scheduler.target_latency == 2.5
+    assert conn.scheduler.limit == 3
+
+    conn = RESTSciriusConnector(scirius_initial_concurrency=1, scirius_target_latency=4)
+    assert conn.scheduler.limit == 1 and conn.scheduler.target_latency == 4
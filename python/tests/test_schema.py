@@ -0,0 +1,53 @@
+import pandas as pd
+
+from surianalytics.schema import SKETCH_SIZE, SchemaProfile, merge_sketch, value_hashes
+
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "event_type": ["dns", "dns", "flow", None],
+        "answers": [[1], [2, 3], None, None],
+        "meta": [{"a": 1}, None, None, None],
+        "bytes": [1, 2, 3, 4],
+    })
+
+
+def test_kinds_null_ratio_and_cardinality():
+    prof = SchemaProfile(frame())
+    assert prof.kind("answers") == "list"
+    assert prof.kind("meta") == "dict"
+    assert prof.kind("event_type") == "scalar"
+    assert prof.kind("unknown") == "scalar"
+    assert prof.null_ratio("event_type") == 0.25
+    assert prof["event_type"].cardinality == 2
+    assert sorted(prof.columns(("list", "dict"))) == ["answers", "meta"]
+
+
+def test_add_and_remove_keep_counts_in_sync():
+    df = frame()
+    prof = SchemaProfile(df.iloc[:2])
+    prof.add(df.iloc[2:])
+    prof.remove(df.iloc[:2])
+    assert prof.rows == 2
+    assert prof.kind("answers") == "scalar"
+    assert prof.kind("meta") == "scalar"
+    assert prof.null_ratio("event_type") == 0.5
+
+
+def test_set_dtypes_and_to_df():
+    df = frame()
+    prof = SchemaProfile(df)
+    prof.set_dtypes(df.astype({"event_type": "category"}))
+    out = prof.to_df().set_index("column")
+    assert out.loc["event_type", "dtype"] == "category"
+    assert list(out.columns) == ["kind", "dtype", "null_ratio", "cardinality"]
+
+
+def test_sketch_estimates_large_cardinality():
+    values = pd.Series([str(i) for i in range(20 * SKETCH_SIZE)])
+    prof = SchemaProfile(pd.DataFrame({"v": values}))
+    estimate = prof["v"].cardinality
+    assert abs(estimate - len(values)) / len(values) < 0.2
+
+    sketch = merge_sketch(value_hashes(values[:10]), value_hashes(values[5:20]))
+    assert len(sketch) == 20
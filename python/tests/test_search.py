@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from surianalytics.widgets.search import Debounce, SearchIndex, addr_key, ip_range, numeric_range
+
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "host": ["Example.com", "foo.org", None, "example.net"],
+        "src_ip": pd.Categorical(["10.0.0.1", "10.0.1.1", "::1", "10.0.0.200"]),
+        "port": [80, 443, 8080, 53],
+        "bytes": [1.5, -0.5, np.nan, 99.9],
+        "tags": [["a"], "x", None, "a"],
+    })
+
+
+def test_numeric_range():
+    assert numeric_range("80") == (80, 80)
+    assert numeric_range("1024-1") == (1, 1024)
+    assert numeric_range("-5--1") == (-5, -1)
+    assert numeric_range("http") is None
+
+
+def test_ip_range_and_addr_key():
+    assert ip_range("10.0.0.0/24") == ((4, 0x0a000000), (4, 0x0a0000ff))
+    assert ip_range("10.0.0.9-10.0.0.1") == ((4, 0x0a000001), (4, 0x0a000009))
+    assert ip_range("example.com") is None
+    assert addr_key("::1") == (6, 1)
+    assert addr_key("nope") is None
+
+
+def test_label_search_modes():
+    idx = SearchIndex(frame())
+    assert idx.mask("host", "EXAMPLE").tolist() == [True, False, False, True]
+    assert idx.mask("host", "=example.com").tolist() == [True, False, False, False]
+    assert idx.mask("host", r"\.org$").tolist() == [False, True, False, False]
+    # incomplete regex is matched as text
+    assert not idx.mask("host", "exa[").any()
+    assert idx.mask("tags", "a").tolist() == [False, False, False, True]
+
+
+def test_ip_search():
+    idx = SearchIndex(frame())
+    assert idx.mask("src_ip", "10.0.0.0/24").tolist() == [True, False, False, True]
+    assert idx.mask("src_ip", "10.0.0.100-10.0.1.1").tolist() == [False, True, False, True]
+
+
+def test_numeric_search():
+    idx = SearchIndex(frame())
+    assert idx.mask("port", "80-443").tolist() == [True, True, False, False]
+    assert idx.mask("port", "x").tolist() == [False] * 4
+    # floats match on integer part
+    assert idx.mask("bytes", "0").tolist() == [False, True, False, False]
+    assert idx.mask("bytes", "1-99").tolist() == [True, False, False, True]
+
+
+def test_unindexed_dtype():
+    idx = SearchIndex(pd.DataFrame({"t": pd.to_datetime(["2022-01-01"])}))
+    assert idx.mask("t", "2022") is None
+
+
+def test_debounce_calls_latest_once():
+    calls = []
+    done = threading.Event()
+
+    def func(value):
+        calls.append(value)
+        done.set()
+
+    debounce = Debounce(func, wait=0.05)
+    for value in range(5):
+        debounce(value)
+    assert done.wait(2)
+    debounce.cancel()
+    assert calls == [4]
+
+
+def test_explorer_refresh_uses_applied_filter_value(connector, serve, monkeypatch):
+    from surianalytics.widgets.explorer import Explorer
+
+    serve(connector, lambda method, path, params, body: {"results": [], "fields": []})
+    explorer = Explorer(connector)
+    shown = []
+    monkeypatch.setattr(explorer, "_display_eve_show", lambda **kwargs: shown.append(kwargs["filter_value"]))
+
+    # typed value is still waiting for debounce
+    explorer._find_filtered_value_applied.value = "10.0.0.1"
+    explorer._find_filtered_value.value = "10.0.0.12"
+    explorer._refresh_eve_show()
+    assert shown[-1] == "10.0.0.1"
@@ -0,0 +1,45 @@
+import pytest
+
+from surianalytics.connectors import ESQueryBuilder, RESTSciriusConnector
+
+
+def test_connector_reads_env_config(connector):
+    assert connector.endpoint == "scirius.test"
+    assert connector.token == "test"
+    assert connector.tls_verify is False
+
+
+def test_missing_token_or_bad_pool_size(env_file):
+    env_file.write_text("SCIRIUS_HOST=scirius.test\n")
+    with pytest.raises(ValueError):
+        RESTSciriusConnector()
+    with pytest.raises(ValueError):
+        RESTSciriusConnector(scirius_token="x", scirius_pool_size=0)
+
+
+def test_session_is_pooled_and_keeps_alive(env_file):
+    conn = RESTSciriusConnector(scirius_pool_size=3)
+    adapter = conn.session.get_adapter("https://scirius.test/")
+    assert adapter._pool_connections == 3 and adapter._pool_maxsize == 3
+    assert conn.session.headers["Authorization"] == "Token test"
+    assert conn.session.headers["Connection"] == "keep-alive"
+    assert "gzip" in conn.session.headers["Accept-Encoding"]
+
+
+def test_requests_reuse_one_session(connector, serve):
+    session = serve(connector, lambda method, path, params, body: {"results": [], "fields": ["a"]})
+    connector.get_unique_fields()
+    connector.get_events_tail()
+    assert [r[1] for r in session.requests] == ["/rest/rules/es/unique_fields/", "/rest/rules/es/events_tail/"]
+
+    connector.close()
+    assert session.closed
+
+
+def test_builder_post_goes_through_session(env_file, serve):
+    builder = ESQueryBuilder()
+    session = serve(builder, lambda method, path, params, body: {"aggregations": {}})
+    builder.set_index("logstash-*")
+    assert builder.post().status_code == 200
+    assert session.requests[0][0] == "POST"
+    assert session.requests[0][3]["index"] == "logstash-*"
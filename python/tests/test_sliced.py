@@ -0,0 +1,43 @@
+import pytest
+
+from helpers import NOW, event, iso, tail_handler
+from surianalytics.connectors import split_window
+
+
+def test_split_window_covers_range_without_overlap():
+    windows = split_window(0, 99, 4)
+    assert windows[0][0] == 0 and windows[-1][1] == 99
+    assert all(a[1] + 1 == b[0] for a, b in zip(windows, windows[1:]))
+    assert split_window(5, 6, 10) == [(5, 5), (6, 6)]
+
+
+def test_full_slices_are_split_until_results_fit(connector, serve):
+    store = [event(NOW - 100 * i, n=i) for i in range(200)]
+    session = serve(connector, tail_handler(store))
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(30)
+
+    df = connector.get_events_df_sliced(slices=2, workers=3)
+    assert len(df) == 200
+    # newest first, same as a single events_tail page
+    assert df["n"].tolist() == list(range(200))
+    assert len(session.requests) > 2
+
+
+def test_slice_full_at_minimum_width_warns(connector, serve):
+    serve(connector, tail_handler([event(NOW, n=i) for i in range(5)]))
+    connector.set_query_timeframe(iso(NOW - 1000), iso(NOW))
+    connector.set_page_size(5)
+
+    with pytest.warns(UserWarning, match="minimum width"):
+        df = connector.get_events_df_sliced(slices=1)
+    assert len(df) == 5
+
+
+def test_invalid_arguments(connector, serve):
+    serve(connector, tail_handler([]))
+    with pytest.raises(ValueError):
+        connector.get_events_df_sliced(slices=0)
+    connector.set_page_size(0)
+    with pytest.raises(ValueError):
+        connector.get_events_df_sliced()
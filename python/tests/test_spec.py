@@ -0,0 +1,46 @@
+import pytest
+
+from surianalytics.connectors import ESQueryBuilder, QuerySpec
+
+from helpers import NOW, iso
+
+
+def test_query_spec_is_hashable_and_canonical():
+    a = QuerySpec(0, 10, aggs={"b": 1, "a": 2})
+    b = QuerySpec(0, 10, aggs={"a": 2, "b": 1})
+    assert a == b and hash(a) == hash(b)
+    assert a.key() == b.key()
+    assert a.aggs_dict() == {"a": 2, "b": 1}
+    assert a.replace(qfilter="x").key() != a.key()
+    with pytest.raises(ValueError):
+        QuerySpec(10, 0)
+    with pytest.raises(ValueError):
+        QuerySpec(0, 10, page_size=-1)
+
+
+def test_query_spec_params():
+    spec = QuerySpec(0, 10, qfilter="event_type: dns", tenant=2)
+    assert spec.params() == {"from_date": 0, "to_date": 10, "qfilter": "event_type: dns", "tenant": 2}
+    assert spec.params(ignore_time=True) == {"qfilter": "event_type: dns", "tenant": 2}
+    assert spec.post_params() == {"tenant": 2, "from_date": 0, "to_date": 10}
+    assert spec.with_window(5, 6).params()["from_date"] == 5
+
+
+def test_connector_spec_snapshots_state(connector):
+    connector.set_query_timeframe(iso(NOW - 60_000), iso(NOW))
+    connector.set_page_size(7)
+    spec = connector.query_spec(qfilter="x")
+    connector.set_page_size(8)
+    assert (spec.from_date, spec.to_date, spec.page_size, spec.qfilter) == (NOW - 60_000, NOW, 7, "x")
+
+
+def test_builder_post_uses_spec_taken_before_changes(env_file, serve):
+    builder = ESQueryBuilder()
+    session = serve(builder, lambda method, path, params, body: {"aggregations": {}})
+    builder.set_index("logstash-*")
+    builder.set_qfilter("event_type: dns")
+    spec = builder.search_spec()
+    builder.set_qfilter("event_type: flow")
+
+    builder.post(spec)
+    assert session.requests[0][3]["qfilter"] == "event_type: dns"
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from surianalytics.buffers import EventRingBuffer
+from surianalytics.widgets import explorer as explorer_module
+from surianalytics.widgets.explorer import Explorer
+
+from helpers import event, tail_handler
+
+
+def now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+def test_event_tail_returns_only_new_events_oldest_first(connector, serve):
+    now = now_ms()
+    store = [event(now - 5000 + i * 1000, n=i) for i in range(4)]
+    serve(connector, tail_handler(store))
+    connector.set_page_size(3)
+
+    tail = connector.tail_events(since=now - 10000)
+    assert [e["n"] for e in tail.poll()] == [0, 1, 2, 3]
+    assert tail.poll() == []
+
+    store.append(event(now - 500, n=4))
+    assert [e["n"] for e in tail.poll()] == [4]
+
+
+def test_async_tail_poll_is_coroutine(env_file):
+    pytest.importorskip("aiohttp")
+    from surianalytics.connectors import AsyncRESTSciriusConnector
+
+    conn = AsyncRESTSciriusConnector()
+    conn.set_page_size(3)
+    now = now_ms()
+
+    async def get_events_tail(spec=None, **kwargs):
+        return [event(now - 1000, n=1)]
+
+    conn.get_events_tail = get_events_tail
+    tail = conn.tail_events(since=now - 10000)
+    assert [e["n"] for e in asyncio.run(tail.poll())] == [1]
+
+
+class FakeTail():
+
+    """
+    Returns given batches of events, then stops tail loop
+    """
+
+    def __init__(self, batches: list, stop: threading.Event) -> None:
+        self.batches = batches
+        self.stop = stop
+
+    def poll(self) -> list:
+        if len(self.batches) == 0:
+            self.stop.set()
+            return []
+        return self.batches.pop(0)
+
+
+class PollStop(threading.Event):
+
+    """
+    Stop event of a tail loop that polls without sleeping
+    """
+
+    def wait(self, timeout=None) -> bool:
+        return self.is_set()
+
+
+@pytest.fixture
+def explorer(connector, serve):
+    serve(connector, lambda method, path, params, body: {"results": [], "fields": []})
+    return Explorer(connector)
+
+
+def test_live_tail_publishes_buffer_rows(explorer):
+    now = now_ms()
+    explorer._tail_buffer = EventRingBuffer(capacity=3)
+    explorer._tail_stop = PollStop()
+    explorer._tail = FakeTail([[event(now - 3000, n=0), event(now - 2000, n=1)],
+                               [event(now - 1000, n=2), event(now, n=3)]], explorer._tail_stop)
+    explorer._live_tail_loop()
+
+    assert explorer.data["n"].tolist() == [1, 2, 3]
+    assert explorer._tail_buffer.to_df()["n"].tolist() == [1, 2, 3]
+    assert explorer._profile.rows == 3
+
+
+def test_live_tail_does_not_publish_after_stop(explorer, monkeypatch):
+    now = now_ms()
+    explorer._tail_buffer = EventRingBuffer(capacity=3)
+    explorer._tail_stop = stop = PollStop()
+    explorer._tail = FakeTail([[event(now, n=1)]], stop)
+    before = explorer.data
+
+    # download replaces data while polled events are being normalized
+    optimize_dtypes = explorer_module.optimize_dtypes
+
+    def stop_during_poll(df):
+        stop.set()
+        return optimize_dtypes(df)
+
+    monkeypatch.setattr(explorer_module, "optimize_dtypes", stop_during_poll)
+    explorer._live_tail_loop()
+
+    assert explorer.data is before
+    assert len(explorer._tail_buffer) == 0
+
+
+def test_stop_live_tail_joins_thread(explorer):
+    explorer.data = pd.DataFrame()
+    explorer._start_live_tail()
+    thread = explorer._tail_thread
+    assert thread.is_alive()
+
+    explorer._stop_live_tail()
+    assert not thread.is_alive()
+    assert explorer._tail_thread is None
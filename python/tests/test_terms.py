@@ -0,0 +1,35 @@
+import pandas as pd
+
+from surianalytics.connectors import ESQueryBuilder, flatten_terms
+
+NESTED = {"buckets": [
+    {"key": "a", "doc_count": 5, "2": {"buckets": [{"key": "x", "doc_count": 3, "m": {"value": 1.0}},
+                                                   {"key": "y", "doc_count": 2, "m": {"value": 2.0}}]}},
+    {"key": "b", "doc_count": 4},
+    {"key": "c", "doc_count": 1, "2": {"buckets": [{"key": "z", "doc_count": 1, "m": {"value": 3.0}}]}},
+]}
+
+
+def test_flatten_terms_depth_first_with_short_branches():
+    df = flatten_terms(NESTED, ["outer", "inner"], ["m"])
+    assert df["outer"].tolist() == ["a", "a", "b", "c"]
+    assert df["inner"].tolist()[:2] == ["x", "y"] and pd.isna(df["inner"].iloc[2])
+    assert df["Count"].tolist() == [3, 2, 4, 1]
+    assert df["m"].iloc[3] == 3.0
+
+
+def test_flatten_terms_empty():
+    df = flatten_terms({"buckets": []}, ["outer"], ["m"])
+    assert list(df.columns) == ["outer", "Count", "m"] and len(df) == 0
+
+
+def test_builder_flattens_nested_terms_response(env_file):
+    builder = ESQueryBuilder()
+    builder.add_aggs("event_type", "outer")
+    builder.add_aggs("proto", "inner")
+    builder.add_metric("flow.bytes", "m")
+
+    df = builder.flatten_aggregation({"aggregations": {"1": NESTED}})
+    assert list(df.columns) == ["outer", "inner", "Count", "m"]
+    assert len(df) == 4
+    assert builder.flatten_aggregation({}).empty
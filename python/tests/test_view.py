@@ -0,0 +1,46 @@
+import pandas as pd
+
+from surianalytics.widgets.view import ViewPipeline, filter_value_mask
+
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "event_type": pd.Categorical(["dns", "flow", "dns", "tls"]),
+        "dest_port": [53, 443, 53, 443],
+        "host": ["b.com", "a.org", "a.com", None],
+    })
+
+
+def test_view_sorts_filters_and_projects():
+    view = ViewPipeline(frame())
+    df = view.view(["host", "dest_port"], ("host",), [("dest_port", "53")])
+    assert list(df.columns) == ["host", "dest_port"]
+    assert df["host"].tolist() == ["a.com", "b.com"]
+
+
+def test_filters_outside_columns_are_ignored():
+    view = ViewPipeline(frame())
+    assert len(view.view(["host"], (), [("dest_port", "53")])) == 4
+
+
+def test_stages_are_cached_until_data_changes():
+    view = ViewPipeline(frame())
+    first = view.view(["host"], ("dest_port",), [])
+    assert view.view(["host"], ("dest_port",), []) is first
+    assert view.order(("dest_port",)) is view.order(("dest_port",))
+
+    view.set_data(frame().iloc[:2])
+    assert len(view.view(["host"], ("dest_port",), [])) == 2
+
+
+def test_unique_values_and_mask():
+    view = ViewPipeline(frame())
+    assert sorted(view.unique_values("host")) == ["a.com", "a.org", "b.com"]
+    assert view.unique_values("missing") == []
+    assert view.mask("host", "") is None
+    assert view.mask("event_type", "dns").tolist() == [True, False, True, False]
+
+
+def test_filter_value_mask_fallback():
+    assert filter_value_mask(pd.Series([1, 2, 1]), "1").tolist() == [True, False, True]
+    assert filter_value_mask(pd.Series(["A", None]), "a").tolist() == [True, False]